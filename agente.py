@@ -1,8 +1,9 @@
 import random
 import matplotlib
 import matplotlib.pyplot as plt
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
+from heuristic import HeuristicTables, connected_components
 class Agent:
     """
         Questa classe rappresenta un agente all'interno dell'ambiente di simulazione del problema di 
@@ -31,13 +32,16 @@ class Agent:
         self.color=color
         self.priority=priority
 
-def generate_agents(map:np.ndarray, max_num_agents:int, seed:int=0):
+def generate_agents(map:np.ndarray, max_num_agents:int, seed:int=0, heuristic:Optional[HeuristicTables]=None):
     """
         Questa funzione genera un insieme di agenti assegando a ciascuno di questi una posizione iniziale
         ed una posizione obiettivo che siano valide, dove con valide si intende che:
         1) siano celle libere nella mappa, quindi non corrispondenti ad ostacoli
         2)in accordo con la formulazione classica del problema MAPF, ogni agente deve avere una posizione di partenza e 
         una posizione obiettivo uniche.
+        3)la posizione obiettivo sia raggiungibile dalla posizione di partenza, cioè le due celle appartengano alla
+        stessa componente connessa della mappa. In questo modo sulle mappe frammentate nessun agente riceve un
+        obiettivo irraggiungibile.
 
         Gli argomenti della funzione sono:
         -)map: un array NumPy bidimensionale le cui celle libere sono marcate con 0, le celle occupate
@@ -49,6 +53,8 @@ def generate_agents(map:np.ndarray, max_num_agents:int, seed:int=0):
         presenti nella mappa considerata. Utilizzando lo stesso seed per vari esperimenti, le celel di partenza e finali dei vari agenti
         sono uguali, utilizzando invece seed diversi si hanno istanze diverse del problema garantendo posizioni iniziali e terminali
         differenti per gli agenti, al fine di osservare al meglio le prestazioni dell'algoritmo.
+        -)heuristic: tabelle euristiche della mappa(opzionale), da cui si leggono le componenti connesse già calcolate
+        (HeuristicTables.components); se assente le componenti vengono calcolate con connected_components.
 
         La funzione, dopo aver determinato il numero di celle libere nella mappa, e quindi candidate per essere assegnate
         ai vari agenti, verifica se il numero di agenti che si intende generare è valido, ossia
@@ -58,42 +64,66 @@ def generate_agents(map:np.ndarray, max_num_agents:int, seed:int=0):
 
         Si riporta una breve descrizione step-by-step della funzione:
         1) inizializzazione del generatore pseudocasuale di numeri
-        2) definzione delle 2 dimensioni della mappa(che ricordiamo essere un array bidimensionale), 
-        dunque altezza e larghezza, tramite l'attributo .shape definito nella libreria NumPy.
-        3)definizione delle celle libere, identificate dal valore 0, eseguendo un ciclo su tutte le righe e le colonne
-        della mappa.
-        4)shuffle casuale delle celle libere.
-        5)verifica dell'idoneità del numero di agenti in corrispondenza al numero di celle libere:
+        2)definizione delle celle libere, identificate dal valore 0, con np.argwhere, e delle loro componenti connesse.
+        3)shuffle casuale delle celle libere.
+        4)verifica dell'idoneità del numero di agenti in corrispondenza al numero di celle libere:
         Si verifica se per ogni agente sono presenti 2 celle libere univoche, ed in caso contrario viene sollevata un'eccezione.
-        6)preparazione di una ColorMap che contiene tanti colori diversi quanto il numero di agenti. Tale passo
+        5)preparazione di una ColorMap che contiene tanti colori diversi quanto il numero di agenti. Tale passo
         è centrale per assegnare ad ogni agente un colore differente, per avere maggiore chiarezza durante la visione dell'animazione.
+        6)per ogni componente si costruisce la pila delle sue celle, nell'ordine dello shuffle.
         7) generazione degli agenti:
             -)si inizializza come vuota la lista degli agenti.
-            -)ad ogni agente viene assegnata la posizione di partenza  estraendola tramite la funzione .pop(),
-            centrale per garantire l'unicità delle posizioni. La funzione pop(), in accordo con la documentazione,
-            estrae l'ultima cella libera e la rimuove dalla lista.
-            -)allo stesso modo si assegna la posizione da raggiungere ad ogni agente.
+            -)la posizione di partenza è l'ultima cella libera non ancora assegnata, come con la funzione .pop()
+            -)la posizione obiettivo è l'ultima cella non ancora assegnata della stessa componente, estratta dalla pila
+            della componente. Se la componente non ha altre celle libere la posizione di partenza viene scartata.
+            Su una mappa con una sola componente si ottengono quindi gli stessi agenti estraendo due celle consecutive.
             -)si assegna ad ogni agente un livello di priorità ed un colore(grazie alla colormap precedentemente definita).
             -)si inserisce l'agente nella lista.
+        Se le celle rimaste non permettono di formare abbastanza coppie nella stessa componente viene sollevata
+        un'eccezione.
 
     """
     random.seed(seed)
-    height, width = map.shape
-    
-    free_cells: List[Tuple[int, int]] = [(r, c) for r in range(height) for c in range(width) if map[r, c] == 0]
+    free_cells: np.ndarray = np.argwhere(map == 0)
+    components = connected_components(map) if heuristic is None else heuristic.components()
+    free_components = components[free_cells[:, 0], free_cells[:, 1]]
 
-    random.shuffle(free_cells)
+    order: List[int] = list(range(len(free_cells)))
+    random.shuffle(order)
 
     if len(free_cells) < max_num_agents * 2:
         raise ValueError(f"Il numero di celle libere nella mappa({len(free_cells)}) non è sufficiente per generare {max_num_agents} agenti."
                         f"""Sono necessarie, per assegnare a ciascun agente una posizione di partenza
                         e una posizione obiettivo,almeno {max_num_agents * 2} celle.Si prega di inserire un numero minore di agenti.""")
     colormap = plt.cm.get_cmap('hsv', max_num_agents)
+
+    shuffled_components = free_components[order]
+    by_component = np.argsort(shuffled_components, kind="stable")
+    boundaries = np.flatnonzero(np.diff(shuffled_components[by_component])) + 1
+    stacks: Dict[int, List[int]] = {int(shuffled_components[group[0]]): group.tolist()
+                                    for group in np.split(by_component, boundaries) if group.size}
+    used = np.zeros(len(order), dtype=bool)
+
     all_agents:List[Agent] = []
-    for i in range(max_num_agents):
-            start = free_cells.pop()
-            goal = free_cells.pop()
-            agente = Agent(start_position=start, goal_position=goal,
-                           color=colormap(i), priority=i+1) 
-            all_agents.append(agente)
+    cursor = len(order) - 1
+    while len(all_agents) < max_num_agents and cursor >= 0:
+        if used[cursor]:
+            cursor -= 1
+            continue
+        used[cursor] = True
+        stack = stacks[int(shuffled_components[cursor])]
+        while stack and used[stack[-1]]:
+            stack.pop()
+        if not stack:
+            continue
+        goal_index = stack.pop()
+        used[goal_index] = True
+        start = tuple(int(value) for value in free_cells[order[cursor]])
+        goal = tuple(int(value) for value in free_cells[order[goal_index]])
+        agente = Agent(start_position=start, goal_position=goal,
+                       color=colormap(len(all_agents)), priority=len(all_agents)+1)
+        all_agents.append(agente)
+    if len(all_agents) < max_num_agents:
+        raise ValueError(f"Le componenti connesse della mappa permettono di generare solo {len(all_agents)} agenti "
+                         f"con partenza e obiettivo raggiungibili, su {max_num_agents} richiesti.")
     return all_agents
@@ -1,56 +1,134 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import random
 import math
-from typing import List, Tuple, Optional, Union
-from matplotlib.collections import PathCollection 
-from matplotlib.text import Text 
+import subprocess
+from pathlib import Path
+from typing import Iterator, List, Tuple, Optional, Union
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+from PIL import Image
+from numpy.typing import NDArray
 from agente import *
+from validation import pack_paths
 
+ANIMATION_FORMATS: List[str] = [".gif", ".mp4"]
+MAX_LABELS: int = 20
+MAX_TICKS: int = 40
+FIGURE_SIZE: float = 7.0
 
-def update(frame: int, agents: List[Agent], paths, scatters: List[PathCollection],texts: List[Text], ax: plt.Axes):
+
+def agent_positions(paths, width: int) -> Tuple[NDArray[np.float64], NDArray[np.int64]]:
+    """
+        Questa funzione calcola le posizioni di tutti gli agenti in ogni istante di tempo, come array NumPy
+        (istanti, agenti, 2) di coordinate (x, y) = (colonna, riga) pronte per set_offsets. I percorsi vengono raccolti
+        con validation.pack_paths, per cui dopo l'arrivo ogni agente resta fermo sulla posizione obiettivo e i percorsi
+        None vengono ignorati.
+
+        La funzione restituisce le posizioni e, per ogni colonna, l'indice dell'agente nella lista paths.
+    """
+    packed, indices = pack_paths(paths, width)
+    rows, columns = np.divmod(packed.T.astype(np.int64), width)
+    return np.stack((columns, rows), axis=-1).astype(np.float64), indices
+
+
+def frame_indices(horizon: int, stride: int = 1, max_frames: Optional[int] = None) -> List[int]:
+    """
+        Questa funzione restituisce gli istanti di tempo da mostrare nell'animazione: uno ogni stride istanti, con un
+        passo aumentato se necessario in modo da non superare max_frames fotogrammi(opzionale). L'ultimo istante, in
+        cui tutti gli agenti sono sull'obiettivo, viene sempre incluso.
+    """
+    if horizon <= 0:
+        return []
+    if max_frames is not None:
+        stride = max(stride, math.ceil(horizon / max(max_frames, 1)))
+    frames = list(range(0, horizon, max(stride, 1)))
+    if frames[-1] != horizon - 1:
+        frames.append(horizon - 1)
+    return frames
+
+
+def update(frame: int, positions: NDArray[np.float64], scatter: PathCollection, texts: List[Text], time_text: Text):
     """
         Questa funzione si occupa di aggiornare i vari frame per gli agenti al fine di garantirne la visualizzazione corretta.
         Gli argomenti della funzione sono:
         -)frame:indica il frame attuale, identificando da un intero che corrisponde all'istante di tempo attuale nei vari paths.
-        -)agents: lista degli agenti
-        -)paths:è la lista dei percorsi, uno per ogni agente.
-        -)scatters: è la lista degli scatter necessari per la visualizzazione dinamica dei percorsi degli agenti nel tempo.
-        -)texts: è la lista delle label per i vari agenti, usata per garantire maggiore chiarezza nell'animazione.
-        -)ax: assi della mappa
+        -)positions: posizioni degli agenti per istante di tempo(vedi agent_positions)
+        -)scatter: è l'unico scatter che rappresenta tutti gli agenti, aggiornato con una sola chiamata a set_offsets.
+        -)texts: è la lista delle label per i vari agenti, usata per garantire maggiore chiarezza nell'animazione(vuota se
+        le label sono disattivate).
+        -)time_text: testo che mostra l'istante di tempo corrente
 
-        La funzione descrive una lista degli elementi che devono essere aggiornati da un frame all'altro.
+        La funzione descrive una lista degli elementi che devono essere aggiornati da un frame all'altro, usata dal
+        blitting per ridisegnare soltanto tali elementi.
+    """
+    current = positions[frame]
+    scatter.set_offsets(current)
+    for text, (x, y) in zip(texts, current):
+        text.set_position((x + 0.3, y))
+    time_text.set_text(f"Time-Step: {frame}")
+    return [scatter, time_text, *texts]
 
-        Si descrive brevemente il funzionamento step-by-step della funzione:
-        1)Si esegue un loop per i vari percorsi:
-            -)se il frame corrente è maggiore della lunghezza del percorso per un certo agente, allora significa che l'
-            agente ha già raggiunto la sua posizione goal e quindi rimane fermo in quella posizione.
-            -)si estraggono le coordinate x ed y dell'agente
-            -)si aggiornano le label assegnate a ciascun agente
-        2)Il titolo che si assegna per vedere lo scorrere dei vari frame è Time-Step, dato che ogni frame 
-        corrisponde ad un'istante di tempo.
+
+def draw_scene(ax: Axes, map: np.ndarray, agents: List[Agent], positions: NDArray[np.float64],
+               indices: NDArray[np.int64], show_labels: Optional[bool] = None) -> Tuple[PathCollection, List[Text], Text]:
+    """
+        Questa funzione disegna la parte statica dell'animazione e crea gli elementi animati.
+
+        Si riporta una breve descrizione step-by-step della funzione:
+        1)si disegna la mappa, in cui gli ostacoli sono in nero. La griglia con una tacca per cella viene disegnata solo
+        per le mappe con al più MAX_TICKS righe e colonne, dato che sulle mappe grandi il suo disegno domina il tempo.
+        2)le posizioni iniziali(quadrati) e obiettivo(X) di tutti gli agenti vengono disegnate con due soli scatter, e
+        tutti i percorsi con un'unica LineCollection che contiene una spezzata per agente, del colore dell'agente.
+        Le dimensioni dei marcatori si riducono con la dimensione delle celle.
+        3)si crea un unico scatter per tutti gli agenti, il testo dell'istante di tempo all'interno degli assi e, se
+        show_labels è True(di default se gli agenti sono al più MAX_LABELS), una label per agente. Tutti questi elementi
+        sono animati, quindi esclusi dal disegno dello sfondo.
+
+        La funzione restituisce lo scatter degli agenti, le label e il testo dell'istante di tempo.
     """
-    for index, path in enumerate(paths):
-        if path is None or frame >= len(path):
-            continue
-        position = path[frame]
-        y, x = position[0]
-        scatters[index].set_offsets([x, y])
-        texts[index].set_position((x + 0.3, y)) 
-        texts[index].set_text(f"A{index+1}\nt={frame}")
-    ax.set_title(f"Time-Step: {frame}") 
-    return scatters + texts
+    height, width = map.shape
+    ax.imshow(map, cmap="Greys", origin="upper")
+    if max(height, width) <= MAX_TICKS:
+        ax.set_xticks(np.arange(width))
+        ax.set_yticks(np.arange(height))
+        ax.grid(True, which='both', color='lightgrey', linewidth=0.5)
 
+    cell = FIGURE_SIZE * 72 / max(height, width)
+    colors = [agents[i].color for i in indices.tolist()]
+    starts = np.array([agents[i].start_position for i in indices.tolist()], dtype=np.float64).reshape(-1, 2)
+    goals = np.array([agents[i].goal_position for i in indices.tolist()], dtype=np.float64).reshape(-1, 2)
+    ax.scatter(starts[:, 1], starts[:, 0], marker='s', c=colors, s=min(300.0, cell ** 2), edgecolors='black', zorder=6)
+    ax.scatter(goals[:, 1], goals[:, 0], marker='X', c=colors, s=min(300.0, cell ** 2), edgecolors='black', zorder=6)
 
+    moved = (positions[1:] != positions[:-1]).any(axis=2)
+    traces = []
+    for column in range(positions.shape[1]):
+        moving = np.flatnonzero(moved[:, column])
+        last = moving[-1] + 2 if moving.size else 1
+        traces.append(positions[:last, column])
+    ax.add_collection(LineCollection(traces, colors=colors, linewidths=min(2.0, cell / 3), alpha=0.3))
 
+    scatter = ax.scatter(positions[0, :, 0], positions[0, :, 1], s=min(100.0, (cell * 0.6) ** 2), c=colors,
+                         edgecolors='black', zorder=5, animated=True)
+    if show_labels is None:
+        show_labels = len(indices) <= MAX_LABELS
+    texts = [ax.text(0, 0, f"A{i + 1}", fontsize=8, color='black', animated=True)
+             for i in indices.tolist()] if show_labels else []
+    time_text = ax.text(0.02, 0.98, "", transform=ax.transAxes, va="top", fontsize=10, zorder=7, animated=True,
+                        bbox={"facecolor": "white", "alpha": 0.8, "edgecolor": "none"})
+    return scatter, texts, time_text
 
 
-def plot_animation(map:np.ndarray, agents:List[Agent], paths):
+def plot_animation(map:np.ndarray, agents:List[Agent], paths, stride: int = 1, max_frames: Optional[int] = None,
+                   show_labels: Optional[bool] = None):
     """
-        Questa funzione permette di visualizzare l'andamento dei vari agenti nella mappa rispetto ai 
+        Questa funzione permette di visualizzare l'andamento dei vari agenti nella mappa rispetto ai
         loro percorsi.
-        
+
         Gli argomenti della funzione sono:
         -)map: un array NumPy bidimensionale le cui celle libere sono marcate con 0, le celle occupate
         da ostacoli sono invece contrassegnate dal valore 1.
@@ -60,90 +138,138 @@ def plot_animation(map:np.ndarray, agents:List[Agent], paths):
             -)la posizione iniziale dell'agente(che nell'animazione è rappresentata da un quadrato del medesimo colore dell'agente)
             -)la posizione finale dell'agente(che nell'animazione è rappresentata da una X del medesimo colore dell'agente)
         -)paths: una lista che corrisponde ai percorsi trovati per i vari agenti dall'algoritmo Prioritized Planning.
-        Il percorso di un agente, se trovato, è descritto come una sequenza di posizioni (identificate dalle coordinate x ed y) e l'istante temporale 
+        Il percorso di un agente, se trovato, è descritto come una sequenza di posizioni (identificate dalle coordinate x ed y) e l'istante temporale
         in cui l'agente si trova nella cella.
+        -)stride, max_frames: si mostra un istante di tempo ogni stride, senza superare max_frames fotogrammi(vedi
+        frame_indices), per i percorsi molto lunghi.
+        -)show_labels: se True si mostra una label per agente(di default solo con al più MAX_LABELS agenti).
 
         Si riporta una breve descrizione step-by-step della funzione:
-        1)si verifica che paths non sia None. Se paths è None significa che l'algoritmo 
+        1)si verifica che paths non sia None. Se paths è None significa che l'algoritmo
         PP non è stato in grado di trovare una soluzione valida al problema, per tanto viene restituito un messaggio di errore
         che impedisce la generazione dell'animazione.
-        2) si determina il tempo massimo di durata dell'animazione, che è pari alla lunghezza
-        del percorso piu lungo trovato, assumendo che ogni arco nel percorso costi esattamente 1 time step.
-        3) si inizializza la figura necessaria per l'animazione corrispondente alla mappa, e le due assi(x ed y).
-        In particolare la figurà avrà per default dimensione 7x7, e per identificare gli ostacoli si utilizza il colore Nero.
-        4) per ogni agente:
-            -)si detetermina la posizione iniziale
-            -)si determina la posizione obiettivo
-            -)si marca all'interno della mappa la posizione iniziale con un quadrato
-            -)si marca all'interno della mappa la posizione finale con una X
-        5) si esegue un ciclo su tutti i percorsi:
-            -)il percorso viene evidenziato dal colore dell'agente di quel path, al fine di avere maggiore chiarezza
-            nella visualizzazione
-            -)per ogni agente si inizializza una lista, line_for_agent, che contiene tutti gli archi del percorso.
-            -)si aggiunge il segmento ottenuto alla lista precedentemente definita
-            -)quando si ottengono tutti i segmenti necessari per mostrare il percorso dell'agente li si inserisce nella lista
-            paths_for_agents.
-        6) si esegue un ciclo su tutti gli agenti assegnando a ciascuno di essi il relativo scatter, centrale per la visione del 
-        movimento degli agenti.
-    """
-    
+        2)si calcolano le posizioni di tutti gli agenti in ogni istante(agent_positions); la durata dell'animazione è
+        pari alla lunghezza del percorso piu lungo trovato, assumendo che ogni arco nel percorso costi esattamente 1 time step.
+        3)si disegnano la mappa, i percorsi e gli elementi animati(vedi draw_scene).
+        4)l'animazione usa il blitting: ad ogni frame vengono ridisegnati soltanto lo scatter degli agenti, le label e
+        l'istante di tempo, e non la mappa e i percorsi.
+        Per salvare l'animazione in un file senza display si usa save_animation.
+    """
+
     if paths is None:
         return "Soluzione non trovata, impossibile generare l'animazione."
-    max_time:int=0
-    for path in paths:
-        if path:
-            max_time:int = max(max_time, len(path))
+    positions, indices = agent_positions(paths, map.shape[1])
 
-    fig, ax = plt.subplots(figsize=(7, 7))
-    ax.imshow(map, cmap="Greys", origin="upper")
-    ax.set_xticks(np.arange(map.shape[1]))
-    ax.set_yticks(np.arange(map.shape[0]))
-    ax.grid(True, which='both', color='lightgrey', linewidth=0.5)
-    
-    scatters: List[PathCollection] = []  
-    texts: List[Text] = []             
-    path_lines: List[List[plt.Line2D]] = []
-
-    for a in agents:
-        start_row, start_column = a.start_position
-        goal_row, goal_column = a.goal_position
-        ax.scatter(start_column, start_row, marker='s', color=a.color, s=300, edgecolors='black', zorder=6, label='Start')
-        ax.scatter(goal_column, goal_row, marker='X', color=a.color, s=300, edgecolors='black', zorder=6, label='Goal')
-
-    
-    
-    for index, path in enumerate(paths):
-        if path is None:
-            path_lines.append([])
-            continue
-        agent_color = agents[index].color
-        lines_for_agent: List[plt.Line2D]=[]
-        for i in range(1, len(path)):
-            if isinstance(path[i][0], tuple): 
-                (y0, x0), _ = path[i - 1]
-                (y1, x1), _ = path[i]
-            else: 
-                y0, x0 = path[i - 1]
-                y1, x1 = path[i]
-
-            if (abs(x1 - x0), abs(y1 - y0)) in [(0, 0), (1, 0), (0, 1)]:
-                l, = ax.plot([x0, x1], [y0, y1], color=agent_color, linewidth=2, alpha=0.3)
-                lines_for_agent.append(l)
-        path_lines.append(lines_for_agent)
-
-    for agente in agents:
-        scatter = ax.scatter([], [], s=100, color=agente.color, edgecolors='black', zorder=5)
-        scatters.append(scatter)
-        text = ax.text(0, 0, '', fontsize=8, color='black')
-        texts.append(text)
+    fig, ax = plt.subplots(figsize=(FIGURE_SIZE, FIGURE_SIZE))
+    scatter, texts, time_text = draw_scene(ax, map, agents, positions, indices, show_labels)
 
     animation_element = animation.FuncAnimation(
         fig,
         update,
-        frames=max_time,
-        fargs=(agents,paths, scatters, texts,ax),
+        frames=frame_indices(positions.shape[0], stride, max_frames),
+        fargs=(positions, scatter, texts, time_text),
         interval=600,
+        blit=True,
         repeat=False
     )
     plt.show()
-   
+
+
+def render_frames(map: np.ndarray, agents: List[Agent], paths, frames: Optional[List[int]] = None, dpi: int = 100,
+                  show_labels: Optional[bool] = None) -> Iterator[NDArray[np.uint8]]:
+    """
+        Questa funzione disegna l'animazione fuori schermo, su una figura con canvas Agg indipendente dal backend di
+        pyplot, e restituisce un generatore dei fotogrammi come array RGBA(altezza, larghezza, 4).
+        Lo sfondo(mappa, percorsi, partenze e obiettivi) viene disegnato una sola volta e salvato; per ogni fotogramma
+        si ripristina lo sfondo e si disegnano soltanto gli elementi animati(blitting), per cui il costo di un
+        fotogramma non dipende dal numero di segmenti dei percorsi. Gli istanti da disegnare sono frames(di default tutti).
+    """
+    positions, indices = agent_positions(paths, map.shape[1])
+    fig = Figure(figsize=(FIGURE_SIZE, FIGURE_SIZE), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    scatter, texts, time_text = draw_scene(ax, map, agents, positions, indices, show_labels)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    for frame in range(positions.shape[0]) if frames is None else frames:
+        canvas.restore_region(background)
+        for artist in update(frame, positions, scatter, texts, time_text):
+            ax.draw_artist(artist)
+        yield np.array(canvas.buffer_rgba())
+
+
+def _write_gif(frames: Iterator[NDArray[np.uint8]], output_path: Path, fps: float) -> None:
+    """
+        Questa funzione salva i fotogrammi in una GIF con Pillow. La tavolozza viene calcolata una sola volta dal primo
+        fotogramma, che contiene già tutti i colori(mappa, percorsi, partenze e obiettivi degli agenti), e applicata
+        senza dithering agli altri; l'ottimizzazione delle differenze tra fotogrammi di Pillow è disattivata, dato che
+        ne domina il tempo di salvataggio. I fotogrammi successivi al primo vengono letti dal generatore durante il
+        salvataggio.
+    """
+    def to_image(frame: NDArray[np.uint8]) -> Image.Image:
+        return Image.frombuffer("RGBA", (frame.shape[1], frame.shape[0]), frame).convert("RGB")
+
+    first = to_image(next(frames))
+    palette = first.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    first.quantize(palette=palette, dither=Image.Dither.NONE).save(
+        output_path, save_all=True, duration=1000 / fps, loop=0, optimize=False,
+        append_images=(to_image(frame).quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames))
+
+
+def _write_mp4(frames: Iterator[NDArray[np.uint8]], output_path: Path, fps: float) -> None:
+    """
+        Questa funzione invia i fotogrammi, in formato RGBA grezzo, ad un processo ffmpeg che li codifica in H.264.
+        L'eseguibile è quello configurato in matplotlib(rcParams["animation.ffmpeg_path"]).
+    """
+    if not animation.FFMpegWriter.isAvailable():
+        raise RuntimeError("ffmpeg non è installato: impossibile salvare l'animazione in formato MP4, usare una GIF")
+    first = next(frames)
+    height, width = first.shape[:2]
+    command = [animation.FFMpegWriter.bin_path(), "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba",
+               "-s", f"{width}x{height}", "-r", str(fps), "-i", "-", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+               "-vcodec", "libx264", "-pix_fmt", "yuv420p", str(output_path)]
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+        process.stdin.write(first.tobytes())
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+        process.stdin.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg ha restituito il codice {process.returncode} salvando {output_path}")
+
+
+def save_animation(map: np.ndarray, agents: List[Agent], paths, output_path: Union[str, Path], fps: float = 5,
+                   stride: int = 1, max_frames: Optional[int] = None, dpi: int = 100,
+                   show_labels: Optional[bool] = None) -> int:
+    """
+        Questa funzione salva l'animazione dei percorsi in un file GIF o MP4(in base all'estensione di output_path),
+        senza display: funziona con qualsiasi backend di matplotlib, anche su macchine senza interfaccia grafica.
+
+        Gli argomenti della funzione sono:
+        -)map, agents, paths: come in plot_animation
+        -)output_path: file in cui salvare l'animazione(.gif oppure .mp4, quest'ultimo richiede ffmpeg)
+        -)fps: fotogrammi al secondo
+        -)stride, max_frames: si salva un istante di tempo ogni stride, senza superare max_frames fotogrammi(vedi
+        frame_indices); il tempo di esportazione è proporzionale al numero di fotogrammi.
+        -)dpi: risoluzione della figura(7x7 pollici)
+        -)show_labels: se True si mostra una label per agente(di default solo con al più MAX_LABELS agenti)
+
+        I fotogrammi vengono generati da render_frames e passati al file man mano che vengono disegnati.
+        La funzione solleva un'eccezione ValueError se paths è None o se il formato non è supportato, e restituisce
+        il numero di fotogrammi salvati.
+    """
+    output_path = Path(output_path)
+    if paths is None:
+        raise ValueError("Soluzione non trovata, impossibile generare l'animazione.")
+    if output_path.suffix.lower() not in ANIMATION_FORMATS:
+        raise ValueError(f"Formato dell'animazione {output_path.suffix!r} non supportato, usare {ANIMATION_FORMATS}")
+    horizon = max((len(path) for path in paths if path), default=0)
+    frames = frame_indices(horizon, stride, max_frames)
+    if not frames:
+        raise ValueError("Nessun percorso da animare.")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    rendered = render_frames(map, agents, paths, frames, dpi, show_labels)
+    if output_path.suffix.lower() == ".gif":
+        _write_gif(rendered, output_path, fps)
+    else:
+        _write_mp4(rendered, output_path, fps)
+    return len(frames)
@@ -0,0 +1,224 @@
+import heapq
+import time
+import numpy as np
+from typing import Optional, Tuple
+from numpy.typing import NDArray
+from reservation_table import ReservationTable
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NATIVE_AVAILABLE: bool = numba is not None
+
+FOUND = 0
+NOT_FOUND = 1
+ITERATION_LIMIT = 2
+DEADLINE_EXCEEDED = 3
+
+NO_DEADLINE: float = float("inf")
+
+GENERATED = 0
+REPUSHED = 1
+PRUNED_DUPLICATE = 2
+PRUNED_CONSTRAINT = 3
+PRUNED_DOMINATED = 4
+MAX_FRONTIER = 5
+N_COUNTERS = 6
+
+
+def _contains(sorted_keys: NDArray[np.int64], key: int) -> bool:
+    """
+        Questa funzione verifica, con una ricerca binaria, se la chiave è presente nell'array ordinato.
+    """
+    index = np.searchsorted(sorted_keys, key)
+    return index < sorted_keys.size and sorted_keys[index] == key
+
+
+def _is_move_allowed(from_cell: int, to_cell: int, time: int, vertex_keys: NDArray[np.int64],
+                     edge_keys: NDArray[np.int64], parked: NDArray[np.int64], n_cells: int, width: int) -> bool:
+    """
+        Questa funzione è la versione su array di ReservationTable.is_move_allowed.
+    """
+    if time >= parked[to_cell]:
+        return False
+    if _contains(vertex_keys, time * n_cells + to_cell):
+        return False
+    if from_cell == to_cell:
+        return True
+    delta = to_cell - from_cell
+    if delta == -width:
+        direction = 0
+    elif delta == width:
+        direction = 1
+    elif delta == -1:
+        direction = 2
+    else:
+        direction = 3
+    return not _contains(edge_keys, (time * n_cells + from_cell) * 4 + direction)
+
+
+def _now() -> float:
+    return time.perf_counter()
+
+
+def _search(adjacency: NDArray[np.int64], h_values: NDArray[np.int64], last_reserved: NDArray[np.int64],
+            vertex_keys: NDArray[np.int64], edge_keys: NDArray[np.int64], parked: NDArray[np.int64],
+            start_cell: int, goal_cell: int, goal_free_from: int, horizon: int, limit: int, width: int,
+            symmetry_breaking: bool, deadline: float, counters: NDArray[np.int64]) -> Tuple[int, int, NDArray[np.int64]]:
+    """
+        Questa funzione esegue il ciclo principale di A_Star sulle strutture ad array: ogni passo(ordine dei vicini,
+        potature, priorità della frontiera e numerazione dei nodi) coincide con quello dell'implementazione Python,
+        per cui i percorsi trovati e il numero di nodi espansi sono identici.
+
+        La frontiera contiene coppie (priorità, indice_nodo) invece di un unico intero, poiché la priorità con
+        symmetry_breaking potrebbe superare i 64 bit una volta spostata di FRONTIER_SHIFT.
+
+        I contatori della ricerca vengono sommati nell'array counters, nell'ordine di instrumentation.SEARCH_COUNTERS
+        (indici GENERATED, ..., MAX_FRONTIER); il loro aggiornamento ha un costo trascurabile nel codice compilato,
+        per cui viene eseguito sempre.
+
+        La funzione restituisce lo stato della ricerca(FOUND, NOT_FOUND, ITERATION_LIMIT, DEADLINE_EXCEEDED),
+        il numero di nodi espansi e, se il percorso è stato trovato, l'array delle celle del percorso.
+    """
+    n_cells = last_reserved.size
+    empty = np.empty(0, dtype=np.int64)
+    cells = [start_cell]
+    times = [0]
+    parents = [-1]
+    generated = {start_cell}
+    safe_state = np.full(n_cells, -1, dtype=np.int64)
+    if last_reserved[start_cell] < 0:
+        safe_state[start_cell] = 0
+    depth_range = horizon + 1 if symmetry_breaking else 1
+    start_priority = h_values[start_cell] * depth_range + (horizon if symmetry_breaking else 0)
+    frontier = [(start_priority, 0)]
+
+    iterations = 0
+    expanded_nodes = 0
+    count = 0
+    while len(frontier) > 0:
+        if iterations > limit:
+            return ITERATION_LIMIT, expanded_nodes, empty
+        iterations += 1
+        if deadline < NO_DEADLINE and iterations & 1023 == 0:
+            with numba.objmode(now="float64"):
+                now = _now()
+            if now > deadline:
+                return DEADLINE_EXCEEDED, expanded_nodes, empty
+        if len(frontier) > counters[MAX_FRONTIER]:
+            counters[MAX_FRONTIER] = len(frontier)
+
+        node = heapq.heappop(frontier)[1]
+        current_cell = cells[node]
+        current_time = times[node]
+        expanded_nodes += 1
+
+        if current_cell == goal_cell and current_time > goal_free_from:
+            path = np.empty(current_time + 1, dtype=np.int64)
+            while node >= 0:
+                path[times[node]] = cells[node]
+                node = parents[node]
+            return FOUND, expanded_nodes, path
+
+        if current_time >= horizon:
+            continue
+
+        next_time = current_time + 1
+        state_offset = next_time * n_cells
+        latest = last_reserved[current_cell]
+        for k in range(adjacency.shape[1]):
+            neighbor_cell = adjacency[current_cell, k]
+            if neighbor_cell >= 0 and last_reserved[neighbor_cell] > latest:
+                latest = last_reserved[neighbor_cell]
+        can_wait = current_time <= last_reserved[current_cell] or current_time < latest
+        for k in range(adjacency.shape[1]):
+            neighbor_cell = adjacency[current_cell, k]
+            if neighbor_cell < 0:
+                continue
+            if neighbor_cell == current_cell and not can_wait:
+                continue
+            neighbor_state = state_offset + neighbor_cell
+            if neighbor_state in generated:
+                counters[PRUNED_DUPLICATE] += 1
+                continue
+            h = h_values[neighbor_cell]
+            if h < 0:
+                continue
+            if not _is_move_allowed(current_cell, neighbor_cell, next_time, vertex_keys, edge_keys, parked,
+                                    n_cells, width):
+                counters[PRUNED_CONSTRAINT] += 1
+                continue
+            if next_time > last_reserved[neighbor_cell]:
+                safe_time = safe_state[neighbor_cell]
+                if safe_time < 0 or next_time < safe_time:
+                    safe_state[neighbor_cell] = next_time
+                elif neighbor_cell != current_cell:
+                    counters[PRUNED_DOMINATED] += 1
+                    continue
+
+            generated.add(neighbor_state)
+            count += 1
+            counters[GENERATED] += 1
+            cells.append(neighbor_cell)
+            times.append(next_time)
+            parents.append(node)
+            priority = (next_time + h) * depth_range + (horizon - next_time if symmetry_breaking else 0)
+            heapq.heappush(frontier, (priority, count))
+
+    return NOT_FOUND, expanded_nodes, empty
+
+
+if NATIVE_AVAILABLE:
+    _contains = numba.njit(cache=True)(_contains)
+    _is_move_allowed = numba.njit(cache=True)(_is_move_allowed)
+    _search = numba.njit(cache=True)(_search)
+
+
+def warm_up() -> None:
+    """
+        Questa funzione compila(o carica dalla cache di Numba) il kernel eseguendo una ricerca su una mappa di una
+        sola cella, in modo che il tempo di compilazione non venga incluso nei tempi misurati degli esperimenti.
+        Se Numba non è installato la funzione non fa nulla.
+    """
+    if not NATIVE_AVAILABLE:
+        return
+    single_cell = np.array([[-1, -1, -1, -1, 0]], dtype=np.int64)
+    zeros = np.zeros(1, dtype=np.int64)
+    no_keys = np.empty(0, dtype=np.int64)
+    for symmetry_breaking in (False, True):
+        _search(single_cell, zeros, zeros - 1, no_keys, no_keys, np.full(1, 1 << 60, dtype=np.int64),
+                0, 0, -1, 1, 1, 1, symmetry_breaking, NO_DEADLINE, np.zeros(N_COUNTERS, dtype=np.int64))
+
+
+def native_search(adjacency: NDArray[np.int64], h_values: NDArray[np.int_], reservations: ReservationTable,
+                  start_cell: int, goal_cell: int, goal_free_from: int, horizon: int, limit: int, width: int,
+                  symmetry_breaking: bool = False, deadline: float = NO_DEADLINE,
+                  counters: Optional[NDArray[np.int64]] = None) -> Tuple[int, int, NDArray[np.int64]]:
+    """
+        Questa funzione esegue la ricerca di A_Star con il kernel compilato da Numba. Viene chiamata da A_Star,
+        che calcola gli stessi argomenti(euristica, orizzonte, istante di liberazione dell'obiettivo) usati
+        dall'implementazione Python, e restituisce lo stato della ricerca, il numero di nodi espansi e le celle
+        del percorso.
+
+        Gli argomenti della funzione sono:
+        -)adjacency: tabella di adiacenza della mappa come array(grid_adjacency_array)
+        -)h_values: valori dell'euristica per cella(UNREACHABLE per le celle da cui l'obiettivo non è raggiungibile)
+        -)reservations: tabella delle prenotazioni, letta tramite ReservationTable.as_arrays
+        -)start_cell, goal_cell: indici piatti delle celle di partenza e obiettivo
+        -)goal_free_from: ultimo istante in cui la cella obiettivo è prenotata
+        -)horizon: orizzonte temporale calcolato da makespan_horizon
+        -)limit: numero massimo di iterazioni
+        -)width: larghezza della mappa
+        -)symmetry_breaking: riduzione dei percorsi simmetrici(vedi A_Star)
+        -)deadline: istante(misurato con time.perf_counter) oltre il quale la ricerca viene interrotta
+        -)counters: array di N_COUNTERS interi in cui sommare i contatori della ricerca(opzionale)
+    """
+    if not NATIVE_AVAILABLE:
+        raise RuntimeError("Numba non è installato: il kernel compilato non è disponibile")
+    vertex_keys, edge_keys, parked = reservations.as_arrays()
+    return _search(adjacency, np.ascontiguousarray(h_values, dtype=np.int64),
+                   np.frombuffer(reservations.last_reserved_times(), dtype=np.int64), vertex_keys, edge_keys, parked,
+                   start_cell, goal_cell, goal_free_from, horizon, limit, width, symmetry_breaking, deadline,
+                   np.zeros(N_COUNTERS, dtype=np.int64) if counters is None else counters)
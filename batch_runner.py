@@ -0,0 +1,243 @@
+import argparse
+import csv
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from agente import generate_agents
+from astar_native import warm_up
+from heuristic import HeuristicTables
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import prioritized_planning, max_iterations, LOW_LEVEL_SOLVERS
+from main import parse_agent_counts
+
+Job = Tuple[str, int, int]
+
+RESULT_FIELDS: List[str] = ["map", "seed", "agents", "status", "total cost", "expanded_nodes", "running_time", "error"]
+
+_worker_cache_dir: str = DEFAULT_CACHE_DIR
+_worker_maps: Dict[str, Tuple[NDArray[np.uint8], HeuristicTables]] = {}
+
+
+def _init_worker(cache_dir: str) -> None:
+    """
+        Questa funzione inizializza un processo worker, impostando la cartella della cache delle mappe
+        e compilando il kernel di A*(se Numba è installato) prima dell'esecuzione dei job.
+    """
+    global _worker_cache_dir
+    _worker_cache_dir = cache_dir
+    _worker_maps.clear()
+    warm_up()
+
+
+def _load_map(map_path: str) -> Tuple[NDArray[np.uint8], HeuristicTables]:
+    """
+        Questa funzione restituisce la mappa e le relative tabelle euristiche. Ogni worker carica una mappa
+        una sola volta(dalla cache su disco) e la riutilizza per tutti i job successivi sulla stessa mappa,
+        per cui ai job viene passato solo il percorso della mappa e non l'array.
+    """
+    loaded = _worker_maps.get(map_path)
+    if loaded is None:
+        cache = MapCache(map_path, _worker_cache_dir)
+        map = cache.load_map()
+        loaded = (map, cache.heuristic_tables(map))
+        _worker_maps[map_path] = loaded
+    return loaded
+
+
+def run_job(map_path: str, seed: int, k: int, max_agents: int, timeout: float,
+            iteration_limit: Optional[int] = None, low_level: str = "astar") -> Dict[str, Any]:
+    """
+        Questa funzione esegue un singolo esperimento(mappa, seed, k) all'interno di un worker.
+
+        Gli argomenti della funzione sono:
+        -)map_path: percorso della mappa
+        -)seed: seed usato per la generazione del pool di agenti
+        -)k: numero di agenti da pianificare(i primi k del pool)
+        -)max_agents: dimensione del pool di agenti
+        -)timeout: tempo massimo in secondi concesso al Prioritized Planning
+        -)iteration_limit: numero massimo di iterazioni di A* per ciascun agente
+        -)low_level: planner di basso livello("astar", "astar_symmetry", "astar_hpa" oppure "sipp")
+
+        La funzione restituisce una riga della tabella dei risultati, il cui campo status vale:
+        -)success: soluzione trovata
+        -)failure: il Prioritized Planning non ha trovato una soluzione
+        -)timeout: il tempo massimo è stato superato
+    """
+    map, heuristic = _load_map(map_path)
+    agents = generate_agents(map, max_num_agents=max_agents, seed=seed, heuristic=heuristic)[:k]
+    start_time = time.perf_counter()
+    pp_output = prioritized_planning(map, agents, iteration_limit=iteration_limit, heuristic=heuristic,
+                                     deadline=start_time + timeout, low_level=low_level)
+    running_time = time.perf_counter() - start_time
+    row = _empty_row(map_path, seed, k)
+    row["running_time"] = running_time
+    if pp_output is None:
+        row["status"] = "timeout" if running_time >= timeout else "failure"
+        return row
+    expanded_nodes, _, cost = pp_output
+    row.update({"status": "success", "total cost": cost, "expanded_nodes": expanded_nodes})
+    return row
+
+
+def _empty_row(map_path: str, seed: int, k: int) -> Dict[str, Any]:
+    return {"map": Path(map_path).stem, "seed": seed, "agents": k, "status": "", "total cost": None,
+            "expanded_nodes": None, "running_time": None, "error": ""}
+
+
+def _shutdown(executor: ProcessPoolExecutor) -> None:
+    """
+        Questa funzione chiude l'executor terminando anche i worker ancora occupati, necessario quando un job
+        supera il tempo massimo senza restituire il controllo.
+    """
+    processes = list(getattr(executor, "_processes", {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def run_sweep(map_paths: List[str], seeds: List[int], agent_counts: List[int], max_agents: int = 120,
+              workers: Optional[int] = None, timeout: float = 300.0, iteration_limit: Optional[int] = None,
+              cache_dir: str = DEFAULT_CACHE_DIR, grace: float = 30.0,
+              low_level: str = "astar") -> List[Dict[str, Any]]:
+    """
+        Questa funzione esegue in parallelo, tramite un ProcessPoolExecutor, tutti gli esperimenti ottenuti
+        combinando le mappe, i seed e i numeri di agenti indicati, e raccoglie i risultati in un'unica tabella.
+
+        Gli argomenti della funzione sono:
+        -)map_paths: percorsi delle mappe
+        -)seeds: seed da testare
+        -)agent_counts: numeri di agenti da testare
+        -)max_agents: dimensione del pool di agenti(default: 120)
+        -)workers: numero di processi(default: numero di CPU)
+        -)timeout: tempo massimo in secondi per ciascun job
+        -)iteration_limit: numero massimo di iterazioni di A* per ciascun agente
+        -)cache_dir: cartella della cache delle mappe, condivisa dai worker
+        -)grace: secondi concessi oltre al timeout prima di terminare forzatamente un worker
+        -)low_level: planner di basso livello("astar", "astar_symmetry", "astar_hpa" oppure "sipp")
+
+        Si offre una breve descrizione della funzione:
+        1)prima di avviare i worker si popola la cache di ciascuna mappa, in modo che i worker la leggano dal disco.
+        2)i job vengono inviati all'executor mantenendone in esecuzione al più uno per worker, cosi che l'istante di invio
+        corrisponda all'inizio dell'esecuzione.
+        3)il timeout viene rispettato in modo cooperativo dal Prioritized Planning(deadline); se un job non termina entro
+        timeout + grace viene registrato come timeout e i worker vengono riavviati.
+        4)se un worker termina in modo anomalo(BrokenProcessPool) non è possibile sapere quale dei job in esecuzione
+        ne sia la causa: tali job vengono ripetuti uno alla volta, e quello che termina di nuovo in modo anomalo viene
+        registrato come crash. In nessun caso la sweep viene interrotta.
+    """
+    workers = workers or os.cpu_count() or 1
+    for map_path in map_paths:
+        MapCache(map_path, cache_dir).load_map()
+    pending: List[Job] = [(map_path, seed, k) for map_path in map_paths for seed in seeds for k in agent_counts]
+    pending.reverse()
+    total = len(pending)
+    suspects: List[Job] = []
+    results: List[Dict[str, Any]] = []
+
+    def record(job: Job, row: Dict[str, Any]) -> None:
+        results.append(row)
+        print(f"[{len(results)}/{total}] {row['map']} seed={row['seed']} k={row['agents']}: {row['status']}")
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,))
+    running: Dict[Future, Tuple[Job, float]] = {}
+    isolated = False
+    try:
+        while pending or suspects or running:
+            if suspects:
+                if not running:
+                    job = suspects.pop()
+                    running[executor.submit(run_job, *job, max_agents, timeout, iteration_limit, low_level)] = (job, time.perf_counter())
+                    isolated = True
+            else:
+                while pending and len(running) < workers:
+                    job = pending.pop()
+                    running[executor.submit(run_job, *job, max_agents, timeout, iteration_limit, low_level)] = (job, time.perf_counter())
+                isolated = False
+
+            done, _ = wait(list(running), timeout=1.0, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job, _ = running.pop(future)
+                try:
+                    record(job, future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    if isolated:
+                        row = _empty_row(*job)
+                        row.update({"status": "crash", "error": "worker terminato in modo anomalo"})
+                        record(job, row)
+                    else:
+                        suspects.append(job)
+                except Exception as error:
+                    row = _empty_row(*job)
+                    row.update({"status": "error", "error": repr(error)})
+                    record(job, row)
+
+            now = time.perf_counter()
+            expired = [future for future, (_, submitted) in running.items() if now - submitted > timeout + grace]
+            if expired or broken:
+                for future in expired:
+                    job, submitted = running.pop(future)
+                    row = _empty_row(*job)
+                    row.update({"status": "timeout", "running_time": now - submitted})
+                    record(job, row)
+                for job, _ in running.values():
+                    (suspects if broken else pending).append(job)
+                running.clear()
+                _shutdown(executor)
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,))
+    finally:
+        _shutdown(executor)
+    results.sort(key=lambda row: (row["map"], row["seed"], row["agents"]))
+    return results
+
+
+def write_results(results: List[Dict[str, Any]], output_path: str) -> None:
+    """
+        Questa funzione salva la tabella dei risultati in formato CSV.
+    """
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esegui in parallelo gli esperimenti sul Prioritized Planning su più mappe e seed.")
+    parser.add_argument("--maps", type=str, nargs="+", default=["benchmarks/*.map"],
+                        help="Percorsi(o pattern glob) delle mappe da testare (default: benchmarks/*.map)")
+    parser.add_argument("--seeds", type=parse_agent_counts, default=[0],
+                        help="Lista di seed separati da virgola, ad esempio: 0,1,2 (default: 0)")
+    parser.add_argument("--agent_counts", type=parse_agent_counts, required=True,
+                        help="Lista di numeri di agenti separati da virgola, ad esempio: 5,10,15")
+    parser.add_argument("--max_agents", type=int, default=120, help="Numero massimo di agenti da generare nel pool (default: 120)")
+    parser.add_argument("--workers", type=int, default=None, help="Numero di processi (default: numero di CPU)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Tempo massimo in secondi per ciascun job (default: 300)")
+    parser.add_argument("--max_iterations", type=int, default=max_iterations,
+                        help=f"Numero massimo di iterazioni di A* per ciascun agente (default: {max_iterations})")
+    parser.add_argument("--low_level", type=str, choices=LOW_LEVEL_SOLVERS, default="astar",
+                        help="Planner di basso livello per il singolo agente (default: astar)")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--output", type=str, default="results/sweep.csv", help="File CSV dei risultati (default: results/sweep.csv)")
+    args = parser.parse_args()
+
+    map_paths = sorted({path for pattern in args.maps for path in (glob.glob(pattern) or [pattern])})
+    results = run_sweep(map_paths, args.seeds, args.agent_counts, max_agents=args.max_agents, workers=args.workers,
+                        timeout=args.timeout, iteration_limit=args.max_iterations, cache_dir=args.cache_dir,
+                        low_level=args.low_level)
+    write_results(results, args.output)
+    successes = sum(1 for row in results if row["status"] == "success")
+    print(f"\n{successes}/{len(results)} esperimenti risolti. Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import glob
+import time
+from pathlib import Path
+from typing import Any, Dict
+from agente import generate_agents
+from astar_native import warm_up
+from heuristic import HeuristicTables
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import A_Star
+from reservation_table import ReservationTable
+
+
+def benchmark_map(map_path: str, k: int, seed: int = 0, cache_dir: str = DEFAULT_CACHE_DIR,
+                  cluster_size: int = 16) -> Dict[str, Any]:
+    """
+        Questa funzione confronta, su una mappa, la latenza delle singole ricerche di A* sull'intera mappa e di A*
+        limitato al corridoio del percorso astratto HPA*(hierarchy.ClusterGraph), per k agenti senza prenotazioni.
+
+        Per A* il tempo comprende il calcolo della tabella delle distanze reali verso l'obiettivo, proporzionale
+        all'area della mappa(le tabelle non vengono lette dalla cache); per HPA* comprende il percorso astratto, il
+        corridoio e la ricerca nel corridoio. Il tempo di costruzione del grafo astratto, pagato una sola volta per
+        mappa, viene riportato a parte.
+
+        La funzione restituisce una riga con il tempo di costruzione, i tempi medi per ricerca, i nodi espansi e i costi
+        totali delle due varianti.
+    """
+    cache = MapCache(map_path, cache_dir)
+    map = cache.load_map()
+    start_time = time.perf_counter()
+    graph = cache.cluster_graph(map, cluster_size)
+    row: Dict[str, Any] = {"map": Path(map_path).stem, "build_time": time.perf_counter() - start_time,
+                           "abstract_nodes": len(graph.nodes), "time_astar": 0.0, "time_hpa": 0.0,
+                           "expanded_astar": 0, "expanded_hpa": 0, "cost_astar": 0, "cost_hpa": 0}
+    agents = generate_agents(map, max_num_agents=k, seed=seed)
+    heuristic = HeuristicTables(map)
+    reservations = ReservationTable(*map.shape)
+    for agent in agents:
+        start_time = time.perf_counter()
+        astar_output = A_Star(map, agent, reservations, heuristic=heuristic)
+        row["time_astar"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        corridor = graph.corridor(agent.start_position, agent.goal_position)
+        hpa_output = None if corridor is None else A_Star(map, agent, reservations, corridor=corridor)
+        row["time_hpa"] += time.perf_counter() - start_time
+        for output, suffix in ((astar_output, "astar"), (hpa_output, "hpa")):
+            if output is not None:
+                row[f"expanded_{suffix}"] += output[0]
+                row[f"cost_{suffix}"] += output[2]
+    row["time_astar"] /= max(len(agents), 1)
+    row["time_hpa"] /= max(len(agents), 1)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confronta la latenza di A* sull'intera mappa e di A* limitato al corridoio HPA*.")
+    parser.add_argument("--maps", type=str, nargs="+", default=["benchmarks/*.map"],
+                        help="Percorsi(o pattern glob) delle mappe da testare (default: benchmarks/*.map)")
+    parser.add_argument("--agents", type=int, default=40, help="Numero di agenti per mappa (default: 40)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed per la generazione degli agenti (default: 0)")
+    parser.add_argument("--cluster_size", type=int, default=16, help="Lato dei cluster in celle (default: 16)")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    warm_up()
+    map_paths = sorted({path for pattern in args.maps for path in (glob.glob(pattern) or [pattern])})
+    print(f"{'mappa':<22}{'nodi astr.':>11}{'costruz.':>10}{'ms A*':>9}{'ms HPA*':>9}{'nodi A*':>10}{'nodi HPA*':>11}{'costo A*':>10}{'costo HPA*':>12}")
+    for map_path in map_paths:
+        row = benchmark_map(map_path, args.agents, seed=args.seed, cache_dir=args.cache_dir, cluster_size=args.cluster_size)
+        print(f"{row['map']:<22}{row['abstract_nodes']:>11}{row['build_time']:>10.2f}{row['time_astar'] * 1000:>9.2f}"
+              f"{row['time_hpa'] * 1000:>9.2f}{row['expanded_astar']:>10}{row['expanded_hpa']:>11}{row['cost_astar']:>10}{row['cost_hpa']:>12}")
+
+
+if __name__ == "__main__":
+    main()
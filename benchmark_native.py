@@ -0,0 +1,80 @@
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from agente import generate_agents
+from astar_native import NATIVE_AVAILABLE
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import A_Star
+from reservation_table import ReservationTable
+
+
+def check_parity(map_path: str, k: int, seed: int = 0, cache_dir: str = DEFAULT_CACHE_DIR,
+                 symmetry_breaking: bool = False) -> Dict[str, Any]:
+    """
+        Questa funzione verifica, su una mappa, che il kernel compilato(astar_native) e l'implementazione Python di
+        A_Star restituiscano lo stesso risultato per ciascuno dei k agenti pianificati in ordine di priorità.
+
+        Per ogni agente entrambe le implementazioni vengono eseguite sulla stessa tabella delle prenotazioni, e si
+        confrontano nodi espansi, percorso e costo; il percorso viene poi prenotato come nel Prioritized Planning.
+
+        La funzione restituisce una riga con il numero di agenti confrontati, il numero di risultati diversi e i
+        tempi totali delle due implementazioni.
+    """
+    cache = MapCache(map_path, cache_dir)
+    map = cache.load_map()
+    heuristic = cache.heuristic_tables(map)
+    agents = generate_agents(map, max_num_agents=k, seed=seed, heuristic=heuristic)
+    reservations = ReservationTable(*map.shape)
+    row: Dict[str, Any] = {"map": Path(map_path).stem, "agents": 0, "mismatches": 0, "time_python": 0.0, "time_native": 0.0}
+    for agent in agents:
+        start_time = time.perf_counter()
+        python_output = A_Star(map, agent, reservations, heuristic=heuristic, symmetry_breaking=symmetry_breaking, native=False)
+        row["time_python"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        native_output = A_Star(map, agent, reservations, heuristic=heuristic, symmetry_breaking=symmetry_breaking, native=True)
+        row["time_native"] += time.perf_counter() - start_time
+        row["agents"] += 1
+        if python_output != native_output:
+            row["mismatches"] += 1
+        if python_output is None:
+            break
+        reservations.reserve_path(python_output[1])
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica che il kernel compilato di A* dia gli stessi risultati dell'implementazione Python.")
+    parser.add_argument("--maps", type=str, nargs="+", default=["benchmarks/*.map"],
+                        help="Percorsi(o pattern glob) delle mappe da testare (default: benchmarks/*.map)")
+    parser.add_argument("--agents", type=int, default=40, help="Numero di agenti per mappa (default: 40)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed per la generazione degli agenti (default: 0)")
+    parser.add_argument("--symmetry_breaking", action="store_true", help="Confronta la variante con riduzione dei percorsi simmetrici")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    if not NATIVE_AVAILABLE:
+        print("Numba non è installato: il kernel compilato non è disponibile")
+        sys.exit(1)
+
+    map_paths = sorted({path for pattern in args.maps for path in (glob.glob(pattern) or [pattern])})
+    rows: List[Dict[str, Any]] = []
+    print(f"{'mappa':<22}{'agenti':>8}{'differenze':>12}{'tempo Python':>14}{'tempo Numba':>13}")
+    for map_path in map_paths:
+        row = check_parity(map_path, args.agents, seed=args.seed, cache_dir=args.cache_dir,
+                           symmetry_breaking=args.symmetry_breaking)
+        rows.append(row)
+        print(f"{row['map']:<22}{row['agents']:>8}{row['mismatches']:>12}{row['time_python']:>14.3f}{row['time_native']:>13.3f}")
+
+    mismatches = sum(row["mismatches"] for row in rows)
+    if mismatches:
+        print(f"\n{mismatches} risultati diversi tra il kernel compilato e l'implementazione Python")
+        sys.exit(1)
+    print("\nIl kernel compilato e l'implementazione Python restituiscono gli stessi percorsi su tutte le mappe")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import csv
+import glob
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent
+from astar_native import NATIVE_AVAILABLE, warm_up
+from heuristic import HeuristicTables
+from main import parse_agent_counts
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import prioritized_planning, max_iterations, LOW_LEVEL_SOLVERS
+from scenario import find_scenarios, generate_scenario, read_scenario
+from validation import is_valid_solution
+
+SUITE_FIELDS: List[str] = ["map", "scenario", "agents", "low_level", "success", "valid", "runtime", "expanded_nodes",
+                           "total_cost", "makespan", "peak_memory_mb", "error"]
+
+Regression = Tuple[str, str, Any, Any]
+
+
+def run_case(map: NDArray[np.int_], agents: List[Agent], heuristic: HeuristicTables, timeout: float,
+             iteration_limit: Optional[int] = None, low_level: str = "astar",
+             measure_memory: bool = True) -> Dict[str, Any]:
+    """
+        Questa funzione esegue il Prioritized Planning su un'istanza e ne misura le metriche:
+        -)success: True se è stata trovata una soluzione entro timeout secondi
+        -)valid: True se la soluzione è priva di conflitti(validation.is_valid_solution)
+        -)runtime: tempo di esecuzione in secondi(time.perf_counter)
+        -)expanded_nodes, total_cost e makespan(istante di arrivo dell'ultimo agente) della soluzione
+        -)peak_memory_mb: picco di memoria allocata durante la pianificazione, misurato con tracemalloc
+
+        Dato che tracemalloc rallenta l'esecuzione, il picco di memoria viene misurato in una seconda esecuzione,
+        identica alla prima perché il Prioritized Planning è deterministico; il runtime si riferisce sempre
+        all'esecuzione senza tracemalloc. La memoria allocata dal kernel compilato(astar_native) non viene contata.
+    """
+    start_time = time.perf_counter()
+    pp_output = prioritized_planning(map, agents, iteration_limit=iteration_limit, heuristic=heuristic,
+                                     deadline=start_time + timeout, low_level=low_level)
+    row: Dict[str, Any] = {"agents": len(agents), "low_level": low_level, "success": pp_output is not None,
+                           "valid": None, "runtime": time.perf_counter() - start_time, "expanded_nodes": None,
+                           "total_cost": None, "makespan": None, "peak_memory_mb": None, "error": ""}
+    if pp_output is not None:
+        expanded_nodes, paths, cost = pp_output
+        row.update({"valid": is_valid_solution(paths, map), "expanded_nodes": expanded_nodes, "total_cost": cost,
+                    "makespan": max((len(path) - 1 for path in paths), default=0)})
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            prioritized_planning(map, agents, iteration_limit=iteration_limit, heuristic=heuristic,
+                                 deadline=time.perf_counter() + timeout, low_level=low_level)
+            row["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return row
+
+
+def run_suite(map_paths: List[str], agent_counts: List[int], low_level: str = "astar", timeout: float = 60.0,
+              iteration_limit: Optional[int] = None, generated_scenarios: int = 1, scenario_agents: int = 1000,
+              scenario_dir: Optional[str] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+              measure_memory: bool = True) -> List[Dict[str, Any]]:
+    """
+        Questa funzione esegue la matrice di esperimenti mappe x scenari x numeri di agenti, uno alla volta nello
+        stesso processo in modo che i tempi siano confrontabili tra esecuzioni diverse.
+
+        Gli argomenti della funzione sono:
+        -)map_paths: percorsi delle mappe
+        -)agent_counts: numeri di agenti da testare; con k agenti si usano i primi k agenti dello scenario, come
+        negli esperimenti del benchmark MovingAI
+        -)low_level, timeout, iteration_limit: planner di basso livello, tempo massimo in secondi per esperimento e
+        numero massimo di iterazioni per agente
+        -)generated_scenarios: se nella cartella della mappa non ci sono scenari MovingAI(find_scenarios) se ne
+        generano questo numero, con i seed 1, 2, ...(scenario.generate_scenario)
+        -)scenario_agents: numero di agenti degli scenari generati
+        -)scenario_dir: cartella in cui cercare e salvare gli scenari(default: la cartella della mappa)
+        -)cache_dir: cartella della cache delle mappe
+        -)measure_memory: se False il picco di memoria non viene misurato(vedi run_case)
+
+        La funzione restituisce le righe della tabella dei risultati(campi SUITE_FIELDS). Un esperimento che
+        richiede più agenti di quelli dello scenario viene registrato come fallito, con il motivo nel campo error.
+    """
+    warm_up()
+    rows: List[Dict[str, Any]] = []
+    for map_path in map_paths:
+        cache = MapCache(map_path, cache_dir)
+        map = cache.load_map()
+        heuristic = cache.heuristic_tables(map)
+        lookup_path = Path(map_path) if scenario_dir is None else Path(scenario_dir) / Path(map_path).name
+        scenario_paths = find_scenarios(lookup_path)
+        if not scenario_paths:
+            scenario_paths = [generate_scenario(map_path, map, scenario_agents, seed, heuristic=heuristic,
+                                                output_dir=scenario_dir)
+                              for seed in range(1, generated_scenarios + 1)]
+        for scenario_path in scenario_paths:
+            agents = read_scenario(scenario_path, map)
+            for k in agent_counts:
+                if k > len(agents):
+                    row = {field: None for field in SUITE_FIELDS}
+                    row.update({"agents": k, "low_level": low_level, "success": False,
+                                "error": f"lo scenario contiene solo {len(agents)} agenti"})
+                else:
+                    row = run_case(map, agents[:k], heuristic, timeout, iteration_limit=iteration_limit,
+                                   low_level=low_level, measure_memory=measure_memory)
+                row.update({"map": Path(map_path).stem, "scenario": scenario_path.name})
+                rows.append(row)
+                outcome = "successo" if row["success"] else "fallimento"
+                if row["runtime"] is not None:
+                    outcome += f" in {row['runtime']:.3f}s"
+                print(f"{row['map']} {row['scenario']} k={k}: {outcome}")
+    return rows
+
+
+def _metadata(low_level: str) -> Dict[str, Any]:
+    """
+        Questa funzione restituisce le informazioni sull'ambiente di esecuzione salvate insieme ai risultati, utili per
+        capire se due esecuzioni sono confrontabili.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"date": datetime.now().isoformat(timespec="seconds"), "commit": commit, "low_level": low_level,
+            "python": platform.python_version(), "numpy": np.__version__, "numba": NATIVE_AVAILABLE,
+            "platform": platform.platform()}
+
+
+def write_suite_results(rows: List[Dict[str, Any]], output_path: str, low_level: str = "astar") -> None:
+    """
+        Questa funzione salva i risultati in formato JSON(con le informazioni sull'ambiente di esecuzione) e in formato
+        CSV, nello stesso percorso con estensione .csv.
+    """
+    output = Path(output_path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"metadata": _metadata(low_level), "results": rows}, indent=2))
+    with open(output.with_suffix(".csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUITE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def compare_results(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]], time_tolerance: float = 0.25,
+                    memory_tolerance: float = 0.25, min_time: float = 0.05) -> List[Regression]:
+    """
+        Questa funzione confronta i risultati di due esecuzioni della suite, abbinando le righe con la stessa mappa,
+        lo stesso scenario, lo stesso numero di agenti e lo stesso planner di basso livello.
+
+        Viene segnalata una regressione quando:
+        -)un esperimento risolto nella baseline non è più risolto, oppure la soluzione non è più valida
+        -)il costo totale, il makespan oppure il numero di nodi espansi aumentano(il Prioritized Planning è
+        deterministico, per cui ogni differenza è dovuta al codice)
+        -)il runtime aumenta più di time_tolerance(in proporzione) e di min_time secondi, per non segnalare il rumore
+        delle misure sugli esperimenti molto brevi
+        -)il picco di memoria aumenta più di memory_tolerance(in proporzione)
+
+        La funzione restituisce la lista delle regressioni come tuple (esperimento, metrica, valore nella baseline,
+        valore attuale).
+    """
+    def key(row: Dict[str, Any]) -> Tuple[Any, ...]:
+        return row["map"], row["scenario"], row["agents"], row["low_level"]
+
+    current_rows = {key(row): row for row in current}
+    regressions: List[Regression] = []
+    for old in baseline:
+        new = current_rows.get(key(old))
+        if new is None or not old["success"]:
+            continue
+        name = f"{old['map']}/{old['scenario']}/k={old['agents']}/{old['low_level']}"
+        if not new["success"]:
+            regressions.append((name, "success", True, False))
+            continue
+        if old["valid"] and not new["valid"]:
+            regressions.append((name, "valid", True, new["valid"]))
+        for metric in ("total_cost", "makespan", "expanded_nodes"):
+            if new[metric] > old[metric]:
+                regressions.append((name, metric, old[metric], new[metric]))
+        if new["runtime"] > old["runtime"] * (1 + time_tolerance) and new["runtime"] - old["runtime"] > min_time:
+            regressions.append((name, "runtime", round(old["runtime"], 3), round(new["runtime"], 3)))
+        if (old["peak_memory_mb"] is not None and new["peak_memory_mb"] is not None
+                and new["peak_memory_mb"] > old["peak_memory_mb"] * (1 + memory_tolerance)):
+            regressions.append((name, "peak_memory_mb", round(old["peak_memory_mb"], 2), round(new["peak_memory_mb"], 2)))
+    return regressions
+
+
+def _load_results(path: str) -> List[Dict[str, Any]]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite di benchmark riproducibile del Prioritized Planning sugli scenari MovingAI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Esegue la matrice di esperimenti e salva i risultati in JSON e CSV")
+    run_parser.add_argument("--maps", type=str, nargs="+", default=["benchmarks/*.map"],
+                            help="Percorsi(o pattern glob) delle mappe da testare (default: benchmarks/*.map)")
+    run_parser.add_argument("--agent_counts", type=parse_agent_counts, required=True,
+                            help="Lista di numeri di agenti separati da virgola, ad esempio: 10,20,40")
+    run_parser.add_argument("--low_level", type=str, choices=LOW_LEVEL_SOLVERS, default="astar",
+                            help="Planner di basso livello per il singolo agente (default: astar)")
+    run_parser.add_argument("--timeout", type=float, default=60.0, help="Tempo massimo in secondi per esperimento (default: 60)")
+    run_parser.add_argument("--max_iterations", type=int, default=max_iterations,
+                            help=f"Numero massimo di iterazioni di A* per ciascun agente (default: {max_iterations})")
+    run_parser.add_argument("--scenarios", type=int, default=1,
+                            help="Scenari generati per le mappe senza file .scen, con seed 1, 2, ... (default: 1)")
+    run_parser.add_argument("--scenario_agents", type=int, default=1000,
+                            help="Numero di agenti degli scenari generati (default: 1000)")
+    run_parser.add_argument("--scenario_dir", type=str, default=None,
+                            help="Cartella degli scenari (default: la cartella della mappa)")
+    run_parser.add_argument("--no_memory", action="store_true", help="Non misura il picco di memoria")
+    run_parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                            help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    run_parser.add_argument("--output", type=str, default="results/benchmark.json",
+                            help="File JSON dei risultati; il CSV viene salvato con lo stesso nome (default: results/benchmark.json)")
+
+    compare_parser = commands.add_parser("compare", help="Confronta due esecuzioni e segnala le regressioni")
+    compare_parser.add_argument("baseline", type=str, help="File JSON della baseline")
+    compare_parser.add_argument("current", type=str, help="File JSON dell'esecuzione da confrontare")
+    compare_parser.add_argument("--time_tolerance", type=float, default=0.25,
+                                help="Aumento relativo del runtime tollerato (default: 0.25)")
+    compare_parser.add_argument("--memory_tolerance", type=float, default=0.25,
+                                help="Aumento relativo del picco di memoria tollerato (default: 0.25)")
+    compare_parser.add_argument("--min_time", type=float, default=0.05,
+                                help="Aumento minimo del runtime, in secondi, per segnalare una regressione (default: 0.05)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        map_paths = sorted({path for pattern in args.maps for path in (glob.glob(pattern) or [pattern])})
+        rows = run_suite(map_paths, args.agent_counts, low_level=args.low_level, timeout=args.timeout,
+                         iteration_limit=args.max_iterations, generated_scenarios=args.scenarios,
+                         scenario_agents=args.scenario_agents, scenario_dir=args.scenario_dir,
+                         cache_dir=args.cache_dir, measure_memory=not args.no_memory)
+        write_suite_results(rows, args.output, args.low_level)
+        successes = sum(1 for row in rows if row["success"])
+        print(f"\n{successes}/{len(rows)} esperimenti risolti. Risultati salvati in {args.output}")
+        return
+
+    regressions = compare_results(_load_results(args.baseline), _load_results(args.current),
+                                  time_tolerance=args.time_tolerance, memory_tolerance=args.memory_tolerance,
+                                  min_time=args.min_time)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSIONE {name}: {metric} {old} -> {new}")
+    if regressions:
+        print(f"\n{len(regressions)} regressioni rispetto a {args.baseline}")
+        sys.exit(1)
+    print(f"Nessuna regressione rispetto a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
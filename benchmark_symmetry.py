@@ -0,0 +1,74 @@
+import argparse
+import csv
+import glob
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from agente import generate_agents
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import prioritized_planning
+
+BENCHMARK_FIELDS: List[str] = ["map", "agents", "expanded_astar", "expanded_symmetry", "reduction",
+                               "time_astar", "time_symmetry", "cost_astar", "cost_symmetry"]
+
+
+def benchmark_map(map_path: str, k: int, seed: int = 0, cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """
+        Questa funzione confronta, su una mappa, il Prioritized Planning con A* standard(low_level="astar") e con A*
+        con riduzione dei percorsi simmetrici(low_level="astar_symmetry"), sullo stesso insieme di k agenti.
+
+        La funzione restituisce una riga con i nodi espansi, i tempi di esecuzione e i costi delle due varianti,
+        insieme alla riduzione percentuale dei nodi espansi. I costi devono coincidere, poiché entrambe le varianti
+        trovano percorsi ottimi.
+    """
+    cache = MapCache(map_path, cache_dir)
+    map = cache.load_map()
+    heuristic = cache.heuristic_tables(map)
+    agents = generate_agents(map, max_num_agents=k, seed=seed, heuristic=heuristic)
+    row: Dict[str, Any] = {"map": Path(map_path).stem, "agents": len(agents)}
+    for low_level, suffix in (("astar", "astar"), ("astar_symmetry", "symmetry")):
+        start_time = time.perf_counter()
+        pp_output = prioritized_planning(map, agents, heuristic=heuristic, low_level=low_level)
+        row[f"time_{suffix}"] = round(time.perf_counter() - start_time, 3)
+        row[f"expanded_{suffix}"], _, row[f"cost_{suffix}"] = pp_output if pp_output is not None else (None, None, None)
+    if row["expanded_astar"] and row["expanded_symmetry"] is not None:
+        row["reduction"] = f"{100 * (1 - row['expanded_symmetry'] / row['expanded_astar']):.1f}%"
+    else:
+        row["reduction"] = None
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confronta i nodi espansi da A* con e senza riduzione dei percorsi simmetrici.")
+    parser.add_argument("--maps", type=str, nargs="+", default=["benchmarks/*.map"],
+                        help="Percorsi(o pattern glob) delle mappe da testare (default: benchmarks/*.map)")
+    parser.add_argument("--agents", type=int, default=40, help="Numero di agenti per mappa (default: 40)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed per la generazione degli agenti (default: 0)")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--output", type=str, default=None, help="File CSV in cui salvare la tabella (opzionale)")
+    args = parser.parse_args()
+
+    map_paths = sorted({path for pattern in args.maps for path in (glob.glob(pattern) or [pattern])})
+    rows: List[Dict[str, Any]] = []
+    print(f"{'mappa':<22}{'nodi A*':>12}{'nodi simm.':>12}{'riduzione':>11}{'tempo A*':>10}{'tempo simm.':>12}")
+    for map_path in map_paths:
+        row = benchmark_map(map_path, args.agents, seed=args.seed, cache_dir=args.cache_dir)
+        rows.append(row)
+        print(f"{row['map']:<22}{str(row['expanded_astar']):>12}{str(row['expanded_symmetry']):>12}"
+              f"{str(row['reduction']):>11}{row['time_astar']:>10}{row['time_symmetry']:>12}")
+        if row["cost_astar"] != row["cost_symmetry"]:
+            print(f"  attenzione: costi diversi ({row['cost_astar']} e {row['cost_symmetry']})")
+
+    if args.output is not None:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=BENCHMARK_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nTabella salvata in {output}")
+
+
+if __name__ == "__main__":
+    main()
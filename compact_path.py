@@ -0,0 +1,155 @@
+from bisect import bisect_right
+from typing import Iterator, List, Sequence, Tuple, Union
+import numpy as np
+from numpy.typing import NDArray
+
+Position = Tuple[int, int]
+PathStep = Tuple[Position, int]
+
+
+class CompactPath:
+    """
+        Questa classe rappresenta in forma compatta il percorso di un agente, equivalente alla lista di coppie
+        ((riga, colonna), t), con una posizione per ogni istante di tempo t = 0, 1, ..., len - 1.
+
+        Il percorso è codificato per sequenze(run-length): due array NumPy int32 paralleli contengono, per ogni
+        sequenza di istanti trascorsi nella stessa cella, l'indice piatto della cella(riga * larghezza + colonna) e
+        l'istante di arrivo. Le attese(WAIT) non occupano memoria aggiuntiva, e un percorso senza attese occupa 8 byte
+        per passo invece di tre tuple Python.
+
+        La classe si comporta come una sequenza di sola lettura di coppie ((riga, colonna), t): len, indicizzazione
+        (anche negativa o con slice), iterazione(le tuple vengono create solo quando vengono lette) e confronto con
+        una lista, per cui il codice che legge i percorsi come liste continua a funzionare. In più offre:
+        -)cell_at e position_at: la cella(o la posizione) all'istante t, con l'agente parcheggiato nell'ultima cella
+        dopo l'arrivo. Per un percorso senza attese l'accesso è O(1), altrimenti è una ricerca binaria sulle sequenze.
+        -)runs: le sequenze (cella, arrivo, partenza), usate da ReservationTable.reserve_path
+        -)to_cells e to_positions: l'esportazione di tutte le celle o posizioni come array NumPy, usata da
+        validation.pack_paths(verifica dei conflitti e animazione)
+        -)to_list: la lista di coppie ((riga, colonna), t)
+    """
+    __slots__ = ("cells", "arrivals", "length", "width")
+
+    def __init__(self, cells: NDArray[np.int32], arrivals: NDArray[np.int32], length: int, width: int):
+        """
+            Questa funzione crea il percorso a partire dalle sequenze già compattate: celle consecutive diverse,
+            istanti di arrivo crescenti a partire da 0 e numero di istanti del percorso(length) maggiore dell'ultimo
+            arrivo. Per costruire un percorso si usano di solito from_cells, from_runs oppure from_path.
+        """
+        self.cells = cells
+        self.arrivals = arrivals
+        self.length = length
+        self.width = width
+
+    @classmethod
+    def from_cells(cls, cells: Union[Sequence[int], NDArray[np.int_]], width: int) -> "CompactPath":
+        """
+            Questa funzione costruisce il percorso dalle celle(indici piatti) occupate in ogni istante di tempo,
+            come quelle ricostruite da A_Star.
+        """
+        cells = np.asarray(cells, dtype=np.int32)
+        starts = np.flatnonzero(cells[1:] != cells[:-1]).astype(np.int32) + 1
+        starts = np.concatenate((np.zeros(min(len(cells), 1), dtype=np.int32), starts))
+        return cls(cells[starts], starts, len(cells), width)
+
+    @classmethod
+    def from_runs(cls, cells: Sequence[int], arrivals: Sequence[int], length: int, width: int) -> "CompactPath":
+        """
+            Questa funzione costruisce il percorso dalle celle visitate e dai rispettivi istanti di arrivo, come quelli
+            ricostruiti da SIPP; due sequenze consecutive nella stessa cella vengono unite.
+        """
+        cells = np.asarray(cells, dtype=np.int32)
+        arrivals = np.asarray(arrivals, dtype=np.int32)
+        keep = np.ones(len(cells), dtype=bool)
+        keep[1:] = cells[1:] != cells[:-1]
+        return cls(cells[keep], arrivals[keep], length, width)
+
+    @classmethod
+    def from_path(cls, path: Sequence[PathStep], width: int) -> "CompactPath":
+        """
+            Questa funzione converte un percorso nel formato a lista((riga, colonna), t), con gli istanti consecutivi
+            a partire da 0. Un CompactPath viene restituito senza copiarlo.
+        """
+        if isinstance(path, CompactPath):
+            return path
+        return cls.from_cells([row * width + column for (row, column), _ in path], width)
+
+    def cell_at(self, time: int) -> int:
+        """
+            Questa funzione restituisce la cella occupata all'istante indicato; dopo l'arrivo l'agente resta
+            parcheggiato nell'ultima cella.
+        """
+        if time >= self.length:
+            return int(self.cells[-1])
+        if len(self.cells) == self.length:
+            return int(self.cells[time])
+        return int(self.cells[bisect_right(self.arrivals, time) - 1])
+
+    def position_at(self, time: int) -> Position:
+        """
+            Questa funzione restituisce la posizione (riga, colonna) occupata all'istante indicato(vedi cell_at).
+        """
+        return divmod(self.cell_at(time), self.width)
+
+    def runs(self) -> Iterator[Tuple[int, int, int]]:
+        """
+            Questa funzione restituisce le sequenze del percorso come terne (cella, arrivo, partenza): l'agente occupa
+            la cella negli istanti arrivo, ..., partenza - 1.
+        """
+        arrivals = self.arrivals.tolist()
+        return zip(self.cells.tolist(), arrivals, arrivals[1:] + [self.length])
+
+    def to_cells(self) -> NDArray[np.int32]:
+        """
+            Questa funzione restituisce l'array delle celle occupate in ogni istante di tempo. Se il percorso non
+            contiene attese l'array restituito è quello interno, che non deve essere modificato.
+        """
+        if len(self.cells) == self.length:
+            return self.cells
+        return np.repeat(self.cells, np.diff(np.append(self.arrivals, np.int32(self.length))))
+
+    def to_positions(self) -> NDArray[np.int32]:
+        """
+            Questa funzione restituisce l'array(len, 2) delle posizioni (riga, colonna) in ogni istante di tempo.
+        """
+        return np.stack(np.divmod(self.to_cells(), self.width), axis=1)
+
+    def to_list(self) -> List[PathStep]:
+        """
+            Questa funzione restituisce il percorso come lista di coppie ((riga, colonna), t).
+        """
+        return list(self)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[PathStep]:
+        width = self.width
+        for cell, arrival, departure in self.runs():
+            position = divmod(cell, width)
+            for time in range(arrival, departure):
+                yield position, time
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[PathStep, List[PathStep]]:
+        if isinstance(index, slice):
+            return [(self.position_at(time), time) for time in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("Indice del percorso fuori dall'intervallo")
+        return self.position_at(index), index
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompactPath):
+            return (self.length == other.length and self.width == other.width
+                    and np.array_equal(self.cells, other.cells) and np.array_equal(self.arrivals, other.arrivals))
+        if isinstance(other, (list, tuple)):
+            return len(other) == self.length and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CompactPath({self.length} istanti, {len(self.cells)} sequenze)"
+
+
+AgentPath = Union[List[PathStep], CompactPath]
@@ -0,0 +1,205 @@
+import heapq
+import math
+import time
+import numpy as np
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+from numpy.typing import NDArray
+from agente import Agent
+from heuristic import HeuristicTables, UNREACHABLE
+from reservation_table import ReservationTable
+from compact_path import CompactPath
+from astar_native import FOUND, NOT_FOUND, ITERATION_LIMIT, DEADLINE_EXCEEDED
+from instrumentation import SearchStats
+from prioritized_planning import (grid_adjacency, makespan_horizon, reconstruct_path, max_iterations, FRONTIER_SHIFT,
+                                  FRONTIER_MASK)
+
+DEFAULT_SUBOPTIMALITY: float = 1.5
+
+
+def Focal_Search(map: NDArray[np.int_], agente: Agent, reservations: ReservationTable,
+                 iteration_limit: Optional[int] = None, heuristic: Optional[HeuristicTables] = None,
+                 deadline: Optional[float] = None, suboptimality: float = DEFAULT_SUBOPTIMALITY,
+                 stats: Optional[SearchStats] = None):
+    """
+        Questa funzione esegue una ricerca focale(Focal Search) nello spazio-tempo, una variante di A_Star che
+        restituisce un percorso di costo al più suboptimality volte il costo ottimo, in cambio della libertà di scegliere
+        quale nodo espandere tra quelli con f vicino al minimo.
+
+        Oltre alla frontiera di A*(OPEN, ordinata per f=g+h) si mantiene la lista FOCAL dei nodi di OPEN con
+        f <= suboptimality * f_min, dove f_min è il valore f minimo in OPEN. I nodi da espandere vengono estratti da
+        FOCAL in ordine di un'euristica secondaria: la distanza dall'obiettivo h più il numero di prenotazioni
+        attraversate, cioè di passi del percorso trascorsi in celle prenotate(in qualsiasi istante) da agenti con
+        priorità più alta. In questo modo la ricerca procede verso l'obiettivo come una ricerca greedy, evitando quando
+        possibile le celle già usate da altri percorsi.
+        Ordinare FOCAL soltanto per prenotazioni attraversate è molto più lento: con le distanze reali come euristica
+        la ricerca esplora tutta la regione raggiungibile senza attraversare prenotazioni prima di avvicinarsi
+        all'obiettivo.
+
+        Gli argomenti e il valore restituito sono gli stessi di A_Star, con in più:
+        -)suboptimality: fattore di subottimalità w >= 1. Con w = 1 FOCAL contiene solo i nodi con f = f_min e il
+        percorso è ottimo come quello di A_Star.
+        -)stats: metriche della ricerca(instrumentation.SearchStats, opzionale), con le fasi heuristic, horizon e
+        search. In caso di successo si registrano anche il costo del percorso e il limite inferiore del costo ottimo
+        (f_min al termine), il cui rapporto è il fattore di subottimalità ottenuto, sempre <= suboptimality.
+
+        Gli stati, i nodi, le potature(stati già generati, prenotazioni, stati sicuri dominati, WAIT inutili) e
+        l'orizzonte temporale sono quelli dell'implementazione Python di A_Star; il kernel compilato non viene usato.
+
+        Si offre una breve descrizione della funzione:
+        1)si inizializzano i buffer dei nodi con il nodo iniziale e le tre code: open_f contiene i valori f di tutti i
+        nodi non ancora espansi(per conoscere f_min), focal i nodi con f <= limite ordinati per h + prenotazioni
+        attraversate, pending i nodi con f > limite ordinati per f. Ogni nodo si trova in focal oppure in pending, e i
+        nodi già espansi vengono rimossi da open_f solo quando raggiungono la cima della coda.
+        2)ad ogni iterazione si rimuovono da open_f i nodi già espansi; se open_f è vuota non esiste alcun percorso.
+        3)se f_min è aumentato si aggiorna il limite floor(suboptimality * f_min), e i nodi di pending che lo rispettano
+        vengono spostati in focal.
+        4)si espande il primo nodo di focal: se è l'obiettivo(e la cella obiettivo è libera negli istanti successivi)
+        si ricostruisce il percorso, altrimenti si generano i vicini come in A_Star, inserendo ogni nuovo nodo in focal
+        oppure in pending in base al suo valore f.
+    """
+    if suboptimality < 1:
+        raise ValueError(f"Il fattore di subottimalità deve essere almeno 1, ricevuto {suboptimality}")
+    start: Tuple[int, int] = agente.start_position
+    goal: Tuple[int, int] = agente.goal_position
+    height, width = map.shape
+    start_cell: int = start[0] * width + start[1]
+    goal_cell: int = goal[0] * width + goal[1]
+    n_cells: int = height * width
+
+    if stats is not None:
+        phase_start: int = time.perf_counter_ns()
+    if heuristic is not None:
+        h_values: List[int] = heuristic.get(goal).ravel().tolist()
+        if h_values[start_cell] == UNREACHABLE:
+            return None
+    else:
+        rows, columns = np.indices(map.shape)
+        h_values = (np.abs(rows - goal[0]) + np.abs(columns - goal[1])).ravel().tolist()
+    if stats is not None:
+        stats.add_time("heuristic", phase_start)
+        phase_start = time.perf_counter_ns()
+
+    limit: int = max_iterations if iteration_limit is None else iteration_limit
+    goal_free_from: int = reservations.last_reserved_time(goal_cell)
+    horizon: int = makespan_horizon(map, goal, reservations)
+    if stats is not None:
+        stats.add_time("horizon", phase_start)
+        phase_start = time.perf_counter_ns()
+
+    adjacency = grid_adjacency(map)
+    is_move_allowed = reservations.is_move_allowed
+    last_reserved: "array[int]" = reservations.last_reserved_times()
+
+    cells: "array[int]" = array('q', [start_cell])
+    times: "array[int]" = array('q', [0])
+    parents: "array[int]" = array('q', [-1])
+    crossings: "array[int]" = array('q', [1 if last_reserved[start_cell] >= 0 else 0])
+    expanded: bytearray = bytearray(1)
+    generated: Set[int] = {start_cell}
+    safe_state: Dict[int, int] = {}
+    if last_reserved[start_cell] < 0:
+        safe_state[start_cell] = 0
+
+    f_min: int = h_values[start_cell]
+    f_limit: int = math.floor(suboptimality * f_min)
+    open_f: List[int] = [f_min << FRONTIER_SHIFT]
+    focal: List[int] = [(crossings[0] + f_min) << FRONTIER_SHIFT]
+    pending: List[int] = []
+
+    iterations: int = 0
+    expanded_nodes: int = 0
+    count: int = 0
+    pruned_duplicate: int = 0
+    pruned_constraint: int = 0
+    pruned_dominated: int = 0
+    max_frontier: int = 0
+    status: int = NOT_FOUND
+    path: Optional[CompactPath] = None
+
+    while True:
+        while open_f and expanded[open_f[0] & FRONTIER_MASK]:
+            heapq.heappop(open_f)
+        if not open_f:
+            break
+        if iterations > limit:
+            print("Timeout Focal Search: numero massimo di esecuzioni superato. Soluzione non trovata")
+            status = ITERATION_LIMIT
+            break
+        iterations += 1
+        if deadline is not None and iterations & 1023 == 0 and time.perf_counter() > deadline:
+            status = DEADLINE_EXCEEDED
+            break
+
+        current_f_min: int = open_f[0] >> FRONTIER_SHIFT
+        if current_f_min > f_min:
+            f_min = current_f_min
+            f_limit = math.floor(suboptimality * f_min)
+            while pending and pending[0] >> FRONTIER_SHIFT <= f_limit:
+                node = heapq.heappop(pending) & FRONTIER_MASK
+                heapq.heappush(focal, ((crossings[node] + h_values[cells[node]]) << FRONTIER_SHIFT) | node)
+        if len(focal) + len(pending) > max_frontier:
+            max_frontier = len(focal) + len(pending)
+
+        node: int = heapq.heappop(focal) & FRONTIER_MASK
+        expanded[node] = 1
+        current_cell: int = cells[node]
+        current_time: int = times[node]
+        expanded_nodes += 1
+
+        if current_cell == goal_cell and current_time > goal_free_from:
+            path = reconstruct_path(parents, cells, node, width)
+            status = FOUND
+            break
+
+        if current_time >= horizon:
+            continue
+
+        next_time: int = current_time + 1
+        state_offset: int = next_time * n_cells
+        neighborhood: Tuple[int, ...] = adjacency[current_cell]
+        can_wait: bool = current_time <= last_reserved[current_cell] or current_time < max(last_reserved[n] for n in neighborhood)
+        for neighbor_cell in neighborhood:
+            if neighbor_cell == current_cell and not can_wait:
+                continue
+            neighbor_state: int = state_offset + neighbor_cell
+            if neighbor_state in generated:
+                pruned_duplicate += 1
+                continue
+            h: int = h_values[neighbor_cell]
+            if h == UNREACHABLE:
+                continue
+            if not is_move_allowed(current_cell, neighbor_cell, next_time):
+                pruned_constraint += 1
+                continue
+            if next_time > last_reserved[neighbor_cell]:
+                safe_time = safe_state.get(neighbor_cell)
+                if safe_time is None or next_time < safe_time:
+                    safe_state[neighbor_cell] = next_time
+                elif neighbor_cell != current_cell:
+                    pruned_dominated += 1
+                    continue
+
+            generated.add(neighbor_state)
+            count += 1
+            cells.append(neighbor_cell)
+            times.append(next_time)
+            parents.append(node)
+            crossing: int = crossings[node] + (1 if last_reserved[neighbor_cell] >= 0 else 0)
+            crossings.append(crossing)
+            expanded.append(0)
+            f: int = next_time + h
+            heapq.heappush(open_f, (f << FRONTIER_SHIFT) | count)
+            if f <= f_limit:
+                heapq.heappush(focal, ((crossing + h) << FRONTIER_SHIFT) | count)
+            else:
+                heapq.heappush(pending, (f << FRONTIER_SHIFT) | count)
+
+    if stats is not None:
+        cost: int = 0 if path is None else len(path) - 1
+        stats.record_search(status, expanded_nodes, [count, 0, pruned_duplicate, pruned_constraint, pruned_dominated,
+                                                     max_frontier], cost=cost, lower_bound=f_min if path else 0)
+        stats.add_time("search", phase_start)
+    if path is None:
+        return None
+    return expanded_nodes, path, len(path) - 1
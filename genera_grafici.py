@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
-from typing import List
+from pathlib import Path
+from typing import List, Tuple
 from agente import *
 def genera_grafici(agents: List[Agent], expanded_nodes: List[int], running_time: List[float], costo: List[int],map_name:str)->None:
     """
@@ -73,3 +74,30 @@ def genera_percentuali(num_agents:int,num_failure:int,num_success:int,map_name:s
     plt.tight_layout()
     plt.savefig(f"results\percentuali_successi_{map_name}.png")
     plt.close()
+
+def genera_grafico_lns(history:List[Tuple[float,int]],map_name:str)->None:
+    """
+        Questa funzione genera il grafico costo-tempo della Large Neighbourhood Search anytime(lns_refine):
+        il costo della soluzione resta costante tra un miglioramento e il successivo, per cui l'andamento
+        viene disegnato a gradini.
+
+        Gli argomenti della funzione sono:
+        -)history:lo storico dei miglioramenti restituito da lns_refine, cioè coppie (secondi, costo totale)
+        -)map_name:nome della mappa che si intende testare
+
+        Il grafico viene salvato in results/lns_costo_tempo_<map_name>.png, creando la cartella se non esiste.
+    """
+    times = [t for t, _ in history]
+    costs = [c for _, c in history]
+
+    plt.figure(figsize=(6,4))
+    plt.step(times, costs, where='post', marker='o', color='purple')
+    plt.title('Costo vs Tempo (LNS)')
+    plt.xlabel('Tempo (s)')
+    plt.ylabel('Costo')
+    plt.grid(True)
+    plt.tight_layout()
+    output_path = Path("results") / f"lns_costo_tempo_{map_name}.png"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.savefig(output_path)
+    plt.close()
@@ -0,0 +1,220 @@
+import os
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from numpy.typing import NDArray
+
+UNREACHABLE = -1
+NO_COMPONENT = -1
+
+
+def padded_free_cells(map: NDArray[np.int_]) -> NDArray[np.bool_]:
+    """
+        Questa funzione restituisce la maschera(appiattita) delle celle libere della mappa, circondata da un bordo
+        di ostacoli di spessore 1. Il bordo permette di calcolare le celle vicine sommando un offset all'indice piatto,
+        senza dover verificare i limiti della mappa.
+    """
+    height, width = map.shape
+    free = np.zeros((height + 2, width + 2), dtype=bool)
+    free[1:-1, 1:-1] = map == 0
+    return free.ravel()
+
+
+def compute_distance_table(map: NDArray[np.int_], goal: Tuple[int, int],
+                           free: Optional[NDArray[np.bool_]] = None) -> NDArray[np.int32]:
+    """
+        Questa funzione calcola la distanza reale(numero minimo di mosse) tra ogni cella della mappa e la posizione
+        obiettivo, eseguendo una ricerca in ampiezza(BFS) all'indietro a partire dall'obiettivo.
+        La BFS è vettorizzata: ad ogni livello l'intera frontiera viene espansa con operazioni NumPy.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)goal: posizione obiettivo
+        -)free: maschera delle celle libere restituita da padded_free_cells(opzionale, calcolata se assente)
+
+        La funzione restituisce un array int32 delle stesse dimensioni della mappa, in cui le celle da cui non è
+        possibile raggiungere l'obiettivo(ostacoli compresi) valgono UNREACHABLE.
+
+        Si offre una breve descrizione della funzione:
+        1)si inizializzano tutte le distanze a UNREACHABLE e la frontiera con la sola cella obiettivo.
+        2)ad ogni livello d si calcolano i 4 vicini di tutte le celle della frontiera, si scartano gli ostacoli
+        e le celle già visitate, e si assegna distanza d alle celle rimaste, che formano la nuova frontiera.
+        3)la BFS termina quando la frontiera è vuota.
+    """
+    height, width = map.shape
+    padded_width = width + 2
+    if free is None:
+        free = padded_free_cells(map)
+    distances = np.full(free.shape, UNREACHABLE, dtype=np.int32)
+    start = (goal[0] + 1) * padded_width + goal[1] + 1
+    if free[start]:
+        offsets = np.array([-padded_width, padded_width, -1, 1], dtype=np.int64)
+        frontier = np.array([start], dtype=np.int64)
+        distances[start] = 0
+        level = 0
+        while frontier.size:
+            level += 1
+            candidates = (frontier[:, None] + offsets).ravel()
+            candidates = candidates[free[candidates] & (distances[candidates] == UNREACHABLE)]
+            frontier = np.unique(candidates)
+            distances[frontier] = level
+    return distances.reshape(height + 2, padded_width)[1:-1, 1:-1].copy()
+
+
+def connected_components(map: NDArray[np.int_], free: Optional[NDArray[np.bool_]] = None) -> NDArray[np.int32]:
+    """
+        Questa funzione etichetta le componenti connesse delle celle libere della mappa(con le 4 mosse): due celle
+        hanno la stessa etichetta se e solo se una è raggiungibile dall'altra. L'etichettatura è vettorizzata, con
+        operazioni NumPy sull'intero insieme degli archi invece di una BFS per componente.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)free: maschera delle celle libere restituita da padded_free_cells(opzionale, calcolata se assente)
+
+        La funzione restituisce un array int32 delle stesse dimensioni della mappa con le etichette 0, 1, ... delle
+        componenti, numerate nell'ordine della loro prima cella per righe; gli ostacoli valgono NO_COMPONENT.
+
+        Si offre una breve descrizione della funzione:
+        1)si numerano le celle libere e si costruiscono gli archi tra celle libere adiacenti(a destra e in basso).
+        2)ogni cella parte con la propria etichetta. Ad ogni passo, per ogni arco con etichette diverse, la radice con
+        l'etichetta maggiore viene collegata a quella minore(np.minimum.at), e le etichette vengono poi compresse
+        seguendo i collegamenti(label = label[label]) finché ogni cella punta alla radice della sua componente.
+        3)quando nessun arco collega etichette diverse, le radici vengono rinumerate in modo consecutivo.
+    """
+    height, width = map.shape
+    padded_width = width + 2
+    if free is None:
+        free = padded_free_cells(map)
+    cells = np.flatnonzero(free)
+    index = np.full(free.shape, -1, dtype=np.int64)
+    index[cells] = np.arange(cells.size, dtype=np.int64)
+    sources, targets = [], []
+    for offset in (1, padded_width):
+        linked = cells[free[cells + offset]]
+        sources.append(index[linked])
+        targets.append(index[linked + offset])
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+
+    labels = np.arange(cells.size, dtype=np.int64)
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        different = source_labels != target_labels
+        if not different.any():
+            break
+        np.minimum.at(labels, np.maximum(source_labels[different], target_labels[different]),
+                      np.minimum(source_labels[different], target_labels[different]))
+        while True:
+            compressed = labels[labels]
+            if np.array_equal(compressed, labels):
+                break
+            labels = compressed
+
+    components = np.full(free.shape, NO_COMPONENT, dtype=np.int32)
+    components[cells] = np.unique(labels, return_inverse=True)[1]
+    return components.reshape(height + 2, padded_width)[1:-1, 1:-1].copy()
+
+
+def save_array(path: Path, array: np.ndarray) -> None:
+    """
+        Questa funzione salva un array in formato .npy scrivendo prima un file temporaneo e poi rinominandolo,
+        in modo che processi concorrenti non leggano mai un file scritto a metà.
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    with os.fdopen(descriptor, "wb") as f:
+        np.save(f, array)
+    os.replace(temporary, path)
+
+
+def save_text(path: Path, text: str) -> None:
+    """
+        Questa funzione salva un file di testo scrivendo prima un file temporaneo e poi rinominandolo, come save_array,
+        per cui un'interruzione durante la scrittura non lascia mai un file incompleto.
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    with os.fdopen(descriptor, "w") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+class HeuristicTables:
+    """
+        Questa classe gestisce le tabelle delle distanze reali verso le posizioni obiettivo degli agenti,
+        usate come euristica da A* al posto della distanza di Manhattan.
+
+        Ogni tabella viene calcolata una sola volta per obiettivo(compute_distance_table) e conservata, in modo che
+        possa essere condivisa da tutti gli esperimenti eseguiti sulla stessa mappa con lo stesso pool di agenti.
+        Se viene indicata una cartella(directory), le tabelle vengono anche salvate su disco come file .npy e,
+        nelle esecuzioni successive, caricate in memory-mapping(mmap_mode='r') senza ripetere la BFS.
+        Allo stesso modo vengono conservate le componenti connesse della mappa(connected_components), usate per
+        verificare la raggiungibilità degli obiettivi e per generare gli agenti.
+    """
+    def __init__(self, map: NDArray[np.int_], directory: Optional[Union[str, Path]] = None):
+        """
+            Questa funzione inizializza la raccolta di tabelle per la mappa indicata.
+            Gli argomenti della funzione sono:
+            -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+            -)directory: cartella in cui salvare e da cui caricare le tabelle(opzionale). La cartella deve
+            essere specifica della mappa, ad esempio quella fornita da MapCache.
+        """
+        self.map = map
+        self._free = padded_free_cells(map)
+        self._tables: Dict[Tuple[int, int], NDArray[np.int32]] = {}
+        self._components: Optional[NDArray[np.int32]] = None
+        self.directory = None if directory is None else Path(directory)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, goal: Tuple[int, int]) -> NDArray[np.int32]:
+        """
+            Questa funzione restituisce la tabella delle distanze verso la posizione obiettivo, calcolandola
+            se non è ancora presente.
+        """
+        table = self._tables.get(goal)
+        if table is None:
+            if self.directory is None:
+                table = compute_distance_table(self.map, goal, self._free)
+            else:
+                table_path = self.directory / f"h_{goal[0]}_{goal[1]}.npy"
+                if table_path.exists():
+                    table = np.load(table_path, mmap_mode="r")
+                else:
+                    table = compute_distance_table(self.map, goal, self._free)
+                    save_array(table_path, table)
+            self._tables[goal] = table
+        return table
+
+    def components(self) -> NDArray[np.int32]:
+        """
+            Questa funzione restituisce le etichette delle componenti connesse della mappa(connected_components),
+            calcolate una sola volta e, se è indicata una cartella, salvate in components.npy.
+        """
+        if self._components is None:
+            if self.directory is None:
+                self._components = connected_components(self.map, self._free)
+            else:
+                components_path = self.directory / "components.npy"
+                if components_path.exists():
+                    self._components = np.load(components_path)
+                else:
+                    self._components = connected_components(self.map, self._free)
+                    save_array(components_path, self._components)
+        return self._components
+
+    def distance(self, position: Tuple[int, int], goal: Tuple[int, int]) -> int:
+        """
+            Questa funzione restituisce la distanza reale tra position e goal, oppure UNREACHABLE.
+        """
+        return int(self.get(goal)[position])
+
+    def is_reachable(self, start: Tuple[int, int], goal: Tuple[int, int]) -> bool:
+        """
+            Questa funzione verifica, prima di qualsiasi ricerca, se la posizione obiettivo è raggiungibile
+            dalla posizione di partenza nella mappa statica, cioè se le due celle libere appartengono alla stessa
+            componente connessa. Non è necessario calcolare la tabella delle distanze dell'obiettivo.
+        """
+        components = self.components()
+        return components[start] != NO_COMPONENT and components[start] == components[goal]
+
+    def __len__(self) -> int:
+        return len(self._tables)
@@ -0,0 +1,283 @@
+import heapq
+import weakref
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from numpy.typing import NDArray
+from agente import Agent
+from heuristic import HeuristicTables, compute_distance_table, save_array, UNREACHABLE
+from instrumentation import SearchStats
+from prioritized_planning import A_Star
+from reservation_table import ReservationTable
+
+DEFAULT_CLUSTER_SIZE = 16
+MIN_SPLIT_ENTRANCE = 6
+
+Position = Tuple[int, int]
+
+
+class ClusterGraph:
+    """
+        Questa classe rappresenta l'astrazione gerarchica della mappa usata da HPA*(Hierarchical Path-Finding A*).
+
+        La griglia viene divisa in cluster quadrati di lato cluster_size. Lungo il confine tra due cluster adiacenti,
+        ogni tratto continuo di celle libere su entrambi i lati forma un ingresso: un tratto corto produce una coppia di
+        nodi astratti(una cella per lato) al centro del tratto, un tratto lungo(almeno MIN_SPLIT_ENTRANCE celle) una
+        coppia a ciascuna estremità. Il grafo astratto contiene:
+        -)archi tra le due celle di ogni ingresso, di costo 1
+        -)archi tra i nodi dello stesso cluster, il cui costo è la distanza reale calcolata restando nel cluster
+
+        Il grafo viene costruito una sola volta per mappa(il costo dipende dall'area della mappa) e può essere salvato su
+        disco; le ricerche successive(abstract_route) esplorano solo i nodi astratti, per cui il loro costo dipende dalla
+        lunghezza del percorso e non dall'area della mappa.
+    """
+    def __init__(self, map: NDArray[np.int_], cluster_size: int = DEFAULT_CLUSTER_SIZE,
+                 directory: Optional[Union[str, Path]] = None):
+        """
+            Questa funzione costruisce(oppure carica dalla cartella indicata) il grafo astratto della mappa.
+            Gli argomenti della funzione sono:
+            -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+            -)cluster_size: lato dei cluster in celle(default: 16)
+            -)directory: cartella in cui salvare e da cui caricare il grafo(opzionale), specifica della mappa come
+            quella fornita da MapCache
+        """
+        self.map = map
+        self.height, self.width = map.shape
+        self.cluster_size = cluster_size
+        self.cluster_columns = -(-self.width // cluster_size)
+        nodes_path = None if directory is None else Path(directory) / f"cluster_nodes_{cluster_size}.npy"
+        edges_path = None if directory is None else Path(directory) / f"cluster_edges_{cluster_size}.npy"
+        if nodes_path is not None and nodes_path.exists() and edges_path.exists():
+            self.nodes, edges = np.load(nodes_path), np.load(edges_path)
+        else:
+            self.nodes, edges = self._build()
+            if nodes_path is not None:
+                nodes_path.parent.mkdir(parents=True, exist_ok=True)
+                save_array(nodes_path, self.nodes)
+                save_array(edges_path, edges)
+        self.node_index: Dict[int, int] = {cell: index for index, cell in enumerate(self.nodes.tolist())}
+        self.edges: List[List[Tuple[int, int]]] = [[] for _ in range(len(self.nodes))]
+        for source, target, cost in edges.tolist():
+            self.edges[source].append((target, cost))
+        self.cluster_nodes: Dict[int, List[int]] = {}
+        for index, cell in enumerate(self.nodes.tolist()):
+            self.cluster_nodes.setdefault(self.cluster_of(cell), []).append(index)
+        self._cluster_cells: Dict[int, NDArray[np.int64]] = {}
+
+    def cluster_of(self, cell: int) -> int:
+        """
+            Questa funzione restituisce l'indice del cluster che contiene la cella(indice piatto).
+        """
+        row, column = divmod(cell, self.width)
+        return (row // self.cluster_size) * self.cluster_columns + column // self.cluster_size
+
+    def cluster_bounds(self, cluster: int) -> Tuple[slice, slice]:
+        """
+            Questa funzione restituisce le righe e le colonne(slice) della mappa occupate dal cluster.
+        """
+        row, column = divmod(cluster, self.cluster_columns)
+        size = self.cluster_size
+        return slice(row * size, min((row + 1) * size, self.height)), slice(column * size, min((column + 1) * size, self.width))
+
+    def cluster_cells(self, cluster: int) -> NDArray[np.int64]:
+        """
+            Questa funzione restituisce gli indici piatti, in ordine crescente, delle celle libere del cluster, calcolati
+            una sola volta per cluster.
+        """
+        cells = self._cluster_cells.get(cluster)
+        if cells is None:
+            rows, columns = self.cluster_bounds(cluster)
+            local_rows, local_columns = np.nonzero(np.asarray(self.map[rows, columns]) == 0)
+            cells = ((local_rows + rows.start) * self.width + local_columns + columns.start).astype(np.int64)
+            self._cluster_cells[cluster] = cells
+        return cells
+
+    def _entrances(self) -> List[Tuple[int, int]]:
+        """
+            Questa funzione restituisce le coppie di celle(indici piatti) che formano gli ingressi tra cluster adiacenti.
+        """
+        free = np.asarray(self.map) == 0
+        size = self.cluster_size
+        pairs: List[Tuple[int, int]] = []
+        for vertical in (True, False):
+            grid = free if vertical else free.T
+            length, span = grid.shape
+            for border in range(size, span, size):
+                open_cells = (grid[:, border - 1] & grid[:, border]).tolist()
+                for start in range(0, length, size):
+                    run_start = None
+                    for index in range(start, min(start + size, length) + 1):
+                        is_open = index < min(start + size, length) and open_cells[index]
+                        if is_open and run_start is None:
+                            run_start = index
+                        elif not is_open and run_start is not None:
+                            run_end = index - 1
+                            if run_end - run_start + 1 >= MIN_SPLIT_ENTRANCE:
+                                chosen = [run_start, run_end]
+                            else:
+                                chosen = [(run_start + run_end) // 2]
+                            for position in chosen:
+                                if vertical:
+                                    pairs.append((position * self.width + border - 1, position * self.width + border))
+                                else:
+                                    pairs.append(((border - 1) * self.width + position, border * self.width + position))
+                            run_start = None
+        return pairs
+
+    def _build(self) -> Tuple[NDArray[np.int64], NDArray[np.int64]]:
+        """
+            Questa funzione costruisce i nodi e gli archi del grafo astratto: gli archi tra cluster derivano dagli ingressi,
+            quelli interni ad un cluster da una BFS(compute_distance_table) eseguita sul solo cluster per ogni suo nodo.
+        """
+        pairs = self._entrances()
+        cells = sorted({cell for pair in pairs for cell in pair})
+        index = {cell: i for i, cell in enumerate(cells)}
+        edges: List[Tuple[int, int, int]] = []
+        for first, second in pairs:
+            edges.append((index[first], index[second], 1))
+            edges.append((index[second], index[first], 1))
+        by_cluster: Dict[int, List[int]] = {}
+        for cell in cells:
+            by_cluster.setdefault(self.cluster_of(cell), []).append(cell)
+        for cluster, members in by_cluster.items():
+            rows, columns = self.cluster_bounds(cluster)
+            sub_map = self.map[rows, columns]
+            for source in members:
+                row, column = divmod(source, self.width)
+                distances = compute_distance_table(sub_map, (row - rows.start, column - columns.start))
+                for target in members:
+                    if target == source:
+                        continue
+                    target_row, target_column = divmod(target, self.width)
+                    distance = int(distances[target_row - rows.start, target_column - columns.start])
+                    if distance != UNREACHABLE:
+                        edges.append((index[source], index[target], distance))
+        return np.array(cells, dtype=np.int64), np.array(edges, dtype=np.int64).reshape(-1, 3)
+
+    def _local_distances(self, cell: int) -> Dict[int, int]:
+        """
+            Questa funzione restituisce le distanze, restando nel cluster della cella, tra la cella e i nodi astratti
+            dello stesso cluster raggiungibili.
+        """
+        cluster = self.cluster_of(cell)
+        rows, columns = self.cluster_bounds(cluster)
+        row, column = divmod(cell, self.width)
+        distances = compute_distance_table(self.map[rows, columns], (row - rows.start, column - columns.start))
+        reachable: Dict[int, int] = {}
+        for node in self.cluster_nodes.get(cluster, []):
+            node_row, node_column = divmod(int(self.nodes[node]), self.width)
+            distance = int(distances[node_row - rows.start, node_column - columns.start])
+            if distance != UNREACHABLE:
+                reachable[node] = distance
+        return reachable
+
+    def abstract_route(self, start: Position, goal: Position) -> Optional[List[int]]:
+        """
+            Questa funzione calcola il percorso astratto tra due posizioni: la partenza e l'obiettivo vengono collegati ai
+            nodi del proprio cluster, e si esegue A* sul grafo astratto con la distanza di Manhattan come euristica.
+
+            La funzione restituisce la sequenza delle celle(indici piatti) attraversate dal percorso astratto, a partire
+            dalla cella di partenza e fino alla cella obiettivo, oppure None se l'obiettivo non è raggiungibile.
+        """
+        start_cell = start[0] * self.width + start[1]
+        goal_cell = goal[0] * self.width + goal[1]
+        if self.cluster_of(start_cell) == self.cluster_of(goal_cell):
+            rows, columns = self.cluster_bounds(self.cluster_of(start_cell))
+            distances = compute_distance_table(self.map[rows, columns], (start[0] - rows.start, start[1] - columns.start))
+            if distances[goal[0] - rows.start, goal[1] - columns.start] != UNREACHABLE:
+                return [start_cell, goal_cell]
+
+        n_nodes = len(self.nodes)
+        start_node, goal_node = n_nodes, n_nodes + 1
+        goal_links = self._local_distances(goal_cell)
+        node_cells = self.nodes.tolist()
+
+        def estimate(cell: int) -> int:
+            row, column = divmod(cell, self.width)
+            return abs(row - goal[0]) + abs(column - goal[1])
+
+        best: Dict[int, int] = {start_node: 0}
+        parents: Dict[int, int] = {start_node: -1}
+        frontier: List[Tuple[int, int]] = [(estimate(start_cell), start_node)]
+        while frontier:
+            f, node = heapq.heappop(frontier)
+            g = best[node]
+            if f > g + (0 if node == goal_node else estimate(start_cell if node == start_node else node_cells[node])):
+                continue
+            if node == goal_node:
+                route: List[int] = []
+                while node >= 0:
+                    route.append(goal_cell if node == goal_node else start_cell if node == start_node else node_cells[node])
+                    node = parents[node]
+                route.reverse()
+                return route
+            if node == start_node:
+                successors = list(self._local_distances(start_cell).items())
+            else:
+                successors = self.edges[node][:]
+                if node in goal_links:
+                    successors.append((goal_node, goal_links[node]))
+            for successor, cost in successors:
+                new_g = g + cost
+                if new_g < best.get(successor, new_g + 1):
+                    best[successor] = new_g
+                    parents[successor] = node
+                    h = 0 if successor == goal_node else estimate(node_cells[successor])
+                    heapq.heappush(frontier, (new_g + h, successor))
+        return None
+
+    def corridor(self, start: Position, goal: Position) -> Optional[NDArray[np.int64]]:
+        """
+            Questa funzione restituisce il corridoio tra due posizioni: gli indici piatti delle celle libere che
+            appartengono ai cluster attraversati dal percorso astratto(cluster_cells), oppure None se l'obiettivo non è
+            raggiungibile. Il costo dipende dal numero di celle dei cluster e non dall'area della mappa.
+        """
+        route = self.abstract_route(start, goal)
+        if route is None:
+            return None
+        clusters = {self.cluster_of(cell) for cell in route}
+        return np.concatenate([self.cluster_cells(cluster) for cluster in clusters])
+
+
+_cluster_cache: Dict[Tuple[int, int], Tuple[Any, ClusterGraph]] = {}
+
+
+def cluster_graph(map: NDArray[np.int_], cluster_size: int = DEFAULT_CLUSTER_SIZE,
+                  directory: Optional[Union[str, Path]] = None) -> ClusterGraph:
+    """
+        Questa funzione restituisce il grafo astratto della mappa, costruendolo una sola volta per mappa e lato dei cluster
+        e riutilizzandolo finchè l'array della mappa esiste(come grid_adjacency).
+    """
+    key = (id(map), cluster_size)
+    cached = _cluster_cache.get(key)
+    if cached is not None and cached[0]() is map:
+        return cached[1]
+    graph = ClusterGraph(map, cluster_size, directory)
+    _cluster_cache[key] = (weakref.ref(map), graph)
+    return graph
+
+
+def HPA_Star(map: NDArray[np.int_], agente: Agent, reservations: ReservationTable, iteration_limit: Optional[int] = None,
+             heuristic: Optional[HeuristicTables] = None, deadline: Optional[float] = None,
+             stats: Optional[SearchStats] = None):
+    """
+        Questa funzione esegue A* nello spazio-tempo limitato al corridoio calcolato da HPA*: il percorso astratto
+        individua i cluster da attraversare, e A_Star esplora soltanto le celle di tali cluster, con l'euristica delle
+        distanze reali calcolata all'interno del corridoio. Se nel corridoio non esiste un percorso valido(ad esempio
+        perché le prenotazioni lo bloccano) si esegue A_Star sull'intera mappa, per cui la funzione trova un percorso
+        ogni volta che A_Star lo trova.
+
+        Gli argomenti e il valore restituito sono gli stessi di A_Star. Il costo del percorso trovato nel corridoio può
+        essere maggiore di quello ottimo. Se le tabelle euristiche sono salvate su disco(MapCache) il grafo astratto
+        viene salvato nella cartella della cache della stessa mappa.
+    """
+    directory = None if heuristic is None or heuristic.directory is None else heuristic.directory.parent
+    corridor = cluster_graph(map, directory=directory).corridor(agente.start_position, agente.goal_position)
+    if corridor is None:
+        return None
+    results = A_Star(map, agente, reservations, iteration_limit=iteration_limit, deadline=deadline, corridor=corridor,
+                     stats=stats)
+    if results is None:
+        results = A_Star(map, agente, reservations, iteration_limit=iteration_limit, heuristic=heuristic, deadline=deadline,
+                         stats=stats)
+    return results
@@ -0,0 +1,182 @@
+import csv
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+SEARCH_COUNTERS: List[str] = ["generated", "repushed", "pruned_duplicate", "pruned_constraint", "pruned_dominated",
+                              "max_frontier"]
+SEARCH_STATUS: List[str] = ["found", "not_found", "iteration_limit", "deadline"]
+
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class SearchStats:
+    """
+        Questa classe raccoglie le metriche delle ricerche di basso livello(A_Star, SIPP) eseguite per un agente.
+        Se per lo stesso agente vengono eseguite più ricerche(ad esempio il ripiego di HPA_Star sull'intera mappa, o
+        le ricerche della riparazione locale) i contatori e i tempi vengono sommati, e max_frontier è il massimo.
+
+        I contatori sono:
+        -)expanded: nodi espansi
+        -)generated: nodi generati(inseriti nella frontiera, escluso il nodo iniziale)
+        -)repushed: nodi reinseriti nella frontiera per uno stato già generato con un costo migliore. In A_Star vale
+        sempre 0, perché il primo percorso che genera uno stato è sempre il migliore; in SIPP conta i miglioramenti
+        dell'istante di arrivo in un intervallo sicuro
+        -)pruned_duplicate: successori scartati perché lo stato era già stato generato(con un costo non peggiore)
+        -)pruned_constraint: successori scartati a causa delle prenotazioni(vertice, arco o parcheggio)
+        -)pruned_dominated: successori scartati perché dominati da uno stato sicuro della stessa cella(solo A_Star)
+        -)max_frontier: dimensione massima della frontiera
+        I planner subottimi(focal.Focal_Search) registrano inoltre il costo dei percorsi trovati(cost) e il limite
+        inferiore del costo ottimo dimostrato dalla ricerca(lower_bound); per gli altri planner valgono 0.
+        I tempi delle fasi(phases) sono in nanosecondi(time.perf_counter_ns).
+    """
+    __slots__ = ("agent", "searches", "status", "expanded", "generated", "repushed", "pruned_duplicate",
+                 "pruned_constraint", "pruned_dominated", "max_frontier", "cost", "lower_bound", "phases")
+
+    def __init__(self, agent: Optional[int] = None):
+        """
+            Questa funzione inizializza le metriche di un agente, identificato dalla sua priorità(opzionale).
+        """
+        self.agent = agent
+        self.searches = 0
+        self.status = ""
+        self.expanded = 0
+        self.generated = 0
+        self.repushed = 0
+        self.pruned_duplicate = 0
+        self.pruned_constraint = 0
+        self.pruned_dominated = 0
+        self.max_frontier = 0
+        self.cost = 0
+        self.lower_bound = 0
+        self.phases: Dict[str, int] = {}
+
+    def record_search(self, status: int, expanded: int, counters: List[int], cost: int = 0,
+                      lower_bound: int = 0) -> None:
+        """
+            Questa funzione aggiunge il risultato di una ricerca: lo stato(FOUND, NOT_FOUND, ITERATION_LIMIT,
+            DEADLINE_EXCEEDED di astar_native), i nodi espansi, i contatori nell'ordine di SEARCH_COUNTERS e,
+            per i planner subottimi, il costo del percorso e il limite inferiore del costo ottimo.
+        """
+        self.searches += 1
+        self.status = SEARCH_STATUS[status]
+        self.expanded += expanded
+        generated, repushed, pruned_duplicate, pruned_constraint, pruned_dominated, max_frontier = (int(value) for value in counters)
+        self.generated += generated
+        self.repushed += repushed
+        self.pruned_duplicate += pruned_duplicate
+        self.pruned_constraint += pruned_constraint
+        self.pruned_dominated += pruned_dominated
+        self.max_frontier = max(self.max_frontier, max_frontier)
+        self.cost += cost
+        self.lower_bound += lower_bound
+
+    def add_time(self, phase: str, start_ns: int) -> None:
+        """
+            Questa funzione aggiunge alla fase indicata il tempo trascorso dall'istante start_ns(time.perf_counter_ns).
+        """
+        self.phases[phase] = self.phases.get(phase, 0) + time.perf_counter_ns() - start_ns
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+            Questa funzione restituisce le metriche come dizionario, con una colonna <fase>_ns per ogni fase.
+        """
+        row: Dict[str, Any] = {"agent": self.agent, "searches": self.searches, "status": self.status,
+                               "expanded": self.expanded}
+        row.update({counter: getattr(self, counter) for counter in SEARCH_COUNTERS})
+        if self.lower_bound:
+            row.update({"cost": self.cost, "lower_bound": self.lower_bound})
+        row.update({f"{phase}_ns": elapsed for phase, elapsed in self.phases.items()})
+        return row
+
+
+class Instrumentation:
+    """
+        Questa classe raccoglie le metriche di una pianificazione(PlanningSession, prioritized_planning): una
+        SearchStats per ogni agente pianificato e i tempi delle fasi del Prioritized Planning(ad esempio l'inserimento
+        delle prenotazioni), e notifica gli eventi ad una funzione di callback opzionale.
+
+        La strumentazione è disattivata di default: se non viene fornita un'istanza di Instrumentation il planner non
+        misura i tempi delle fasi e non chiama alcuna callback, e A_Star aggiorna soltanto contatori locali.
+    """
+    def __init__(self, callback: Optional[EventCallback] = None):
+        """
+            Questa funzione inizializza la raccolta delle metriche.
+            L'argomento callback è una funzione(opzionale) chiamata con il nome dell'evento e un dizionario:
+            -)"agent_start": prima della pianificazione di un agente, con la sua priorità
+            -)"agent_end": dopo la pianificazione di un agente, con le sue metriche(SearchStats.as_dict)
+            -)"phase": al termine di una fase del Prioritized Planning, con il nome della fase e la durata in ns
+        """
+        self.callback = callback
+        self.agents: List[SearchStats] = []
+        self.phases: Dict[str, int] = {}
+
+    def start_agent(self, priority: int) -> SearchStats:
+        """
+            Questa funzione crea le metriche dell'agente con la priorità indicata e notifica l'evento agent_start.
+        """
+        stats = SearchStats(priority)
+        self.agents.append(stats)
+        if self.callback is not None:
+            self.callback("agent_start", {"agent": priority})
+        return stats
+
+    def end_agent(self, stats: SearchStats) -> None:
+        """
+            Questa funzione notifica l'evento agent_end con le metriche dell'agente.
+        """
+        if self.callback is not None:
+            self.callback("agent_end", stats.as_dict())
+
+    def add_time(self, phase: str, start_ns: int) -> None:
+        """
+            Questa funzione aggiunge alla fase indicata il tempo trascorso dall'istante start_ns e notifica l'evento phase.
+        """
+        elapsed = time.perf_counter_ns() - start_ns
+        self.phases[phase] = self.phases.get(phase, 0) + elapsed
+        if self.callback is not None:
+            self.callback("phase", {"phase": phase, "ns": elapsed})
+
+    def summary(self) -> Dict[str, Any]:
+        """
+            Questa funzione restituisce i totali su tutti gli agenti: nodi espansi, contatori, massimo di max_frontier,
+            tempi delle fasi delle ricerche e del Prioritized Planning, e la priorità dell'agente più lento.
+            Se le ricerche hanno registrato un limite inferiore(planner subottimi) si riporta anche il fattore di
+            subottimalità ottenuto(suboptimality), cioè il rapporto tra la somma dei costi e la somma dei limiti inferiori.
+        """
+        totals: Dict[str, Any] = {"agents": len(self.agents), "expanded": sum(stats.expanded for stats in self.agents)}
+        for counter in SEARCH_COUNTERS:
+            values = [getattr(stats, counter) for stats in self.agents]
+            totals[counter] = max(values, default=0) if counter == "max_frontier" else sum(values)
+        lower_bound = sum(stats.lower_bound for stats in self.agents)
+        if lower_bound:
+            totals["suboptimality"] = sum(stats.cost for stats in self.agents) / lower_bound
+        phases: Dict[str, int] = dict(self.phases)
+        for stats in self.agents:
+            for phase, elapsed in stats.phases.items():
+                phases[phase] = phases.get(phase, 0) + elapsed
+        totals.update({f"{phase}_ns": elapsed for phase, elapsed in phases.items()})
+        slowest = max(self.agents, key=lambda stats: sum(stats.phases.values()), default=None)
+        totals["slowest_agent"] = None if slowest is None else slowest.agent
+        return totals
+
+    def write_csv(self, output_path: str) -> None:
+        """
+            Questa funzione salva le metriche per agente in formato CSV, una riga per agente.
+        """
+        write_profile([stats.as_dict() for stats in self.agents], output_path)
+
+
+def write_profile(rows: List[Dict[str, Any]], output_path: str) -> None:
+    """
+        Questa funzione salva in formato CSV righe di metriche(SearchStats.as_dict oppure Instrumentation.summary),
+        con l'unione delle colonne di tutte le righe: le colonne delle fasi dipendono dal planner usato.
+    """
+    fields: List[str] = []
+    for row in rows:
+        fields.extend(field for field in row if field not in fields)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
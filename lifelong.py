@@ -0,0 +1,253 @@
+import argparse
+import queue
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent, generate_agents
+from astar_native import warm_up
+from heuristic import HeuristicTables, NO_COMPONENT
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from prioritized_planning import low_level_solver, max_iterations, LOW_LEVEL_SOLVERS
+from reservation_table import ReservationTable
+from compact_path import AgentPath, CompactPath
+
+Position = Tuple[int, int]
+TaskSource = Union[Iterator[Union[Position, Agent]], "queue.Queue[Union[Position, Agent]]"]
+
+MAX_TASK_DRAWS: int = 100
+
+
+def random_tasks(map: NDArray[np.int_], seed: int = 0, start: Optional[Position] = None,
+                 heuristic: Optional[HeuristicTables] = None) -> Iterator[Position]:
+    """
+        Questa funzione genera all'infinito nuove posizioni obiettivo, scelte a caso tra le celle libere della mappa.
+        Se si indicano la posizione start e le tabelle euristiche(da cui si leggono le componenti connesse, vedi
+        HeuristicTables.components) le posizioni sono scelte soltanto nella componente connessa di start, cioè tra le
+        celle raggiungibili dall'agente che parte da start.
+    """
+    rng = random.Random(seed)
+    free = np.asarray(map) == 0
+    if start is not None and heuristic is not None:
+        components = heuristic.components()
+        if components[start] != NO_COMPONENT:
+            free = components == components[start]
+    free_cells: List[Position] = [tuple(cell) for cell in np.argwhere(free).tolist()]
+    while True:
+        yield rng.choice(free_cells)
+
+
+def _next_task(tasks: TaskSource) -> Optional[Position]:
+    """
+        Questa funzione estrae il prossimo obiettivo dalla sorgente dei task, che può essere un generatore(o iteratore)
+        oppure una coda(queue.Queue). Gli elementi possono essere posizioni oppure agenti, di cui si usa la posizione
+        obiettivo. Se la coda è vuota o il generatore è esaurito la funzione restituisce None.
+    """
+    try:
+        task = tasks.get_nowait() if isinstance(tasks, queue.Queue) else next(tasks)
+    except (queue.Empty, StopIteration):
+        return None
+    return task.goal_position if isinstance(task, Agent) else tuple(task)
+
+
+def _next_reachable_task(tasks: TaskSource, position: Position,
+                         heuristic: HeuristicTables) -> Tuple[Optional[Position], int]:
+    """
+        Questa funzione estrae dalla sorgente il prossimo obiettivo diverso dalla posizione indicata e raggiungibile da
+        essa(nella stessa componente connessa, HeuristicTables.is_reachable). Gli obiettivi irraggiungibili vengono
+        scartati, perché con uno solo di essi la pianificazione di ogni finestra fallirebbe.
+
+        La funzione restituisce l'obiettivo, oppure None se la sorgente è vuota o se dopo MAX_TASK_DRAWS estrazioni non
+        si è trovato un obiettivo valido(l'agente resta senza obiettivo fino alla ripianificazione successiva), e il
+        numero di obiettivi irraggiungibili scartati.
+    """
+    skipped = 0
+    for _ in range(MAX_TASK_DRAWS):
+        task = _next_task(tasks)
+        if task is None:
+            return None, skipped
+        if task == position:
+            continue
+        if heuristic.is_reachable(position, task):
+            return task, skipped
+        skipped += 1
+    return None, skipped
+
+
+def _window_path(path: CompactPath, window: int) -> CompactPath:
+    """
+        Questa funzione restituisce il percorso limitato alla finestra temporale [0, window]: il percorso viene troncato
+        oppure, se termina prima, l'agente resta fermo nell'ultima cella fino alla fine della finestra(un'unica
+        sequenza del percorso compatto).
+    """
+    cells = path.to_cells()[:window + 1]
+    return CompactPath.from_cells(np.pad(cells, (0, window + 1 - len(cells)), mode="edge"), path.width)
+
+
+def plan_window(map: NDArray[np.int_], positions: List[Position], goals: List[Position], order: List[int],
+                window: int, heuristic: HeuristicTables, solver: Any,
+                iteration_limit: Optional[int] = None) -> Optional[List[AgentPath]]:
+    """
+        Questa funzione esegue il Prioritized Planning a finestra(rolling horizon): gli agenti vengono pianificati,
+        nell'ordine indicato, dalla posizione attuale verso il proprio obiettivo, ma le prenotazioni di ciascun agente
+        riguardano solo i primi window istanti del suo percorso(con l'agente fermo nell'ultima cella se il percorso
+        termina prima). Oltre la finestra i conflitti vengono ignorati, perché il piano sarà ricalcolato prima di
+        raggiungerla; per lo stesso motivo la posizione obiettivo non viene parcheggiata.
+
+        La funzione restituisce i percorsi limitati alla finestra, nell'ordine degli agenti, oppure None se per un
+        agente non esiste un percorso.
+    """
+    height, width = map.shape
+    reservations = ReservationTable(height, width)
+    paths: List[Optional[AgentPath]] = [None] * len(positions)
+    for i in order:
+        results = solver(map, Agent(positions[i], goals[i], (0.0, 0.0, 0.0, 1.0), i + 1), reservations=reservations,
+                         iteration_limit=iteration_limit, heuristic=heuristic)
+        if results is None:
+            return None
+        path = _window_path(results[1], window)
+        reservations.reserve_path(path, park_goal=False)
+        paths[i] = path
+    return paths
+
+
+def run_lifelong(map: NDArray[np.int_], agents: List[Agent], tasks: Union[TaskSource, List[TaskSource]],
+                 timesteps: int, window: int = 10,
+                 commit_steps: int = 5, iteration_limit: Optional[int] = None,
+                 heuristic: Optional[HeuristicTables] = None, low_level: str = "astar", max_retries: int = 3,
+                 seed: int = 0) -> Dict[str, Any]:
+    """
+        Questa funzione esegue il Prioritized Planning in modalità lifelong: gli agenti ricevono continuamente nuovi
+        obiettivi, e il piano viene ricalcolato a intervalli regolari su una finestra temporale limitata.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)agents: agenti con la posizione di partenza e il primo obiettivo
+        -)tasks: sorgente dei nuovi obiettivi, un generatore(ad esempio random_tasks) oppure una coda(queue.Queue) di
+        posizioni o di agenti, condivisa da tutti gli agenti, oppure una lista con una sorgente per ogni agente. Se la
+        sorgente è vuota l'agente che ha raggiunto l'obiettivo resta fermo finchè non riceve un nuovo obiettivo. Gli
+        obiettivi irraggiungibili dalla posizione dell'agente(in un'altra componente connessa) vengono scartati.
+        -)timesteps: numero di istanti di tempo da simulare
+        -)window: dimensione W della finestra entro cui i conflitti vengono risolti(default: 10)
+        -)commit_steps: numero di istanti eseguiti prima di ripianificare(default: 5, al più window)
+        -)iteration_limit, heuristic, low_level: come in prioritized_planning
+        -)max_retries: numero di ordini di priorità casuali provati quando la pianificazione della finestra fallisce.
+        Se anche questi falliscono tutti gli agenti restano fermi per commit_steps istanti, una mossa sempre valida.
+        -)seed: seed per gli ordini casuali
+
+        Si offre una breve descrizione della funzione:
+        1)ogni commit_steps istanti si pianifica la finestra(plan_window) a partire dalle posizioni attuali, misurando
+        il tempo di pianificazione(latenza).
+        2)si eseguono i primi commit_steps passi dei percorsi: le prenotazioni della finestra garantiscono che tali passi
+        siano privi di conflitti.
+        3)quando un agente raggiunge il proprio obiettivo si conta un obiettivo completato e gli si assegna il prossimo
+        obiettivo raggiungibile della sua sorgente(_next_reachable_task), usato dalla pianificazione successiva.
+
+        La funzione restituisce un dizionario con:
+        -)goals_reached e throughput(obiettivi completati per istante di tempo)
+        -)latency: tempi di pianificazione di ogni finestra in secondi, con mean_latency e max_latency
+        -)failed_windows: numero di finestre in cui gli agenti sono rimasti fermi
+        -)skipped_tasks: numero di obiettivi scartati perché irraggiungibili
+        -)trajectories: per ogni agente, la posizione in ogni istante di tempo simulato
+    """
+    if not 1 <= commit_steps <= window:
+        raise ValueError("commit_steps deve essere compreso tra 1 e window.")
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    solver = low_level_solver(low_level)
+    rng = random.Random(seed)
+    sources: List[TaskSource] = tasks if isinstance(tasks, list) else [tasks] * len(agents)
+
+    positions: List[Position] = [agent.start_position for agent in agents]
+    goals: List[Position] = [agent.goal_position for agent in agents]
+    has_task: List[bool] = [True] * len(agents)
+    trajectories: List[List[Position]] = [[position] for position in positions]
+    latency: List[float] = []
+    goals_reached = 0
+    failed_windows = 0
+    skipped_tasks = 0
+
+    fixed_order = sorted(range(len(agents)), key=lambda i: agents[i].priority)
+    t = 0
+    while t < timesteps:
+        start_time = time.perf_counter()
+        paths = plan_window(map, positions, goals, fixed_order, window, heuristic, solver, iteration_limit)
+        retries = 0
+        while paths is None and retries < max_retries:
+            order = fixed_order[:]
+            rng.shuffle(order)
+            paths = plan_window(map, positions, goals, order, window, heuristic, solver, iteration_limit)
+            retries += 1
+        latency.append(time.perf_counter() - start_time)
+        if paths is None:
+            failed_windows += 1
+            paths = [[(position, 0)] * (window + 1) for position in positions]
+
+        for step in range(1, min(commit_steps, timesteps - t) + 1):
+            for i, path in enumerate(paths):
+                positions[i] = path[step][0]
+                trajectories[i].append(positions[i])
+                if has_task[i] and positions[i] == goals[i]:
+                    goals_reached += 1
+                    task, skipped = _next_reachable_task(sources[i], positions[i], heuristic)
+                    skipped_tasks += skipped
+                    has_task[i] = task is not None
+                    goals[i] = positions[i] if task is None else task
+            t += 1
+        for i in range(len(agents)):
+            if not has_task[i]:
+                task, skipped = _next_reachable_task(sources[i], positions[i], heuristic)
+                skipped_tasks += skipped
+                if task is not None:
+                    goals[i], has_task[i] = task, True
+
+    return {
+        "timesteps": timesteps,
+        "goals_reached": goals_reached,
+        "throughput": goals_reached / timesteps if timesteps else 0.0,
+        "latency": latency,
+        "mean_latency": sum(latency) / len(latency) if latency else 0.0,
+        "max_latency": max(latency, default=0.0),
+        "failed_windows": failed_windows,
+        "skipped_tasks": skipped_tasks,
+        "trajectories": trajectories,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esegui il Prioritized Planning in modalità lifelong(rolling horizon).")
+    parser.add_argument("--map_path", type=str, required=True, help="Percorso del file contenente la mappa")
+    parser.add_argument("--agents", type=int, default=50, help="Numero di agenti (default: 50)")
+    parser.add_argument("--timesteps", type=int, default=500, help="Numero di istanti di tempo da simulare (default: 500)")
+    parser.add_argument("--window", type=int, default=10, help="Finestra W entro cui si risolvono i conflitti (default: 10)")
+    parser.add_argument("--commit_steps", type=int, default=5, help="Istanti eseguiti prima di ripianificare (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed per gli agenti e per i nuovi obiettivi (default: 0)")
+    parser.add_argument("--max_iterations", type=int, default=max_iterations,
+                        help=f"Numero massimo di iterazioni di A* per ciascun agente (default: {max_iterations})")
+    parser.add_argument("--low_level", type=str, choices=LOW_LEVEL_SOLVERS, default="astar",
+                        help="Planner di basso livello per il singolo agente (default: astar)")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    cache = MapCache(args.map_path, args.cache_dir)
+    map = cache.load_map()
+    heuristic = cache.heuristic_tables(map)
+    agents = generate_agents(map, max_num_agents=args.agents, seed=args.seed, heuristic=heuristic)
+    warm_up()
+    tasks = [random_tasks(map, seed=args.seed * len(agents) + i, start=agent.start_position, heuristic=heuristic)
+             for i, agent in enumerate(agents)]
+    results = run_lifelong(map, agents, tasks, args.timesteps, window=args.window,
+                           commit_steps=args.commit_steps, iteration_limit=args.max_iterations,
+                           heuristic=heuristic, low_level=args.low_level, seed=args.seed)
+
+    print(f"Obiettivi completati: {results['goals_reached']} in {results['timesteps']} istanti")
+    print(f"Throughput: {results['throughput']:.3f} obiettivi per istante")
+    print(f"Latenza di pianificazione: media {results['mean_latency'] * 1000:.1f} ms, massima {results['max_latency'] * 1000:.1f} ms")
+    print(f"Finestre senza soluzione(agenti fermi): {results['failed_windows']}")
+    print(f"Obiettivi scartati perché irraggiungibili: {results['skipped_tasks']}")
+
+
+if __name__ == "__main__":
+    main()
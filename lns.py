@@ -0,0 +1,152 @@
+import csv
+import random
+import time
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent
+from heuristic import HeuristicTables
+from prioritized_planning import prioritized_planning, low_level_solver
+from priority_ordering import PlanningResult
+from reservation_table import ReservationTable
+from compact_path import AgentPath
+
+LNS_NEIGHBOURHOODS: List[str] = ["random", "hotspot", "proximity"]
+
+History = List[Tuple[float, int]]
+
+
+def select_neighbourhood(strategy: str, agents: List[Agent], paths: List[AgentPath], size: int,
+                         heuristic: HeuristicTables, rng: random.Random) -> List[int]:
+    """
+        Questa funzione sceglie l'insieme(vicinato) di agenti da ripianificare in un'iterazione della LNS, secondo una
+        delle strategie di LNS_NEIGHBOURHOODS:
+        -)random: size agenti scelti a caso
+        -)hotspot: si sceglie un agente con probabilità proporzionale al suo ritardo(costo del percorso meno la distanza
+        reale dall'obiettivo), cioè un agente che ha dovuto attendere o deviare a causa degli altri, e gli si
+        aggiungono gli agenti il cui percorso attraversa più celle del suo percorso
+        -)proximity: si sceglie un agente a caso e gli si aggiungono gli agenti con la posizione di partenza o la
+        posizione obiettivo più vicina(distanza di Manhattan) alla sua
+
+        La funzione restituisce la lista degli indici degli agenti scelti.
+    """
+    n_agents = len(agents)
+    size = min(size, n_agents)
+    if strategy == "random":
+        return rng.sample(range(n_agents), size)
+    if strategy == "hotspot":
+        delays = [len(path) - 1 - heuristic.distance(agent.start_position, agent.goal_position)
+                  for agent, path in zip(agents, paths)]
+        if sum(delays) > 0:
+            seed_agent = rng.choices(range(n_agents), weights=delays)[0]
+        else:
+            seed_agent = rng.randrange(n_agents)
+        seed_cells: Set[Tuple[int, int]] = {position for position, _ in paths[seed_agent]}
+        overlap = [len(seed_cells.intersection(position for position, _ in path)) for path in paths]
+        others = [i for i in range(n_agents) if i != seed_agent]
+        rng.shuffle(others)
+        others.sort(key=lambda i: -overlap[i])
+        return [seed_agent] + others[:size - 1]
+    if strategy == "proximity":
+        seed_agent = rng.randrange(n_agents)
+        start_row, start_column = agents[seed_agent].start_position
+        goal_row, goal_column = agents[seed_agent].goal_position
+
+        def proximity(i: int) -> int:
+            (row, column), (other_row, other_column) = agents[i].start_position, agents[i].goal_position
+            return min(abs(row - start_row) + abs(column - start_column),
+                       abs(other_row - goal_row) + abs(other_column - goal_column))
+
+        others = [i for i in range(n_agents) if i != seed_agent]
+        rng.shuffle(others)
+        others.sort(key=proximity)
+        return [seed_agent] + others[:size - 1]
+    raise ValueError(f"Vicinato sconosciuto: {strategy}. Vicinati disponibili: {', '.join(LNS_NEIGHBOURHOODS)}")
+
+
+def lns_refine(map: NDArray[np.int_], agents: List[Agent], pp_output: Optional[PlanningResult] = None,
+               time_budget: float = 10.0, neighbourhood_size: int = 8, strategies: Optional[List[str]] = None,
+               iteration_limit: Optional[int] = None, heuristic: Optional[HeuristicTables] = None,
+               low_level: str = "astar", seed: int = 0) -> Tuple[Optional[PlanningResult], History]:
+    """
+        Questa funzione migliora una soluzione del Prioritized Planning con una Large Neighbourhood Search(LNS)
+        anytime: finchè il tempo a disposizione non è esaurito si sceglie un vicinato di agenti, si cancellano i loro
+        percorsi e li si ripianifica, uno alla volta in ordine casuale, rispettando le prenotazioni di tutti gli altri
+        agenti. Se la somma dei costi del vicinato diminuisce i nuovi percorsi vengono mantenuti, altrimenti scartati,
+        per cui la soluzione resta sempre valida e il suo costo non aumenta mai.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)agents: lista degli agenti
+        -)pp_output: soluzione iniziale nel formato di prioritized_planning(i percorsi nell'ordine della lista agents).
+        Se non viene fornita si esegue prioritized_planning, includendone il tempo nel budget.
+        -)time_budget: tempo massimo in secondi(default: 10)
+        -)neighbourhood_size: numero di agenti ripianificati ad ogni iterazione(default: 8)
+        -)strategies: strategie di scelta del vicinato, scelte a caso ad ogni iterazione(default: tutte)
+        -)iteration_limit, heuristic, low_level: come in prioritized_planning
+        -)seed: seed del generatore pseudocasuale, per rendere riproducibile la sequenza dei vicinati
+
+        La funzione restituisce:
+        -)la soluzione migliorata nel formato di prioritized_planning(nodi espansi cumulativi, compresi quelli della
+        soluzione iniziale), oppure None se non esiste una soluzione iniziale
+        -)lo storico dei miglioramenti: una coppia (secondi dall'inizio, costo totale) per la soluzione iniziale e
+        per ogni iterazione che ha ridotto il costo, da usare per i grafici costo-tempo(genera_grafico_lns)
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    if pp_output is None:
+        pp_output = prioritized_planning(map, agents, iteration_limit=iteration_limit, heuristic=heuristic,
+                                         deadline=deadline, low_level=low_level)
+    if pp_output is None:
+        return None, []
+    expanded_nodes, paths, total_cost = pp_output
+    paths = list(paths)
+    history: History = [(time.perf_counter() - start_time, total_cost)]
+
+    solver = low_level_solver(low_level)
+    strategies = LNS_NEIGHBOURHOODS if strategies is None else strategies
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        neighbourhood = select_neighbourhood(rng.choice(strategies), agents, paths, neighbourhood_size, heuristic, rng)
+        rng.shuffle(neighbourhood)
+        excluded = set(neighbourhood)
+        reservations = ReservationTable(*map.shape)
+        for i, path in enumerate(paths):
+            if i not in excluded:
+                reservations.reserve_path(path)
+
+        new_paths: List[AgentPath] = []
+        for i in neighbourhood:
+            results = solver(map, agents[i], reservations=reservations, iteration_limit=iteration_limit,
+                             heuristic=heuristic, deadline=deadline)
+            if results is None:
+                break
+            nodes_expanded, path, _ = results
+            expanded_nodes += nodes_expanded
+            reservations.reserve_path(path)
+            new_paths.append(path)
+        if len(new_paths) < len(neighbourhood):
+            continue
+
+        old_cost = sum(len(paths[i]) - 1 for i in neighbourhood)
+        new_cost = sum(len(path) - 1 for path in new_paths)
+        if new_cost < old_cost:
+            for i, path in zip(neighbourhood, new_paths):
+                paths[i] = path
+            total_cost += new_cost - old_cost
+            history.append((time.perf_counter() - start_time, total_cost))
+    return (expanded_nodes, paths, total_cost), history
+
+
+def write_history(history: History, output_path: str) -> None:
+    """
+        Questa funzione salva lo storico dei miglioramenti della LNS in formato CSV(colonne time e total cost).
+    """
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time", "total cost"])
+        writer.writerows(history)
@@ -8,12 +8,27 @@ from agente import *
 from animation import *
 from mappa import *
 from genera_grafici import *
+from heuristic import HeuristicTables
+from map_cache import MapCache, DEFAULT_CACHE_DIR
+from astar_native import warm_up
+from priority_ordering import ORDERING_STRATEGIES, RESTART_MODES, plan_with_restarts
+from lns import LNS_NEIGHBOURHOODS, lns_refine, write_history
+from validation import find_conflicts, describe_conflict
+from instrumentation import Instrumentation, write_profile
+from focal import DEFAULT_SUBOPTIMALITY
+from pbs import HIGH_LEVEL_PLANNERS, priority_based_search
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
 
-def set_of_expirements_with_k_agents(map: np.ndarray, agents: List[Agent], total_agent_count: List[int]):
+def set_of_expirements_with_k_agents(map: np.ndarray, agents: List[Agent], total_agent_count: List[int],
+                                     iteration_limit: Optional[int] = None,
+                                     heuristic: Optional[HeuristicTables] = None,
+                                     low_level: str = "astar", ordering: str = "fixed", restarts: int = 0,
+                                     workers: Optional[int] = None, time_budget: Optional[float] = None,
+                                     restart_mode: str = "first", repair: bool = False, validate: bool = False,
+                                     profile: bool = False, high_level: str = "pp"):
     """
         Questa funzione esegue una serie di esperimenti in cui si varia il numero k di agenti con l'algoritmo Prioritized Planning su una mappa fissa,
         (la stabilità della mappa è necessari per valutare le performance dell'algpritmo 
@@ -24,6 +39,37 @@ def set_of_expirements_with_k_agents(map: np.ndarray, agents: List[Agent], total
         -) map (np.ndarray): Mappa come array bidimensionale (0: libero, 1: ostacolo).
         -)agenti_pool (List[Any]): Lista di agenti.
         -)test_agent_counts (List[int]): Elenco dei valori di k (numero agenti) da testare.
+        -)iteration_limit: numero massimo di iterazioni di A* per ciascun agente(default: max_iterations).
+        -)heuristic: tabelle delle distanze reali verso gli obiettivi. Dato che il pool di agenti è lo stesso
+        per ogni k, le tabelle vengono calcolate una sola volta e condivise da tutti gli esperimenti.
+        -)low_level: planner di basso livello usato per ogni agente("astar", "astar_symmetry", "astar_hpa", "sipp",
+        "focal" oppure "focal:<w>" con fattore di subottimalità w, vedi prioritized_planning.low_level_solver).
+        -)ordering: strategia di ordinamento delle priorità(vedi priority_ordering.order_agents, default: fixed).
+        -)restarts: numero di ordini casuali eseguiti in parallelo alla strategia ordering(default: 0).
+        -)workers, time_budget, restart_mode: processi, tempo massimo e modalità("first" oppure "best") dei
+        tentativi in parallelo(vedi priority_ordering.plan_with_restarts).
+        -)repair: se True un agente senza percorso viene riparato localmente(PlanningSession con repair=True). Se la
+        riparazione non riesce la soluzione è parziale e l'esperimento viene contato come fallimento, indicando il
+        numero di agenti non risolti.
+        -)validate: se True la soluzione di ogni esperimento viene verificata con validation.find_conflicts; una
+        soluzione con conflitti viene segnalata e contata come fallimento.
+        -)profile: se True si raccolgono le metriche per agente e per fase(instrumentation.Instrumentation). Per ogni
+        esperimento risolto si aggiunge a results["profile"] il riepilogo(Instrumentation.summary, cumulativo sulla
+        sessione come il tempo), e results["agent_profile"] contiene le metriche per agente dell'ultimo esperimento.
+        Con restarts > 0 la pianificazione avviene in altri processi e le metriche non sono disponibili.
+        Con il planner focal le metriche vengono raccolte anche senza profile, perché il riepilogo contiene il fattore
+        di subottimalità ottenuto(chiave "suboptimality").
+        -)high_level: algoritmo di alto livello, "pp"(default) per il Prioritized Planning oppure "pbs" per la
+        Priority-Based Search(pbs.priority_based_search), che cerca un ordine di priorità parziale per cui esiste una
+        soluzione. Con pbs ogni esperimento viene eseguito da zero, entro time_budget secondi se indicato, e le
+        metriche per agente non sono disponibili.
+
+        Dato che gli agenti del pool sono pianificati in ordine di priorità, il piano per k agenti è il prefisso del piano
+        per qualsiasi k successivo: gli esperimenti condividono quindi una PlanningSession, che ad ogni k pianifica soltanto
+        i nuovi agenti. Le metriche di ogni k(costo, nodi espansi e tempo cumulativo della sessione) sono identiche a
+        quelle di un'esecuzione da zero.
+        Con una strategia diversa da fixed, oppure con restarts > 0, l'ordine di pianificazione dipende da k, per cui
+        ogni esperimento viene eseguito da zero.
 
     """
     
@@ -33,9 +79,19 @@ def set_of_expirements_with_k_agents(map: np.ndarray, agents: List[Agent], total
         "running_time": [],
         "expanded_nodes": [],
         "number of success": 0,
-        "number of failure":0
+        "number of failure":0,
+        "profile": [],
+        "agent_profile": []
     }
 
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    collect_metrics: bool = profile or low_level.startswith("focal")
+    instrumentation = Instrumentation() if collect_metrics else None
+    session = PlanningSession(map, iteration_limit=iteration_limit, heuristic=heuristic, low_level=low_level, repair=repair,
+                              instrumentation=instrumentation)
+    session_time = 0.0
+
     for k in total_agent_count:
         if k>len(agents):
             raise ValueError(
@@ -43,21 +99,63 @@ def set_of_expirements_with_k_agents(map: np.ndarray, agents: List[Agent], total
             "Si aumenti la dimensione del pool o si riduca il numero di agenti da testare."
             "La dimensione del pool è data dal parametro max_agent(default=120)"
         )
-        agents_to_test = agents[:k]
-        start_time = time.time()
-        pp_output = prioritized_planning(map, agents_to_test)
-        end_time = time.time()
-        running_time=end_time-start_time
+        if high_level == "pbs":
+            instrumentation = None
+            start_time = time.time()
+            deadline = None if time_budget is None else time.perf_counter() + time_budget
+            pp_output = priority_based_search(map, agents[:k], iteration_limit=iteration_limit, heuristic=heuristic,
+                                              deadline=deadline, low_level=low_level)
+            running_time = time.time() - start_time
+        elif restarts > 0:
+            instrumentation = None
+            start_time = time.time()
+            pp_output = plan_with_restarts(map, agents[:k], strategies=[ordering], restarts=restarts, workers=workers,
+                                           time_budget=time_budget, mode=restart_mode, iteration_limit=iteration_limit,
+                                           heuristic=heuristic, low_level=low_level)
+            running_time = time.time() - start_time
+        elif ordering != "fixed":
+            instrumentation = Instrumentation() if collect_metrics else None
+            start_time = time.time()
+            pp_output = prioritized_planning(map, agents[:k], iteration_limit=iteration_limit, heuristic=heuristic,
+                                             low_level=low_level, ordering=ordering, instrumentation=instrumentation)
+            running_time = time.time() - start_time
+        else:
+            if k < session.processed_agents:
+                session = PlanningSession(map, iteration_limit=iteration_limit, heuristic=heuristic, low_level=low_level,
+                                          repair=repair, instrumentation=Instrumentation() if collect_metrics else None)
+                session_time = 0.0
+            instrumentation = session.instrumentation
+            start_time = time.time()
+            session.extend(agents[session.processed_agents:k])
+            end_time = time.time()
+            session_time += end_time-start_time
+            running_time=session_time
+            pp_output = session.checkpoint()
+            if session.unsolved:
+                print(f"Soluzione parziale per {k} agenti: {len(session.unsolved)} agenti non risolti "
+                      f"(priorità {', '.join(str(agente.priority) for agente in session.unsolved)})")
+                pp_output = None
         if pp_output is None:
             print(f"L'algoritmo PP non ha trovato nessuna soluzione valida per {k} agenti")
             results["number of failure"] += 1
+            continue
         expanded_nodes,paths,cost=pp_output
+        if validate:
+            conflicts = find_conflicts(paths, map)
+            if conflicts:
+                print(f"La soluzione per {k} agenti non è valida: {len(conflicts)} conflitti, il primo è "
+                      f"{describe_conflict(conflicts[0])}")
+                results["number of failure"] += 1
+                continue
        
         results["number agents"].append(k)
         results["total cost"].append(cost)
         results["running_time"].append(running_time)
         results["expanded_nodes"].append(expanded_nodes)
         results["number of success"]+=1
+        if instrumentation is not None:
+            results["profile"].append({"number agents": k, **instrumentation.summary()})
+            results["agent_profile"] = [stats.as_dict() for stats in instrumentation.agents]
 
     return results
 
@@ -103,25 +201,159 @@ def main():
         default=0,
         help="Seed da usare per la generazione degli agenti (default: 0)"
     )
+    parser.add_argument(
+        "--max_iterations",
+        type=int,
+        default=max_iterations,
+        help=f"Numero massimo di iterazioni di A* per ciascun agente (default: {max_iterations})"
+    )
+    parser.add_argument(
+        "--low_level",
+        type=str,
+        choices=LOW_LEVEL_SOLVERS,
+        default="astar",
+        help="Planner di basso livello per il singolo agente: astar (spazio-tempo), astar_symmetry (spazio-tempo con riduzione dei percorsi simmetrici), astar_hpa (spazio-tempo limitato al corridoio del percorso astratto HPA*) sipp (Safe Interval Path Planning) oppure focal (ricerca focale con costo al più --focal_weight volte l'ottimo)"
+    )
+    parser.add_argument(
+        "--focal_weight",
+        type=float,
+        default=None,
+        help="Fattore di subottimalità w >= 1 del planner focal (default: 1.5)"
+    )
+    parser.add_argument(
+        "--high_level",
+        type=str,
+        choices=HIGH_LEVEL_PLANNERS,
+        default="pp",
+        help="Algoritmo di alto livello: pp (Prioritized Planning con l'ordine di --ordering) oppure pbs (Priority-Based Search sugli ordini di priorità parziali, entro --time_budget secondi se indicato)"
+    )
+    parser.add_argument(
+        "--ordering",
+        type=str,
+        choices=ORDERING_STRATEGIES,
+        default="fixed",
+        help="Strategia per l'ordine di priorità degli agenti (default: fixed, l'ordine di generazione)"
+    )
+    parser.add_argument(
+        "--restarts",
+        type=int,
+        default=0,
+        help="Numero di ordini di priorità casuali provati in parallelo insieme a --ordering (default: 0)"
+    )
+    parser.add_argument(
+        "--restart_mode",
+        type=str,
+        choices=RESTART_MODES,
+        default="first",
+        help="first: prima soluzione trovata, best: soluzione di costo minimo entro --time_budget (default: first)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Numero di processi per i tentativi in parallelo (default: numero di CPU)")
+    parser.add_argument("--time_budget", type=float, default=None, help="Tempo massimo in secondi per i tentativi in parallelo o per la PBS (opzionale)")
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Ripara localmente gli agenti senza percorso ripianificando gli agenti che li bloccano"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Verifica che ogni soluzione trovata sia priva di conflitti di vertice e di arco"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Raccoglie le metriche per agente e i tempi delle fasi, salvati in results/profilo_<mappa>.csv e results/profilo_agenti_<mappa>.csv"
+    )
+    parser.add_argument(
+        "--lns_budget",
+        type=float,
+        default=0.0,
+        help="Secondi di Large Neighbourhood Search per migliorare la soluzione con il numero massimo di agenti (default: 0, disattivata)"
+    )
+    parser.add_argument("--lns_size", type=int, default=8, help="Numero di agenti ripianificati ad ogni iterazione della LNS (default: 8)")
+    parser.add_argument(
+        "--lns_neighbourhoods",
+        type=str,
+        nargs="+",
+        choices=LNS_NEIGHBOURHOODS,
+        default=LNS_NEIGHBOURHOODS,
+        help="Strategie di scelta degli agenti da ripianificare nella LNS (default: tutte)"
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Cartella della cache su disco di mappe ed euristiche (default: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument("--no_cache", action="store_true", help="Disabilita la cache su disco.")
     parser.add_argument("--show_map", action="store_true", help="Mostra la mappa statica.")
     parser.add_argument('--show_animation', action='store_true', help="Mostra l'animazione")
+    parser.add_argument(
+        "--save_animation",
+        type=str,
+        default=None,
+        help="Salva l'animazione, senza display, nel file indicato (.gif oppure .mp4, quest'ultimo richiede ffmpeg)"
+    )
+    parser.add_argument(
+        "--animation_stride",
+        type=int,
+        default=1,
+        help="Mostra un istante di tempo ogni animation_stride nell'animazione (default: 1)"
+    )
+    parser.add_argument(
+        "--animation_max_frames",
+        type=int,
+        default=None,
+        help="Numero massimo di fotogrammi dell'animazione, il passo viene aumentato se necessario (opzionale)"
+    )
 
     args = parser.parse_args()
     map_name = Path(args.map_path).stem
-    map_letta = read_map(args.map_path)
-    map = create_map(map_letta)
+    low_level = args.low_level
+    if args.focal_weight is not None:
+        if low_level != "focal":
+            parser.error("--focal_weight richiede --low_level focal")
+        low_level = f"focal:{args.focal_weight}"
+    if args.no_cache:
+        map_letta = read_map(args.map_path)
+        map = create_map(map_letta)
+        heuristic = HeuristicTables(map)
+    else:
+        cache = MapCache(args.map_path, args.cache_dir)
+        map = cache.load_map()
+        heuristic = cache.heuristic_tables(map)
     if args.show_map:
         plot_map(map)
 
-    agents_pool = generate_agents(map, max_num_agents=args.max_agents, seed=0)
+    agents_pool = generate_agents(map, max_num_agents=args.max_agents, seed=args.seed, heuristic=heuristic)
+    warm_up()
     
-    results = set_of_expirements_with_k_agents(map, agents_pool, args.agent_counts)
+    results = set_of_expirements_with_k_agents(map, agents_pool, args.agent_counts, iteration_limit=args.max_iterations,
+                                               heuristic=heuristic, low_level=low_level, ordering=args.ordering,
+                                               restarts=args.restarts, workers=args.workers, time_budget=args.time_budget,
+                                               restart_mode=args.restart_mode, repair=args.repair,
+                                               validate=args.validate, profile=args.profile, high_level=args.high_level)
 
     print("\nRisultati esperimenti Prioritized Planning:")
     print(f"{'Agenti':>10} | {'Costo Totale':>12} | {'Nodi Espansi':>13} | {'Tempo (s)':>10}")
     print("-" * 52)
     for k, costo, nodi, tempo in zip(results["number agents"], results["total cost"], results["expanded_nodes"], results["running_time"]):
         print(f"{k:>10} | {costo:>12.2f} | {nodi:>13} | {tempo:>10.3f}")
+    bounds = [(row["number agents"], row["suboptimality"]) for row in results["profile"] if "suboptimality" in row]
+    if bounds:
+        print(f"\nFattore di subottimalità ottenuto (limite {low_level.partition(':')[2] or DEFAULT_SUBOPTIMALITY}):")
+        print(f"{'Agenti':>10} | {'Fattore':>8}")
+        for k, bound in bounds:
+            print(f"{k:>10} | {bound:>8.3f}")
+    if args.profile and results["profile"]:
+        print("\nProfilo per fase (ms, cumulativo) e agente più lento:")
+        print(f"{'Agenti':>10} | {'Euristica':>10} | {'Orizzonte':>10} | {'Ricerca':>10} | {'Prenotaz.':>10} | {'Frontiera max':>13} | {'Agente lento':>12}")
+        for row in results["profile"]:
+            print(f"{row['number agents']:>10} | {row.get('heuristic_ns', 0) / 1e6:>10.1f} | {row.get('horizon_ns', 0) / 1e6:>10.1f} | "
+                  f"{row.get('search_ns', 0) / 1e6:>10.1f} | {row.get('reservation_ns', 0) / 1e6:>10.1f} | "
+                  f"{row['max_frontier']:>13} | {str(row['slowest_agent']):>12}")
+        write_profile(results["profile"], str(Path("results") / f"profilo_{map_name}.csv"))
+        write_profile(results["agent_profile"], str(Path("results") / f"profilo_agenti_{map_name}.csv"))
     
     
     genera_grafici(
@@ -133,18 +365,48 @@ def main():
     )    
 
     genera_percentuali(
-        num_agents=int(results["number agents"][-1]),
+        num_agents=max(args.agent_counts),
         num_failure=results["number of failure"],
         num_success=results["number of success"],
         map_name=map_name
     )
-    if args.show_animation:
+    if args.lns_budget > 0:
+        last_agents = agents_pool[:args.agent_counts[-1]]
+        initial = None
+        if args.high_level == "pbs":
+            initial = priority_based_search(map, last_agents, iteration_limit=args.max_iterations, heuristic=heuristic,
+                                            low_level=low_level)
+        refined, history = lns_refine(map, last_agents, pp_output=initial, time_budget=args.lns_budget, neighbourhood_size=args.lns_size,
+                                      strategies=args.lns_neighbourhoods, iteration_limit=args.max_iterations,
+                                      heuristic=heuristic, low_level=low_level)
+        if refined is None:
+            print("Nessuna soluzione iniziale trovata, LNS non disponibile.")
+        else:
+            print(f"\nLNS({args.lns_budget}s): costo {history[0][1]} -> {refined[2]} con {len(history) - 1} miglioramenti")
+            if args.validate:
+                conflicts = find_conflicts(refined[1], map)
+                print(f"Soluzione della LNS {'non valida: ' + describe_conflict(conflicts[0]) if conflicts else 'valida'}")
+            genera_grafico_lns(history, map_name)
+            write_history(history, str(Path("results") / f"lns_storico_{map_name}.csv"))
+    if args.show_animation or args.save_animation:
         last_agents = agents_pool[:args.agent_counts[-1]]
-        _, paths, _ = prioritized_planning(map, last_agents)
-        if paths is not None:
-            plot_animation(map, last_agents, paths)
+        if args.high_level == "pbs":
+            pp_output = priority_based_search(map, last_agents, iteration_limit=args.max_iterations, heuristic=heuristic,
+                                              low_level=low_level)
         else:
+            pp_output = prioritized_planning(map, last_agents, iteration_limit=args.max_iterations, heuristic=heuristic,
+                                             low_level=low_level, ordering=args.ordering)
+        if pp_output is None:
             print("Nessuna soluzione trovata, animazione non disponibile.")
+        else:
+            _, paths, _ = pp_output
+            if args.save_animation:
+                frames = save_animation(map, last_agents, paths, args.save_animation, stride=args.animation_stride,
+                                        max_frames=args.animation_max_frames)
+                print(f"Animazione salvata in {args.save_animation} ({frames} fotogrammi)")
+            if args.show_animation:
+                plot_animation(map, last_agents, paths, stride=args.animation_stride,
+                               max_frames=args.animation_max_frames)
 
 if __name__ == "__main__":
     main()
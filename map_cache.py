@@ -0,0 +1,103 @@
+import hashlib
+import json
+import shutil
+import numpy as np
+from pathlib import Path
+from typing import Union
+from numpy.typing import NDArray
+from mappa import read_map, create_map
+from heuristic import HeuristicTables, save_array, save_text
+
+DEFAULT_CACHE_DIR = ".cache"
+
+
+def map_content_hash(map_path: Union[str, Path]) -> str:
+    """
+        Questa funzione calcola l'hash(SHA-256, primi 16 caratteri esadecimali) del contenuto del file della mappa.
+        Tale hash identifica la cartella di cache della mappa: se il file cambia cambia anche l'hash,
+        e la cache precedente non viene più utilizzata.
+    """
+    return hashlib.sha256(Path(map_path).read_bytes()).hexdigest()[:16]
+
+
+def map_source_hash(map_path: Union[str, Path]) -> str:
+    """
+        Questa funzione calcola l'hash(SHA-256, primi 8 caratteri esadecimali) del percorso assoluto del file della
+        mappa, che distingue le cartelle di cache di mappe con lo stesso nome in cartelle diverse.
+    """
+    return hashlib.sha256(str(Path(map_path).resolve()).encode()).hexdigest()[:8]
+
+
+class MapCache:
+    """
+        Questa classe gestisce la cache su disco di una mappa, organizzata in una cartella
+        <cache_dir>/<nome_mappa>-<hash_percorso>-<hash_contenuto> che contiene:
+        -)grid.npy: la griglia della mappa compressa con np.packbits(1 bit per cella)
+        -)meta.json: le dimensioni della mappa, necessarie per decomprimere la griglia
+        -)heuristic/: le tabelle delle distanze reali verso gli obiettivi(file .npy), caricate con mmap_mode
+
+        In questo modo le esecuzioni successive sulla stessa mappa evitano sia la lettura del file testuale
+        sia le BFS per il calcolo dell'euristica.
+    """
+    def __init__(self, map_path: Union[str, Path], cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR):
+        """
+            Questa funzione inizializza la cache per la mappa indicata.
+            Gli argomenti della funzione sono:
+            -)map_path: percorso del file della mappa
+            -)cache_dir: cartella radice della cache(default: .cache)
+
+            Le cartelle di cache dello stesso file(stesso nome e stesso percorso) con un hash del contenuto diverso da
+            quello attuale appartengono a versioni precedenti del file e vengono eliminate. Le mappe con lo stesso nome
+            in cartelle diverse hanno cartelle di cache distinte e non si eliminano a vicenda.
+        """
+        self.map_path = Path(map_path)
+        self.key = map_content_hash(self.map_path)
+        prefix = f"{self.map_path.stem}-{map_source_hash(self.map_path)}"
+        root = Path(cache_dir)
+        self.directory = root / f"{prefix}-{self.key}"
+        if root.is_dir():
+            for stale in root.glob(f"{prefix}-*"):
+                if stale != self.directory and stale.is_dir() and len(stale.name) == len(self.directory.name):
+                    shutil.rmtree(stale, ignore_errors=True)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def load_map(self) -> NDArray[np.uint8]:
+        """
+            Questa funzione restituisce la mappa come array NumPy 2D. Se la griglia è presente nella cache
+            viene decompressa, altrimenti la mappa viene letta dal file(read_map, create_map) e salvata nella cache.
+            Una griglia o un meta.json illeggibili(ad esempio scritti da una versione precedente interrotta) vengono
+            trattati come assenti e riscritti. Entrambi i file vengono scritti in modo atomico(save_array, save_text).
+        """
+        grid_path = self.directory / "grid.npy"
+        meta_path = self.directory / "meta.json"
+        if grid_path.exists() and meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text())
+                packed = np.load(grid_path)
+                grid = np.unpackbits(packed, axis=1, count=meta["width"])
+                if grid.shape == (meta["height"], meta["width"]):
+                    return create_map(grid)
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        map = create_map(read_map(str(self.map_path)))
+        height, width = map.shape
+        save_array(grid_path, np.packbits(map.astype(bool), axis=1))
+        save_text(meta_path, json.dumps({"height": height, "width": width, "source": str(self.map_path.resolve())}))
+        return map
+
+    def heuristic_tables(self, map: NDArray[np.int_]) -> HeuristicTables:
+        """
+            Questa funzione restituisce le tabelle euristiche della mappa, salvate e caricate dalla cartella
+            heuristic/ della cache.
+        """
+        return HeuristicTables(map, directory=self.directory / "heuristic")
+
+    def cluster_graph(self, map: NDArray[np.int_], cluster_size: int = 16):
+        """
+            Questa funzione restituisce il grafo astratto di HPA*(hierarchy.ClusterGraph) della mappa, salvato e
+            caricato dalla cartella della cache, per cui la suddivisione in cluster viene calcolata una sola volta.
+        """
+        from hierarchy import cluster_graph
+
+        return cluster_graph(map, cluster_size, directory=self.directory)
+
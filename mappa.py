@@ -1,42 +1,94 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from typing import List
+from typing import Dict, List, Union
 from numpy.typing import NDArray
 
-def read_map(filename:str)-> List[List[int]]:
+PASSABLE_TERRAIN: bytes = b".GS"
+BLOCKED_TERRAIN: bytes = b"@OTW"
+
+def _terrain_lookup() -> NDArray[np.uint8]:
+    """
+        Questa funzione costruisce la tabella di conversione(256 valori, uno per byte) dai caratteri del formato
+        MovingAI ai valori della griglia:
+        -)'.', 'G': terreno libero -> 0
+        -)'S': palude, attraversabile -> 0
+        -)'@', 'O': fuori dalla mappa -> 1
+        -)'T': alberi, non attraversabili -> 1
+        -)'W': acqua, non raggiungibile dal terreno -> 1
+        Ogni altro carattere corrisponde al valore 255, che identifica un carattere non valido.
+    """
+    lookup = np.full(256, 255, dtype=np.uint8)
+    lookup[np.frombuffer(PASSABLE_TERRAIN, dtype=np.uint8)] = 0
+    lookup[np.frombuffer(BLOCKED_TERRAIN, dtype=np.uint8)] = 1
+    return lookup
+
+TERRAIN_LOOKUP: NDArray[np.uint8] = _terrain_lookup()
+
+def read_map(filename:str)-> NDArray[np.uint8]:
     """
-        Questa funzione legge un file, corrispondente alla mappa che si intende testare,
-        e lo converte in una griglia bidimensionale caratterizzata dai seguenti 2:
+        Questa funzione legge un file in formato MovingAI, corrispondente alla mappa che si intende testare,
+        e lo converte in una griglia bidimensionale caratterizzata dai seguenti 2 valori:
         -)valore 0: cella libera
         -)valore 1: ostacolo
 
         L'argomento della funzione è il filename che contiene la mappa su cui si vuole testare il
         Prioritized Planning.
-        La funzione restituisce la mappa come una griglia 2 dimensionale.
+        La funzione restituisce la mappa come un array NumPy 2D di tipo uint8(1 byte per cella).
 
         Viene fornita una breve descrizione della funzione:
-        1)apre il file il cui percorso è specificato negli argomenti della funzione
-        2)rimuove eventuali spazi bianchi e caratteri di newline dalle varie righe
-        3)inizia la costruzione e lettura della mappa vera e propria. Tale punto di inizio è rappresentato da map_start
-        4)costruisce la mappa come un'array bidimensionale verificando se una cella è libera(inserisce 0) o occupata
-        (inserisce 1).
-    """
-    with open(filename) as f:
-        lines:List[str] = [line.strip() for line in f.readlines()]
-    map_start:int = lines.index("map") + 1
-    map_lines: List[str] = lines[map_start:]
-    map: List[List[int]] = [[0 if c == '.' else 1 for c in line] for line in map_lines]
+        1)apre il file il cui percorso è specificato negli argomenti della funzione, in modalità binaria
+        2)legge l'intestazione(type, height, width) fino alla riga "map"
+        3)legge in un'unica operazione i byte della griglia e li interpreta come array NumPy(np.frombuffer),
+        rimuovendo i caratteri di fine riga
+        4)verifica che la griglia abbia esattamente height righe di width caratteri, sollevando ValueError in caso contrario
+        5)converte ogni carattere nel valore corrispondente(0 o 1) tramite la tabella TERRAIN_LOOKUP, sollevando
+        ValueError se è presente un carattere non valido.
+    """
+    header: Dict[str, str] = {}
+    with open(filename, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("ascii").strip()
+            if line == "map":
+                break
+            if line:
+                key, _, value = line.partition(" ")
+                header[key] = value.strip()
+        else:
+            raise ValueError(f"Il file {filename} non contiene la riga 'map'.")
+        body = f.read()
+    try:
+        height = int(header["height"])
+        width = int(header["width"])
+    except (KeyError, ValueError):
+        raise ValueError(f"Intestazione della mappa {filename} non valida: height e width sono obbligatori.")
+
+    raw = np.frombuffer(body, dtype=np.uint8)
+    raw = raw[raw != ord("\r")]
+    end = raw.size
+    while end > 0 and raw[end - 1] == ord("\n"):
+        end -= 1
+    raw = raw[:end]
+    if raw.size != height * (width + 1) - 1:
+        raise ValueError(f"La mappa {filename} non ha le dimensioni dichiarate({height}x{width}).")
+    rows = np.append(raw, np.uint8(ord("\n"))).reshape(height, width + 1)
+    if np.any(rows[:, width] != ord("\n")):
+        raise ValueError(f"La mappa {filename} non ha le dimensioni dichiarate({height}x{width}).")
+
+    map = TERRAIN_LOOKUP[rows[:, :width]]
+    if np.any(map == 255):
+        invalid = sorted(set(rows[:, :width][map == 255].tobytes().decode("latin-1")))
+        raise ValueError(f"La mappa {filename} contiene caratteri non validi: {invalid}")
     return map
 
-def create_map(map:List[List[int]])-> NDArray[np.int_]:
+def create_map(map:Union[NDArray[np.uint8], List[List[int]]])-> NDArray[np.uint8]:
     """
         Questa funzione converte la mappa, una griglia bidimensionale di valori interi,
-        in un array NumPy
+        in un array NumPy di tipo uint8. Se la mappa è già un array di tipo uint8 non viene eseguita alcuna copia.
 
         La funzione restituisce l'array NumPy 2D necessario per la visualizzazione della mappa.
     """
-    return np.array(map)
+    return np.asarray(map, dtype=np.uint8)
 
 def plot_map(map: NDArray[np.int_]):
     """
@@ -0,0 +1,193 @@
+import heapq
+import time
+from typing import FrozenSet, List, Optional, Set
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent
+from heuristic import HeuristicTables
+from prioritized_planning import low_level_solver
+from priority_ordering import PlanningResult
+from reservation_table import ReservationTable
+from validation import find_conflicts, INVALID_MOVE
+from compact_path import AgentPath, CompactPath
+
+HIGH_LEVEL_PLANNERS: List[str] = ["pp", "pbs"]
+
+PBS_NODE_LIMIT: int = 10000
+
+
+class PBSNode:
+    """
+        Questa classe rappresenta un nodo dell'albero di ricerca di priority_based_search: un ordine di priorità
+        parziale tra gli agenti e i percorsi che lo rispettano.
+
+        L'ordine è memorizzato come grafo aciclico: higher[i] contiene gli agenti a cui l'agente i deve dare la
+        precedenza(archi aggiunti direttamente, non la chiusura transitiva) e lower[i] gli agenti che devono dare la
+        precedenza all'agente i. I figli condividono con il padre gli insiemi che non cambiano.
+    """
+    __slots__ = ("paths", "higher", "lower", "cost")
+
+    def __init__(self, paths: List[AgentPath], higher: List[FrozenSet[int]], lower: List[FrozenSet[int]]):
+        self.paths = paths
+        self.higher = higher
+        self.lower = lower
+        self.cost = sum(len(path) - 1 for path in paths)
+
+    def ancestors(self, agent: int) -> List[int]:
+        """
+            Questa funzione restituisce gli agenti con priorità più alta dell'agente indicato(diretta o transitiva).
+        """
+        return _reachable(self.higher, agent)
+
+    def descendants(self, agent: int) -> List[int]:
+        """
+            Questa funzione restituisce gli agenti con priorità più bassa dell'agente indicato(diretta o transitiva).
+        """
+        return _reachable(self.lower, agent)
+
+
+def _reachable(edges: List[FrozenSet[int]], agent: int) -> List[int]:
+    """
+        Questa funzione restituisce gli agenti raggiungibili dall'agente indicato seguendo gli archi(escluso l'agente).
+    """
+    seen = {agent}
+    stack = [agent]
+    while stack:
+        for other in edges[stack.pop()]:
+            if other not in seen:
+                seen.add(other)
+                stack.append(other)
+    seen.discard(agent)
+    return list(seen)
+
+
+def _paths_collide(path: CompactPath, other: CompactPath) -> bool:
+    """
+        Questa funzione verifica se due percorsi sono in conflitto, con le stesse regole della tabella delle
+        prenotazioni: stessa cella nello stesso istante(considerando gli agenti parcheggiati nella cella obiettivo dopo
+        l'arrivo) oppure scambio di posto lungo un arco. Il confronto è vettorizzato sulle celle dei due percorsi
+        (CompactPath.to_cells): negli istanti comuni si cercano celle uguali e scambi, e dopo l'arrivo del percorso
+        più corto si verifica soltanto che il più lungo non attraversi la sua cella obiettivo.
+    """
+    cells, other_cells = path.to_cells(), other.to_cells()
+    common = min(len(cells), len(other_cells))
+    head, other_head = cells[:common], other_cells[:common]
+    if np.any(head == other_head) or np.any((head[1:] == other_head[:-1]) & (other_head[1:] == head[:-1])):
+        return True
+    longer, parked = (cells, other_cells[-1]) if len(cells) > common else (other_cells, cells[-1])
+    return bool(np.any(longer[common:] == parked))
+
+
+def priority_based_search(map: NDArray[np.int_], agents: List[Agent], iteration_limit: Optional[int] = None,
+                          heuristic: Optional[HeuristicTables] = None, deadline: Optional[float] = None,
+                          low_level: str = "astar", node_limit: int = PBS_NODE_LIMIT) -> Optional[PlanningResult]:
+    """
+        Questa funzione implementa la Priority-Based Search(PBS), un'alternativa al Prioritized Planning che non fissa
+        in anticipo un ordine totale di priorità, ma cerca in profondità un ordine parziale per cui esiste una soluzione.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)agents: lista degli agenti. L'attributo priority degli agenti non viene usato.
+        -)iteration_limit, heuristic, deadline, low_level: come in prioritized_planning
+        -)node_limit: numero massimo di nodi dell'albero di ricerca espansi(default: PBS_NODE_LIMIT)
+
+        La funzione restituisce None se non trova una soluzione entro node_limit nodi o entro la deadline, altrimenti
+        il numero totale di nodi espansi dalle ricerche di basso livello, i percorsi e il costo totale nel formato di
+        plan_with_ordering(percorsi nell'ordine della lista agents).
+
+        Si offre una breve descrizione della funzione:
+        1)nel nodo radice l'ordine è vuoto e ogni agente viene pianificato ignorando gli altri.
+        2)si estrae il nodo in cima alla pila e si cerca il primo conflitto(in ordine di tempo) tra i suoi percorsi con
+        validation.find_conflicts: se non ci sono conflitti i percorsi sono una soluzione.
+        3)per il conflitto tra gli agenti a e b si generano due figli, uno con a prima di b e uno con b prima di a. Un
+        figlio il cui ordine conterrebbe un ciclo viene scartato.
+        4)nel figlio con a prima di b si ripianificano, in ordine topologico, b e gli agenti con priorità più bassa di b
+        il cui percorso è in conflitto con quello di un agente con priorità più alta. Dato che nel padre ogni percorso
+        rispetta quelli degli agenti con priorità più alta, il confronto è limitato agli agenti ripianificati nel figlio
+        e a quelli che hanno acquisito la precedenza con il nuovo vincolo. Ogni agente viene ripianificato con il
+        planner di basso livello usando le prenotazioni dei soli agenti con priorità più alta.
+        Gli altri agenti mantengono il percorso del padre. Se una ripianificazione fallisce il figlio viene scartato.
+        5)i figli vengono inseriti nella pila in modo che quello di costo minore sia espanso per primo.
+    """
+    solver = low_level_solver(low_level)
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    n_agents = len(agents)
+    for agent in agents:
+        if not heuristic.is_reachable(agent.start_position, agent.goal_position):
+            print(f"L'obiettivo {agent.goal_position} non è raggiungibile dalla posizione {agent.start_position}")
+            return None
+
+    expanded_nodes = 0
+    paths: List[AgentPath] = []
+    for agent in agents:
+        results = solver(map, agent, reservations=ReservationTable(*map.shape), iteration_limit=iteration_limit,
+                         heuristic=heuristic, deadline=deadline)
+        if results is None:
+            return None
+        expanded_nodes += results[0]
+        paths.append(CompactPath.from_path(results[1], map.shape[1]))
+    empty: FrozenSet[int] = frozenset()
+    stack: List[PBSNode] = [PBSNode(paths, [empty] * n_agents, [empty] * n_agents)]
+
+    def plan_child(node: PBSNode, high: int, low: int) -> Optional[PBSNode]:
+        """
+            Questa funzione genera il figlio del nodo in cui l'agente high ha la precedenza sull'agente low, e
+            ripianifica gli agenti coinvolti dal nuovo vincolo(passo 4).
+        """
+        nonlocal expanded_nodes
+        if high in node.descendants(low):
+            return None
+        higher = list(node.higher)
+        lower = list(node.lower)
+        higher[low] = higher[low] | {high}
+        lower[high] = lower[high] | {low}
+        child = PBSNode(list(node.paths), higher, lower)
+
+        affected = set(child.descendants(low))
+        affected.add(low)
+        pending = {agent: sum(1 for other in higher[agent] if other in affected) for agent in affected}
+        ready = [agent for agent, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        replanned: Set[int] = set()
+        while ready:
+            agent = heapq.heappop(ready)
+            ancestors = child.ancestors(agent)
+            collides = agent == low
+            if not collides:
+                known = set(node.ancestors(agent))
+                path = child.paths[agent]
+                collides = any(_paths_collide(path, child.paths[other]) for other in ancestors
+                               if other in replanned or other not in known)
+            if collides:
+                reservations = ReservationTable(*map.shape)
+                for other in ancestors:
+                    reservations.reserve_path(child.paths[other])
+                results = solver(map, agents[agent], reservations=reservations, iteration_limit=iteration_limit,
+                                 heuristic=heuristic, deadline=deadline)
+                if results is None:
+                    return None
+                expanded_nodes += results[0]
+                child.paths[agent] = CompactPath.from_path(results[1], map.shape[1])
+                replanned.add(agent)
+            for other in lower[agent]:
+                pending[other] -= 1
+                if pending[other] == 0:
+                    heapq.heappush(ready, other)
+        child.cost = sum(len(path) - 1 for path in child.paths)
+        return child
+
+    for _ in range(node_limit):
+        if not stack or (deadline is not None and time.perf_counter() > deadline):
+            return None
+        node = stack.pop()
+        conflicts = find_conflicts(node.paths, map, max_conflicts=1)
+        if not conflicts:
+            return expanded_nodes, node.paths, node.cost
+        kind, a, b, _, _ = conflicts[0]
+        if kind == INVALID_MOVE:
+            raise ValueError(f"Il planner di basso livello ha restituito un percorso non valido per l'agente {a}")
+        children = [child for child in (plan_child(node, a, b), plan_child(node, b, a)) if child is not None]
+        children.sort(key=lambda child: -child.cost)
+        stack.extend(children)
+    return None
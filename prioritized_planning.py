@@ -1,9 +1,18 @@
 import math
 import heapq
+import weakref
 import numpy as np
+from array import array
+from collections import defaultdict, deque
 from queue import PriorityQueue
 from agente import Agent
+from reservation_table import ReservationTable
+from compact_path import CompactPath
+from heuristic import HeuristicTables, UNREACHABLE
+from astar_native import NATIVE_AVAILABLE, FOUND, NOT_FOUND, ITERATION_LIMIT, DEADLINE_EXCEEDED, N_COUNTERS, native_search
+from instrumentation import Instrumentation, SearchStats
 import time
+from functools import partial
 from typing import Dict, Tuple, List, Set, Optional, Any
 from numpy.typing import NDArray
 
@@ -15,6 +24,9 @@ WAIT = (0, 0)
 
 max_iterations=100000000
 
+FRONTIER_SHIFT=40
+FRONTIER_MASK=(1 << FRONTIER_SHIFT) - 1
+
 
 def manhattan_distance(s:Tuple[int, int],g: Tuple[int, int])->int:
     """
@@ -84,75 +96,242 @@ def is_new_position_possible(map:NDArray[np.int_],position:Tuple[int,int])->bool
         return False
     return True
 
-def reconstruct_path(came_from, current):
+def grid_adjacency(map:NDArray[np.int_])->List[Tuple[int, ...]]:
+    """
+        Questa funzione restituisce la tabella di adiacenza della mappa: per ogni cella(indice piatto
+        riga * larghezza + colonna) la tupla delle celle raggiungibili con le azioni UP, DOWN, LEFT, RIGHT e WAIT,
+        in quest'ordine, escludendo le posizioni fuori dalla mappa e gli ostacoli. Le celle occupate da un ostacolo
+        hanno una tupla vuota.
+
+        La tabella sostituisce le chiamate a give_new_position e is_new_position_possible ad ogni espansione di A*.
+        Viene calcolata con NumPy una sola volta per mappa e riutilizzata finchè l'array della mappa esiste.
+    """
+    cached=_adjacency_cache.get(id(map))
+    if cached is not None and cached[0]() is map:
+        return cached[1]
+    height, width = map.shape
+    free:NDArray[np.bool_]=np.asarray(map) == 0
+    cells:NDArray[np.int64]=np.arange(height * width, dtype=np.int64).reshape(height, width)
+    columns:List[NDArray[np.int64]]=[]
+    for d_row, d_col in [UP, DOWN, LEFT, RIGHT, WAIT]:
+        neighbors=np.full((height, width), -1, dtype=np.int64)
+        rows_to=slice(max(-d_row, 0), height - max(d_row, 0))
+        cols_to=slice(max(-d_col, 0), width - max(d_col, 0))
+        rows_from=slice(max(d_row, 0), height - max(-d_row, 0))
+        cols_from=slice(max(d_col, 0), width - max(-d_col, 0))
+        neighbors[rows_to, cols_to]=np.where(free[rows_from, cols_from], cells[rows_from, cols_from], -1)
+        neighbors[~free]=-1
+        columns.append(neighbors.ravel())
+    table:NDArray[np.int64]=np.stack(columns, axis=1)
+    adjacency:List[Tuple[int, ...]]=[tuple(n for n in row if n >= 0) for row in table.tolist()]
+    _adjacency_cache[id(map)]=(weakref.ref(map), adjacency, table)
+    return adjacency
+
+def grid_adjacency_array(map:NDArray[np.int_])->NDArray[np.int64]:
+    """
+        Questa funzione restituisce la tabella di adiacenza della mappa come array NumPy di forma(celle, 5), usata dal
+        kernel compilato di A*. Le colonne corrispondono alle azioni UP, DOWN, LEFT, RIGHT e WAIT, e le azioni non
+        possibili valgono -1, per cui l'ordine dei vicini validi coincide con quello di grid_adjacency.
+    """
+    grid_adjacency(map)
+    return _adjacency_cache[id(map)][2]
+
+_adjacency_cache:Dict[int, Tuple[Any, List[Tuple[int, ...]], NDArray[np.int64]]]={}
+
+def reconstruct_path(parents:"array[int]", cells:"array[int]", node:int, width:int)->CompactPath:
     """
-        Questa funzione ricostruisce il percorso ottimale calcolato dall'algoritmo A*.
+        Questa funzione ricostruisce il percorso ottimale calcolato dall'algoritmo A*, risalendo i puntatori ai
+        nodi genitori a partire dal nodo finale. Il tempo di ogni nodo coincide con la sua posizione nel percorso.
+        Il percorso viene restituito in forma compatta(compact_path.CompactPath).
         
     """
-    path = [current]
-    while current in came_from:
-        current = came_from[current]
-        path.append(current)
-    path.reverse()
-    return path 
+    reversed_cells:List[int]=[]
+    while node >= 0:
+        reversed_cells.append(cells[node])
+        node=parents[node]
+    reversed_cells.reverse()
+    return CompactPath.from_cells(reversed_cells, width)
+
+
+def corridor_distance_table(map:NDArray[np.int_],goal:Tuple[int,int],corridor:NDArray[np.int64],
+                            excluded:Optional[NDArray[np.int64]]=None)->NDArray[np.int64]:
+    """
+        Questa funzione calcola, come heuristic.compute_distance_table, la distanza reale tra ogni cella e la posizione
+        obiettivo muovendosi soltanto tra le celle del corridoio(indici piatti delle celle libere ammesse), escluse le
+        celle excluded(opzionali, ad esempio quelle degli agenti parcheggiati) diverse dall'obiettivo.
+        La BFS è vettorizzata come in compute_distance_table, ma i vicini della frontiera vengono letti dalla tabella
+        di adiacenza della mappa(grid_adjacency_array), per cui ogni livello tocca soltanto celle del corridoio e il
+        costo della BFS dipende dal numero di celle del corridoio e non dall'area della mappa. La maschera allowed
+        contiene le celle del corridoio non ancora visitate, più un elemento finale sempre falso per le mosse
+        impossibili(-1) della tabella di adiacenza, e i duplicati della frontiera vengono eliminati con l'array owner
+        invece che ordinandola(np.unique).
+
+        La funzione restituisce un array int64 appiattito delle dimensioni della mappa, il formato usato dal kernel
+        compilato di A_Star, in cui le celle esterne al corridoio e quelle da cui non è possibile raggiungere l'obiettivo
+        valgono UNREACHABLE.
+    """
+    height, width = map.shape
+    neighbors:NDArray[np.int64]=grid_adjacency_array(map)[:, :4]
+    goal_cell:int=goal[0] * width + goal[1]
+    allowed:NDArray[np.bool_]=np.zeros(height * width + 1, dtype=bool)
+    allowed[corridor]=True
+    goal_in_corridor:bool=bool(allowed[goal_cell])
+    if excluded is not None:
+        allowed[excluded]=False
+    distances:NDArray[np.int64]=np.full(height * width, UNREACHABLE, dtype=np.int64)
+    if goal_in_corridor:
+        owner:NDArray[np.int64]=np.empty(height * width, dtype=np.int64)
+        frontier:NDArray[np.int64]=np.array([goal_cell], dtype=np.int64)
+        allowed[goal_cell]=False
+        distances[goal_cell]=0
+        level:int=0
+        while frontier.size:
+            level+=1
+            candidates=neighbors[frontier].ravel()
+            candidates=candidates[allowed[candidates]]
+            allowed[candidates]=False
+            positions=np.arange(len(candidates))
+            owner[candidates]=positions
+            frontier=candidates[owner[candidates] == positions]
+            distances[frontier]=level
+    return distances
+
+
+def goal_region_size(map:NDArray[np.int_],goal:Tuple[int,int],reservations:ReservationTable,
+                     corridor:Optional[NDArray[np.int64]]=None)->int:
+    """
+        Questa funzione calcola il numero di celle della regione connessa che contiene la posizione obiettivo,
+        considerando come ostacoli, oltre a quelli della mappa, anche le celle in cui sono parcheggiati gli agenti
+        già pianificati e, se viene fornito un corridoio(indici piatti delle celle libere ammesse), le celle esterne
+        al corridoio. Con il corridoio la regione viene calcolata con la BFS vettorizzata di corridor_distance_table.
+
+        Il valore restituito è centrale per il calcolo dell'orizzonte temporale di A*: dopo l'ultimo istante di tempo
+        prenotato la mappa diventa statica, e un agente che si trova nella regione dell'obiettivo lo raggiunge in meno
+        passi del numero di celle della regione stessa.
+    """
+    if corridor is not None:
+        distances=corridor_distance_table(map, goal, corridor, excluded=reservations.parked_cells())
+        return int(np.count_nonzero(distances != UNREACHABLE))
+    width:int=map.shape[1]
+    adjacency=grid_adjacency(map)
+    is_parked=reservations.is_parked
+    goal_cell:int=goal[0] * width + goal[1]
+    visited:Set[int]={goal_cell}
+    queue=deque([goal_cell])
+    while queue:
+        cell=queue.popleft()
+        for neighbor in adjacency[cell]:
+            if neighbor in visited or is_parked(neighbor):
+                continue
+            visited.add(neighbor)
+            queue.append(neighbor)
+    return len(visited)
+
+def makespan_horizon(map:NDArray[np.int_],goal:Tuple[int,int],reservations:ReservationTable,
+                     corridor:Optional[NDArray[np.int64]]=None)->int:
+    """
+        Questa funzione calcola l'orizzonte temporale oltre il quale A* può dimostrare che non esiste alcun percorso
+        valido per l'agente. L'orizzonte è pari all'ultimo istante di tempo prenotato più il numero di celle
+        della regione che contiene la posizione obiettivo(goal_region_size), eventualmente limitata al corridoio.
+    """
+    return max(reservations.max_time, 0) + goal_region_size(map, goal, reservations, corridor)
 
 
-def A_Star(map:NDArray[np.int_],agente: Agent,constraints: Set[Tuple[Tuple[int, int], int]]):
+def A_Star(map:NDArray[np.int_],agente: Agent,reservations: ReservationTable,iteration_limit:Optional[int]=None,
+           heuristic:Optional[HeuristicTables]=None,deadline:Optional[float]=None,symmetry_breaking:bool=False,
+           native:Optional[bool]=None,corridor:Optional[NDArray[np.int64]]=None,stats:Optional[SearchStats]=None):
     """
         Questa funzione esegue l'algoritmo di ricerca A* per trovare il percorso orttimale per un agente, data la sua posizione di 
         partenza e la sua posizione di arrivo.
-        La funzione euristica che si utilizza in questa implementazione è la distanza di Manhattan, calcolata mediante la funzione
-        sopra descritta e trattata.
+        La funzione euristica che si utilizza è la distanza reale dall'obiettivo, letta dalle tabelle precalcolate
+        di HeuristicTables. Se le tabelle non vengono fornite si utilizza la distanza di Manhattan(la stessa
+        di manhattan_distance), calcolata per tutte le celle con NumPy.
 
         Gli argomenti della funzione sono:
         -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
         -)agente: agente di cui si intende trovare il percorso ottimale, la cui posizione iniziale e 
         finale è specificata come campo della classe Agent.
-        -)constraints: è l'insieme dei vincoli che devono essere rispettati. Tali vincoli sono espressi come
-        insiemi di tuple. I vincoli di cui si tiene conto sono:
-            1)(posizione,tempo): tale vincolo impedisce all'agente di trovarsi in una determinata posizione
+        -)reservations: è la tabella delle prenotazioni(ReservationTable) che devono essere rispettate. 
+        Le prenotazioni di cui si tiene conto sono:
+            1)prenotazioni di vertice: impediscono all'agente di trovarsi in una determinata posizione
             in un certo istante di tempo. Tale vincolo impedisce che vi siano conflitti di vertice.
-            2)((posizione_iniziale,posizione_arrivo),tempo): tale vincolo impedisce all'agente di percorrere
+            2)prenotazioni di arco: impediscono all'agente di percorrere
             un determinato arco nella direzione posizione_iniziale->posizione_arrivo. Questo vincolo permette di impedire
             eventuali Edge Conflicts.
+            3)prenotazioni di parcheggio: impediscono all'agente di attraversare la posizione obiettivo di un agente
+            già arrivato.
+        -)iteration_limit: numero massimo di iterazioni, usato come ultima salvaguardia(default: max_iterations).
+        -)heuristic: tabelle delle distanze reali(opzionale). Con le tabelle l'euristica costa O(1) per vicino,
+        e le celle da cui l'obiettivo non è raggiungibile vengono scartate senza essere inserite nella frontiera.
+        -)deadline: istante(misurato con time.perf_counter) oltre il quale la ricerca viene interrotta(opzionale).
+        -)symmetry_breaking: se True si riduce l'esplorazione dei percorsi simmetrici(default: False). Con l'euristica
+        delle distanze reali, nelle aree aperte molti stati hanno lo stesso valore di f perché differiscono solo per l'ordine
+        delle mosse o per la posizione delle attese; a parità di f viene espanso per primo lo stato più profondo(g maggiore),
+        per cui la ricerca segue un solo percorso verso l'obiettivo invece di esplorare tutto il plateau. I percorsi
+        simmetrici che arrivano più tardi in celle senza prenotazioni sono già eliminati dagli stati sicuri(punto 12).
+        Il costo del percorso trovato resta ottimo.
+        -)native: se True la ricerca viene eseguita dal kernel compilato con Numba(astar_native), se False
+        dall'implementazione Python. Di default(None) si usa il kernel quando Numba è installato. Le due
+        implementazioni restituiscono gli stessi percorsi, costi e nodi espansi.
+        -)corridor: indici piatti delle celle libere in cui la ricerca è ammessa(opzionale, vedi
+        hierarchy.ClusterGraph.corridor). L'euristica viene calcolata con una BFS limitata alle celle del corridoio
+        (corridor_distance_table), per cui le celle esterne risultano irraggiungibili e vengono scartate come al punto 12,
+        e l'orizzonte considera solo la regione dell'obiettivo interna al corridoio. Il costo di questi passi dipende dal
+        numero di celle del corridoio e non dall'area della mappa.
+        Il percorso trovato è ottimo tra quelli che restano nel corridoio; le tabelle heuristic non vengono usate.
+        -)stats: metriche della ricerca(instrumentation.SearchStats, opzionale). Se fornite vi si sommano i contatori
+        della ricerca(nodi generati, successori scartati per tipo, dimensione massima della frontiera) e i tempi delle
+        fasi heuristic(tabella dell'euristica), horizon(orizzonte temporale) e search(ciclo principale e ricostruzione
+        del percorso). Senza stats i tempi non vengono misurati e i contatori restano variabili locali.
         
         La funzione restituisce:
-        -)il percorso ottimale trovato per l'agente, il numero di nodi espansi, ed il costo di tale percorso
-        in caso di successo
+        -)il percorso ottimale trovato per l'agente(compact_path.CompactPath), il numero di nodi espansi, ed il costo
+        di tale percorso in caso di successo
         -)None in caso di insuccesso
 
+        Ogni stato (cella, tempo) è codificato come un singolo intero, tempo * numero_celle + cella, e ogni nodo generato
+        è identificato dal proprio indice nei buffer cells, times e parents(array della libreria standard). Dato che ogni
+        azione costa 1, il costo g di un nodo coincide con il suo tempo e non deve essere memorizzato.
+
+        L'insieme generated svolge il ruolo sia di open set sia di closed set: il primo percorso che genera uno stato
+        è sempre il migliore, per cui uno stato già generato(o espanso) non viene mai reinserito nella frontiera.
+        Inoltre gli stati "sicuri", cioè quelli il cui tempo supera l'ultima prenotazione della cella, vengono collassati:
+        dallo stato sicuro (cella, t1) l'agente può attendere nella cella fino a qualsiasi t2 > t1, per cui uno stato
+        (cella, t2) raggiunto arrivando da un'altra cella è dominato dalla catena di WAIT che parte da (cella, t1) e
+        viene scartato. Per ogni cella si conserva in safe_state il tempo minore tra gli stati sicuri generati. Se anche tutte le celle vicine
+        non hanno prenotazioni future, attendere è inutile e l'azione di WAIT non viene generata.
+
         Si offre ora una descrizione della funzione:
         1)Si inizializzano a 0 le seguenti variabili:
             -)iterations(utilizzata per dare un limite all'algoritmo A*)
-            -)count(utilizzata per tenere traccia dei nodi espansi)
-        2)si estraggono la posizione iniziale e la posizione finale dell'agente, e si definisce
-        lo stato iniziale, che contiene informazioni relative alla posizione iniziale e al time-step iniziale(ovviamente settato a 0).
-        3)si inizializza la frontiera,centrale per l'algoritmo A*, che conterrà i vari stati in ordine di funzione di valutazione
-        f=g+h, dove si ricorda che g=costo, h=funzione euristica.
-        4)si inserisce nella frontiera lo stato iniziale.
-        5)si inizializza il dizionario came_from, necessario per la ricostruzione del percorso
-        dell'agente.
-        6)si inizializza il dizionario g_score, che contiene il costo minore per raggiungere vari stati. Viene isnerito
-        come primo elemento lo stato iniziale, ed il costo per raggiungere tale stato è banalmente 0.
-        7)si inizializza open_set,un insieme che permette di verificare i nodi già presenti nella frontiera.
-        8)si settano a 0 i nodi esplorati.
-        9) si esegue un loop fin quando la frotniera non è vuota.
-            10)si verifica se il numero di iterazioni eseguite per un agente supera il numero massimo di 
+            -)count(utilizzata per tenere traccia dei nodi generati, e usata come indice del nodo)
+        2)si estraggono la posizione iniziale e la posizione finale dell'agente, convertite in indici piatti.
+        3)si legge la tabella dell'euristica per l'obiettivo(distanze reali oppure di Manhattan). Se la posizione
+        iniziale non può raggiungere l'obiettivo si restituisce subito None.
+        4)si legge la tabella di adiacenza della mappa(grid_adjacency), che elenca per ogni cella le celle raggiungibili.
+        5)si inizializzano i buffer dei nodi con il nodo iniziale(cella iniziale, tempo 0, nessun genitore) e l'insieme
+        generated degli stati già generati.
+        6)si inizializza la frontiera,centrale per l'algoritmo A*, che contiene un intero per nodo:
+        f << FRONTIER_SHIFT | indice_nodo, dove f=g+h. L'ordinamento degli interi corrisponde all'ordinamento per f,
+        a parità di f per ordine di generazione(con symmetry_breaking prima per g decrescente, codificato come
+        f*(horizon+1)+horizon-g).
+        7) si esegue un loop fin quando la frotniera non è vuota.
+            8)si verifica se il numero di iterazioni eseguite per un agente supera il numero massimo di 
             iterazioni accettate. Questo è fondamentale per porre un time-out all'algoritmo A*.
             Se il numero massimo di iterazioni viene superato si restituisce un messsaggio di errore e il percorso trovato
             sarà None, cioè l'algoritmo non è stato in grado di trovare un percorso ottimale e valido per l'agente.
-            11) si estrae dalla frontiera il nodo migliore, cioè quello caratterizzato da un valore
-            della funzione di valutazione f minore, e lo si rimuove da open_set. Questo nodo verrà dunque espanso.
-            12)se la posizione corrispondente al nodo scelto per l'espansione è uguale alla posizione obiettivo, allora
+            9) si estrae dalla frontiera il nodo migliore, cioè quello caratterizzato da un valore
+            della funzione di valutazione f minore. Questo nodo verrà dunque espanso.
+            10)se la cella corrispondente al nodo scelto per l'espansione è uguale alla cella obiettivo, e la cella
+            obiettivo non è prenotata da altri agenti negli istanti successivi(l'agente vi rimane parcheggiato), allora
             si ricostruisce il percorso dallo stato iniziale allo stato di arrivo, e si calcola il costo di tale percorso.
-            13)se la posizione corrispondente al nodo scelto differisce dalla posizione obiettivo allora si calcolano le nuove possibili
-            posizioni applicando le varie azioni. Si verifica se tale posizione sia valida e che rispetti i vincoli.
-            14) si calcola il g_score per il nodo vicino generato, e si verifica se il nuovo costo ottenuto
-            per raggiungere tale nodo è minore(quindi migliore) del costo associato a tale nodo(qualora non fosse presente tale nodo allora ha di default un costo infinito).
-            15)se il g_score è minore allora si aggiorna:
-                -)il dizionario g_score
-                -)la funzione di valutazione f
-            16)si inserisce il nodo espanso in open_set.
+            11)altrimenti, se il nodo non supera l'orizzonte temporale calcolato da makespan_horizon(oltre il quale non può
+            esistere alcun percorso valido), si considerano le celle vicine indicate dalla tabella di adiacenza.
+            12)si scartano i vicini il cui stato è già stato generato(ogni percorso verso uno stato ha lo stesso costo g,
+            per cui la prima generazione è sempre la migliore), quelli da cui l'obiettivo non è raggiungibile,
+            quelli che non rispettano le prenotazioni, gli stati sicuri raggiunti da un'altra cella e dominati da uno stato
+            sicuro già generato, e l'azione di WAIT quando né la cella né le sue vicine hanno prenotazioni future.
+            13)per ogni vicino rimasto si crea un nuovo nodo nei buffer e lo si inserisce nella frontiera.
      
     """
     
@@ -161,62 +340,411 @@ def A_Star(map:NDArray[np.int_],agente: Agent,constraints: Set[Tuple[Tuple[int,
 
     start:Tuple[int,int]=agente.start_position
     goal:Tuple[int,int]=agente.goal_position
-    start_state:Tuple[Tuple[int, int], int] = (start, 0)
-
-    frontier:List[Tuple[float, int, Tuple[int, int], int]]= []
-    heapq.heappush(frontier, (0, count, start, 0)) 
-
-    came_from:Dict[Tuple[Tuple[int, int], int], Tuple[Tuple[int, int], int]]= {}
-    g_score:Dict[Tuple[Tuple[int, int], int], float] = {start_state: 0}
-    open_set:Set[Tuple[Tuple[int, int], int]] = {start_state}
+    height, width = map.shape
+    start_cell:int=start[0] * width + start[1]
+    goal_cell:int=goal[0] * width + goal[1]
+    n_cells:int=height * width
+
+    if stats is not None:
+        phase_start:int=time.perf_counter_ns()
+    if corridor is not None:
+        h_table:NDArray[np.int_]=corridor_distance_table(map, goal, corridor)
+        if h_table[start_cell] == UNREACHABLE:
+            return None
+    elif heuristic is not None:
+        h_table=heuristic.get(goal).ravel()
+        if h_table[start_cell] == UNREACHABLE:
+            return None
+    else:
+        rows, columns = np.indices(map.shape)
+        h_table = (np.abs(rows - goal[0]) + np.abs(columns - goal[1])).ravel()
+
+    if stats is not None:
+        stats.add_time("heuristic", phase_start)
+        phase_start=time.perf_counter_ns()
+
+    limit:int=max_iterations if iteration_limit is None else iteration_limit
+    goal_free_from:int=reservations.last_reserved_time(goal_cell)
+    horizon:int=makespan_horizon(map, goal, reservations, corridor)
+    if stats is not None:
+        stats.add_time("horizon", phase_start)
+        phase_start=time.perf_counter_ns()
+
+    if NATIVE_AVAILABLE if native is None else native:
+        counters:NDArray[np.int64]=np.zeros(N_COUNTERS, dtype=np.int64)
+        status, expanded_nodes, path_cells = native_search(grid_adjacency_array(map), h_table, reservations, start_cell,
+                                                           goal_cell, goal_free_from, horizon, limit, width,
+                                                           symmetry_breaking, math.inf if deadline is None else deadline,
+                                                           counters)
+        if status == ITERATION_LIMIT:
+            print("Timeout A*: numero massimo di esecuzioni superato. Soluzione non trovata")
+        path=CompactPath.from_cells(path_cells, width) if status == FOUND else None
+        if stats is not None:
+            stats.record_search(status, expanded_nodes, counters.tolist())
+            stats.add_time("search", phase_start)
+        if path is None:
+            return None
+        return expanded_nodes,path,len(path)-1
+
+    if corridor is not None:
+        h_values:Any=defaultdict(lambda: UNREACHABLE, zip(corridor.tolist(), h_table[corridor].tolist()))
+    else:
+        h_values=h_table.tolist()
+    adjacency=grid_adjacency(map)
+    is_move_allowed=reservations.is_move_allowed
+
+    cells:"array[int]"=array('q', [start_cell])
+    times:"array[int]"=array('q', [0])
+    parents:"array[int]"=array('q', [-1])
+    generated:Set[int]={start_cell}
+    last_reserved:"array[int]"=reservations.last_reserved_times()
+    safe_state:Dict[int, int]={}
+    if last_reserved[start_cell] < 0:
+        safe_state[start_cell]=0
+
+    depth_range:int = horizon + 1 if symmetry_breaking else 1
+    frontier:List[int]= [(h_values[start_cell] * depth_range + (horizon if symmetry_breaking else 0)) << FRONTIER_SHIFT]
    
     expanded_nodes:int=0
+    pruned_duplicate:int=0
+    pruned_constraint:int=0
+    pruned_dominated:int=0
+    max_frontier:int=0
+    status:int=NOT_FOUND
+    path:Optional[CompactPath]=None
     
     while frontier:
 
-        if iterations > max_iterations:
+        if iterations > limit:
             print("Timeout A*: numero massimo di esecuzioni superato. Soluzione non trovata")
-            return None
+            status=ITERATION_LIMIT
+            break
         
         iterations += 1
+        if deadline is not None and iterations & 1023 == 0 and time.perf_counter() > deadline:
+            status=DEADLINE_EXCEEDED
+            break
+        if len(frontier) > max_frontier:
+            max_frontier=len(frontier)
 
-        _, _, current_pos, current_time = heapq.heappop(frontier)
-        open_set.discard((current_pos, current_time))
+        node:int = heapq.heappop(frontier) & FRONTIER_MASK
+        current_cell:int = cells[node]
+        current_time:int = times[node]
 
         expanded_nodes+=1
 
-        if current_pos == goal:
-            path=reconstruct_path(came_from, (current_pos, current_time))
-            cost=len(path)-1
-            return expanded_nodes,path,cost
+        if current_cell == goal_cell and current_time > goal_free_from:
+            path=reconstruct_path(parents, cells, node, width)
+            status=FOUND
+            break
 
-        for action in [UP, DOWN, LEFT, RIGHT, WAIT]:
-            neighbor = give_new_position(action, current_pos)
-            next_time = current_time + 1
+        if current_time >= horizon:
+            continue
 
-            if not is_new_position_possible(map, neighbor):
+        next_time:int = current_time + 1
+        state_offset:int = next_time * n_cells
+        neighborhood:Tuple[int, ...] = adjacency[current_cell]
+        can_wait:bool = current_time <= last_reserved[current_cell] or current_time < max(last_reserved[n] for n in neighborhood)
+        for neighbor_cell in neighborhood:
+            if neighbor_cell == current_cell and not can_wait:
+                continue
+            neighbor_state:int = state_offset + neighbor_cell
+            if neighbor_state in generated:
+                pruned_duplicate += 1
+                continue
+            h:int = h_values[neighbor_cell]
+            if h == UNREACHABLE:
+                continue
+            if not is_move_allowed(current_cell, neighbor_cell, next_time):
+                pruned_constraint += 1
                 continue
-            if (neighbor, next_time) in constraints:
+            if next_time > last_reserved[neighbor_cell]:
+                safe_time = safe_state.get(neighbor_cell)
+                if safe_time is None or next_time < safe_time:
+                    safe_state[neighbor_cell] = next_time
+                elif neighbor_cell != current_cell:
+                    pruned_dominated += 1
+                    continue
+
+            generated.add(neighbor_state)
+            count += 1
+            cells.append(neighbor_cell)
+            times.append(next_time)
+            parents.append(node)
+            priority:int = (next_time + h) * depth_range + (horizon - next_time if symmetry_breaking else 0)
+            heapq.heappush(frontier, (priority << FRONTIER_SHIFT) | count)
+
+    if stats is not None:
+        stats.record_search(status, expanded_nodes, [count, 0, pruned_duplicate, pruned_constraint, pruned_dominated,
+                                                     max_frontier])
+        stats.add_time("search", phase_start)
+    if path is None:
+        return None
+    return expanded_nodes,path,len(path)-1
+
+LOW_LEVEL_SOLVERS:List[str]=["astar", "astar_symmetry", "astar_hpa", "sipp", "focal"]
+
+def low_level_solver(name:str):
+    """
+        Questa funzione restituisce il planner di basso livello(la funzione che cerca il percorso di un singolo agente)
+        corrispondente al nome indicato:
+        -)astar: A* nello spazio-tempo(A_Star)
+        -)astar_symmetry: A* nello spazio-tempo con riduzione dei percorsi simmetrici(A_Star con symmetry_breaking)
+        -)astar_hpa: A* nello spazio-tempo limitato al corridoio del percorso astratto HPA*(hierarchy.HPA_Star)
+        -)sipp: Safe Interval Path Planning(sipp.SIPP)
+        -)focal: ricerca focale con percorsi di costo al più w volte l'ottimo(focal.Focal_Search), con il fattore di
+        subottimalità di default focal.DEFAULT_SUBOPTIMALITY. Il fattore si può indicare nel nome, ad esempio "focal:1.2".
+        Tutti i planner hanno la stessa firma e lo stesso valore restituito di A_Star.
+    """
+    if name == "astar":
+        return A_Star
+    if name == "astar_symmetry":
+        return partial(A_Star, symmetry_breaking=True)
+    if name == "astar_hpa":
+        from hierarchy import HPA_Star
+        return HPA_Star
+    if name == "sipp":
+        from sipp import SIPP
+        return SIPP
+    if name == "focal" or name.startswith("focal:"):
+        from focal import Focal_Search, DEFAULT_SUBOPTIMALITY
+        _, _, weight = name.partition(":")
+        try:
+            suboptimality = float(weight) if weight else DEFAULT_SUBOPTIMALITY
+        except ValueError:
+            raise ValueError(f"Fattore di subottimalità non valido in {name}: {weight}") from None
+        if suboptimality < 1:
+            raise ValueError(f"Il fattore di subottimalità deve essere almeno 1, ricevuto {suboptimality}")
+        return partial(Focal_Search, suboptimality=suboptimality)
+    raise ValueError(f"Planner di basso livello sconosciuto: {name}. Valori ammessi: {', '.join(LOW_LEVEL_SOLVERS)}")
+
+class PlanningSession:
+    """
+        Questa classe rappresenta una sessione di Prioritized Planning che può essere ripresa ed estesa.
+        La sessione conserva i percorsi già trovati, la tabella delle prenotazioni e i contatori(nodi espansi, costo),
+        per cui aggiungendo nuovi agenti si pianificano soltanto quelli nuovi.
+
+        Dato che il Prioritized Planning pianifica gli agenti in ordine di priorità, il piano per i primi k agenti è
+        esattamente il prefisso del piano per k+Δ agenti: estendere la sessione produce quindi gli stessi risultati
+        di un'esecuzione da zero di prioritized_planning sull'insieme completo degli agenti.
+
+        Con repair=True un agente per cui non esiste un percorso non fa fallire la sessione: si individuano gli agenti
+        già pianificati che lo bloccano, li si rimuove dal piano e li si ripianifica insieme all'agente, che viene
+        promosso alla priorità più alta del gruppo(riparazione locale, _repair). Se la riparazione non riesce l'agente
+        viene aggiunto alla lista unsolved e la pianificazione prosegue con gli agenti successivi, per cui il risultato
+        è una soluzione parziale.
+
+        Gli agenti elaborati dalla sessione(pianificati oppure in unsolved) sono contati da processed_agents, che
+        indica da quale agente riprendere quando si estende la sessione con un prefisso più lungo dello stesso pool.
+    """
+    def __init__(self, map:NDArray[np.int_], iteration_limit:Optional[int]=None,
+                 heuristic:Optional[HeuristicTables]=None, low_level:str="astar",
+                 repair:bool=False, max_repairs:int=3, instrumentation:Optional[Instrumentation]=None):
+        """
+            Questa funzione inizializza una sessione vuota.
+            Gli argomenti della funzione sono:
+            -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+            -)iteration_limit: numero massimo di iterazioni di A* per ciascun agente(default: max_iterations).
+            -)heuristic: tabelle delle distanze reali verso gli obiettivi(calcolate se non fornite).
+            -)low_level: nome del planner di basso livello(vedi low_level_solver, default: astar).
+            -)repair: se True gli agenti senza percorso vengono riparati localmente invece di far fallire la sessione.
+            -)max_repairs: numero massimo di tentativi di riparazione per agente, ognuno con un gruppo più grande.
+            -)instrumentation: raccolta delle metriche(instrumentation.Instrumentation, opzionale). Se fornita, per
+            ogni agente si registrano i contatori e i tempi delle ricerche(comprese quelle della riparazione) e il tempo
+            di inserimento delle prenotazioni(fase reservation), e per la sessione il tempo del controllo di
+            raggiungibilità(fase reachability).
+        """
+        self.map=map
+        self.solver=low_level_solver(low_level)
+        self.iteration_limit=iteration_limit
+        self.heuristic=HeuristicTables(map) if heuristic is None else heuristic
+        self.reservations=ReservationTable(*map.shape)
+        self.agents:List[Agent]=[]
+        self.paths:List[CompactPath]=[]
+        self.total_expanded_nodes:int=0
+        self.total_cost:int=0
+        self.failed:bool=False
+        self.repair=repair
+        self.max_repairs=max_repairs
+        self.unsolved:List[Agent]=[]
+        self.processed_agents:int=0
+        self.instrumentation=instrumentation
+
+    def extend(self, agenti:List[Agent], deadline:Optional[float]=None)->bool:
+        """
+            Questa funzione pianifica, in ordine di priorità, i nuovi agenti rispettando le prenotazioni degli agenti
+            già presenti nella sessione.
+
+            Gli argomenti della funzione sono:
+            -)agenti: lista dei nuovi agenti. La loro priorità non può precedere quella degli agenti già pianificati,
+            altrimenti viene sollevata un'eccezione ValueError.
+            -)deadline: istante(misurato con time.perf_counter) oltre il quale la pianificazione viene interrotta(opzionale).
+
+            La funzione restituisce True se tutti gli agenti sono stati pianificati, False altrimenti. Dopo un fallimento
+            la sessione non può più essere estesa, dato che anche qualsiasi insieme più grande di agenti fallirebbe.
+            Con repair=True la funzione restituisce False anche quando alcuni agenti restano in unsolved, ma la sessione
+            non fallisce e può essere estesa.
+        """
+        if self.failed:
+            return False
+        nuovi_agenti=sorted(agenti, key=lambda a: a.priority)
+        if self.agents and nuovi_agenti and nuovi_agenti[0].priority < self.agents[-1].priority:
+            raise ValueError("I nuovi agenti devono avere priorità successiva a quella degli agenti già pianificati.")
+
+        instrumentation=self.instrumentation
+        if instrumentation is not None:
+            phase_start=time.perf_counter_ns()
+        unreachable:List[Agent]=[]
+        for agente in nuovi_agenti:
+            if not self.heuristic.is_reachable(agente.start_position, agente.goal_position):
+                print(f"L'obiettivo {agente.goal_position} non è raggiungibile dalla posizione {agente.start_position}")
+                if not self.repair:
+                    self.failed=True
+                    return False
+                unreachable.append(agente)
+        if instrumentation is not None:
+            instrumentation.add_time("reachability", phase_start)
+
+        unsolved_before=len(self.unsolved)
+        for agente in nuovi_agenti:
+            if deadline is not None and time.perf_counter() > deadline:
+                self.failed=True
+                return False
+            self.processed_agents+=1
+            if agente in unreachable:
+                self.unsolved.append(agente)
+                continue
+            stats=None if instrumentation is None else instrumentation.start_agent(agente.priority)
+            results = self.solver(self.map, agente, reservations=self.reservations, iteration_limit=self.iteration_limit,
+                                  heuristic=self.heuristic, deadline=deadline, stats=stats)
+            if(results is None):
+                if self.repair and not self._repair(agente, deadline, stats):
+                    self.unsolved.append(agente)
+                if stats is not None:
+                    instrumentation.end_agent(stats)
+                if self.repair:
+                    continue
+                self.failed=True
+                return False
+            nodes_expandend, path_for_agente,cost = results
+
+            self.total_expanded_nodes+=nodes_expandend
+            self.total_cost+=cost
+            if stats is not None:
+                phase_start=time.perf_counter_ns()
+            self.reservations.reserve_path(path_for_agente)
+            self.agents.append(agente)
+            self.paths.append(path_for_agente)
+            if stats is not None:
+                stats.add_time("reservation", phase_start)
+                instrumentation.end_agent(stats)
+        return len(self.unsolved) == unsolved_before
+
+    def _blocking_agents(self, agente:Agent, excluded:Set[int], stats:Optional[SearchStats]=None)->Set[int]:
+        """
+            Questa funzione individua gli agenti già pianificati che bloccano l'agente indicato: si calcola il percorso
+            dell'agente ignorando tutte le prenotazioni e si restituiscono gli indici(in self.agents, esclusi quelli
+            in excluded) degli agenti che lo ostacolano, cioè che occupano una sua cella nello stesso istante(anche
+            perché parcheggiati), che percorrono uno dei suoi archi in senso opposto, oppure che attraversano la sua
+            cella obiettivo dopo il suo arrivo.
+        """
+        results = self.solver(self.map, agente, reservations=ReservationTable(*self.map.shape),
+                              iteration_limit=self.iteration_limit, heuristic=self.heuristic, stats=stats)
+        if results is None:
+            return set()
+        path = results[1]
+        arrival = len(path) - 1
+        goal = agente.goal_position
+        occupied = {(position, t) for position, t in path}
+        moves = {(path[t][0], path[t - 1][0], t) for t in range(1, len(path)) if path[t][0] != path[t - 1][0]}
+        blockers:Set[int]=set()
+        for index, other in enumerate(self.paths):
+            if index in excluded:
                 continue
-            if ((current_pos,neighbor), next_time) in constraints:
+            other_arrival = len(other) - 1
+            other_goal = other[-1][0]
+            if other_goal in {position for position, _ in path[other_arrival:]}:
+                blockers.add(index)
                 continue
+            for t, (position, _) in enumerate(other):
+                if (position, t) in occupied or (position == goal and t >= arrival) \
+                        or (t > 0 and (other[t - 1][0], position, t) in moves):
+                    blockers.add(index)
+                    break
+        return blockers
+
+    def _repair(self, agente:Agent, deadline:Optional[float]=None, stats:Optional[SearchStats]=None)->bool:
+        """
+            Questa funzione esegue la riparazione locale di un agente per cui non esiste un percorso.
+
+            Si offre una breve descrizione della funzione:
+            1)si individuano gli agenti che bloccano l'agente(_blocking_agents) e li si aggiunge al gruppo da ripianificare.
+            2)si ricostruisce la tabella delle prenotazioni con i soli agenti esterni al gruppo.
+            3)si pianifica l'agente per primo e poi gli agenti del gruppo nel loro ordine di priorità.
+            4)se tutti i percorsi vengono trovati la riparazione viene applicata alla sessione; altrimenti si aggiungono
+            al gruppo gli agenti che bloccano l'agente fallito e si riprova, per al più max_repairs tentativi.
+            In caso di insuccesso la sessione resta invariata.
+            Le ricerche della riparazione vengono registrate nelle metriche stats dell'agente riparato(opzionali).
+        """
+        group:Set[int]=set()
+        failed_agent=agente
+        for _ in range(self.max_repairs):
+            blockers=self._blocking_agents(failed_agent, group, stats)
+            if not blockers:
+                return False
+            group|=blockers
+            reservations=ReservationTable(*self.map.shape)
+            for index, path in enumerate(self.paths):
+                if index not in group:
+                    reservations.reserve_path(path)
+            order=[agente]+[self.agents[index] for index in sorted(group)]
+            new_paths:List[CompactPath]=[]
+            expanded_nodes=0
+            for member in order:
+                if deadline is not None and time.perf_counter() > deadline:
+                    return False
+                results=self.solver(self.map, member, reservations=reservations, iteration_limit=self.iteration_limit,
+                                    heuristic=self.heuristic, deadline=deadline, stats=stats)
+                if results is None:
+                    failed_agent=member
+                    break
+                expanded_nodes+=results[0]
+                reservations.reserve_path(results[1])
+                new_paths.append(results[1])
+            else:
+                for index, path in zip(sorted(group), new_paths[1:]):
+                    self.paths[index]=path
+                self.agents.append(agente)
+                self.paths.append(new_paths[0])
+                self.reservations=reservations
+                self.total_expanded_nodes+=expanded_nodes
+                self.total_cost=sum(len(path) - 1 for path in self.paths)
+                return True
+        return False
 
-            new_g_score = g_score[(current_pos, current_time)] + 1
+    def checkpoint(self):
+        """
+            Questa funzione restituisce lo stato attuale della sessione nello stesso formato di prioritized_planning:
+            -)None se la sessione è fallita
+            -)il numero totale di nodi espansi, i percorsi trovati e il costo totale. Con repair=True i percorsi
+            corrispondono agli agenti di self.agents, e gli agenti in self.unsolved non hanno un percorso.
+        """
+        if self.failed:
+            return None
+        return self.total_expanded_nodes,list(self.paths),self.total_cost
 
-            neighbor_state = (neighbor, next_time)
+    def __len__(self)->int:
+        """
+            Questa funzione restituisce il numero di agenti pianificati, esclusi quelli in unsolved(vedi
+            processed_agents).
+        """
+        return len(self.agents)
 
-            if new_g_score < g_score.get(neighbor_state, float('inf')):
-                came_from[neighbor_state] = (current_pos, current_time)
-                g_score[neighbor_state] = new_g_score
-                f =new_g_score + manhattan_distance(neighbor, goal)
-                if neighbor_state not in open_set:
-                    count += 1
-                    heapq.heappush(frontier, (f, count, neighbor, next_time))
-                    open_set.add(neighbor_state)
-    
-    return None 
 
-def prioritized_planning(map:NDArray[np.int_],agenti:List[Agent]):
+def prioritized_planning(map:NDArray[np.int_],agenti:List[Agent],iteration_limit:Optional[int]=None,
+                         heuristic:Optional[HeuristicTables]=None,deadline:Optional[float]=None,
+                         low_level:str="astar",ordering:str="fixed",
+                         instrumentation:Optional[Instrumentation]=None):
     """
         Questa funzione implementa l'algoritmo Prioritized Planning, un algoritmo
         che ricerca i percorsi per i vari agenti seguendo l'ordine di priorità assegnato.
@@ -226,47 +754,79 @@ def prioritized_planning(map:NDArray[np.int_],agenti:List[Agent]):
         -)agenti:lista di agenti che si considerano nell'istanza.
             Ogni agente ha come attributo, oltre alla posizione iniziale e finale, anche un valore intero che ne indica
             il livello di priorità.
+        -)iteration_limit: numero massimo di iterazioni di A* per ciascun agente(default: max_iterations).
+        -)heuristic: tabelle delle distanze reali verso gli obiettivi. Se non vengono fornite si calcolano
+        per questa sola esecuzione; passarle esplicitamente permette di condividerle tra più esecuzioni sulla stessa mappa.
+        -)deadline: istante(misurato con time.perf_counter) oltre il quale la pianificazione viene interrotta e
+        si restituisce None(opzionale).
+        -)low_level: nome del planner di basso livello usato per ogni agente: "astar"(default) oppure "sipp".
+        -)ordering: strategia con cui si sceglie l'ordine di priorità(vedi priority_ordering.order_agents). Con "fixed"
+        (default) si usa l'attributo priority degli agenti; con le altre strategie i percorsi restituiti seguono comunque
+        l'ordine della lista agenti.
+        -)instrumentation: raccolta delle metriche per agente e per fase(instrumentation.Instrumentation, opzionale,
+        vedi PlanningSession). Di default la strumentazione è disattivata.
         
         La funzione restituisce:
         -)None in caso di fallimento
         -)Il numero totale di nodi espansi, il costo totale per i vari percorsi e i vari percorsi trovati.
 
+        La pianificazione viene eseguita da una PlanningSession, che può essere usata direttamente per aggiungere
+        agenti in modo incrementale.
+
         Si offre una breve descrizione della funzione:
+        0)si verifica, tramite le tabelle delle distanze, che ogni agente possa raggiungere il proprio obiettivo nella
+        mappa statica: in caso contrario l'istanza non è risolvibile e si restituisce None senza eseguire alcuna ricerca.
         1)si inizializza il numero totale di nodi espansi a 0, cosi come il costo totale.
         2)la lista dei percorsi trovati per i vari agenti viene inizializzata come lista vuota
-        3)l'insieme dei vincoli è inizialmente un insieme vuoto.
+        3)la tabella delle prenotazioni(ReservationTable) è inizialmente vuota.
         4)si esegue un ciclo sull'insieme dei vari agenti, ordinati in base allaloro priorità.
-        5)si richiama l'algoritmo A* per ricercare il percorso ottimale per l'agente.
-        Se tale percorso esiste, cioè non è None, allora si aggiornano i dati e si aggiorna l'insieme dei vincoli aggiungendo
+        5)si richiama l'algoritmo A*(o il planner di basso livello scelto) per ricercare il percorso ottimale per l'agente.
+        Se tale percorso esiste, cioè non è None, allora si aggiornano i dati e si aggiorna la tabella delle prenotazioni aggiungendo
         per i successivi agenti:
         1)vertex conflict: si impedisce agli agenti successivi di trovarsi nella stessa posizione nello stesso istante di tempo
         di un agente già pianificato.
         2)edge conflict: si impedisce agli agenti successivi di spostarsi lurgo un arco che in un dato istante di tempo
         viene attraversato da un agente già pianificato
+        3)parcheggio: la posizione obiettivo di un agente già pianificato resta occupata dall'istante di arrivo in poi
 
 
     """
-    total_expandend_nodes:int=0
-    total_cost:int=0
-    paths:List[List[Tuple[Tuple[int, int], int]]]=[]
-    constraints=set()
-
-    for agente in sorted(agenti, key=lambda a: a.priority):
-        results = A_Star(map, agente, constraints=constraints.copy())
-        if(results is None):
-            return None
-        nodes_expandend, path_for_agente,cost = results
-        
-        total_expandend_nodes+=nodes_expandend
-        total_cost+=cost
-        if path_for_agente is None:
-            return None
-        for posizione,tempo in path_for_agente:
-            constraints.add((posizione, tempo))
-        for t in range(1, len(path_for_agente)):
-            prev_pos = path_for_agente[t - 1][0]
-            curr_pos = path_for_agente[t][0]
-            constraints.add(((curr_pos, prev_pos), t))
-        paths.append(path_for_agente)
-
-    return total_expandend_nodes,paths,total_cost
\ No newline at end of file
+    if ordering != "fixed":
+        from priority_ordering import order_agents, plan_with_ordering
+        if heuristic is None:
+            heuristic=HeuristicTables(map)
+        order=order_agents(map, agenti, ordering, heuristic)
+        return plan_with_ordering(map, agenti, order, iteration_limit=iteration_limit, heuristic=heuristic,
+                                  deadline=deadline, low_level=low_level, instrumentation=instrumentation)
+    session=PlanningSession(map, iteration_limit=iteration_limit, heuristic=heuristic, low_level=low_level,
+                            instrumentation=instrumentation)
+    session.extend(agenti, deadline=deadline)
+    return session.checkpoint()
+
+
+def prioritized_planning_with_repair(map:NDArray[np.int_],agenti:List[Agent],iteration_limit:Optional[int]=None,
+                                     heuristic:Optional[HeuristicTables]=None,deadline:Optional[float]=None,
+                                     low_level:str="astar",max_repairs:int=3):
+    """
+        Questa funzione esegue il Prioritized Planning con la riparazione locale(PlanningSession con repair=True):
+        quando per un agente non esiste un percorso, invece di scartare tutti i percorsi già trovati si ripianifica
+        soltanto il piccolo gruppo di agenti che lo blocca, con l'agente promosso alla priorità più alta.
+
+        Gli argomenti sono gli stessi di prioritized_planning, con in più:
+        -)max_repairs: numero massimo di tentativi di riparazione per agente(default: 3)
+
+        La funzione restituisce:
+        -)None se la deadline è stata superata
+        -)altrimenti il numero totale di nodi espansi, i percorsi, il costo totale e la lista degli agenti non risolti.
+        I percorsi seguono l'ordine di priorità degli agenti, con None per gli agenti non risolti; se la lista degli
+        agenti non risolti è vuota la soluzione è completa, altrimenti è una soluzione parziale valida per gli altri
+        agenti.
+    """
+    session=PlanningSession(map, iteration_limit=iteration_limit, heuristic=heuristic, low_level=low_level,
+                            repair=True, max_repairs=max_repairs)
+    session.extend(agenti, deadline=deadline)
+    if session.failed:
+        return None
+    planned={id(agente): path for agente, path in zip(session.agents, session.paths)}
+    paths=[planned.get(id(agente)) for agente in sorted(agenti, key=lambda a: a.priority)]
+    return session.total_expanded_nodes,paths,session.total_cost,list(session.unsolved)
@@ -0,0 +1,175 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent
+from astar_native import warm_up
+from heuristic import HeuristicTables, UNREACHABLE
+from instrumentation import Instrumentation
+from prioritized_planning import PlanningSession
+from compact_path import AgentPath
+
+ORDERING_STRATEGIES: List[str] = ["fixed", "longest_distance", "most_constrained", "random"]
+RESTART_MODES: List[str] = ["first", "best"]
+
+PlanningResult = Tuple[int, List[AgentPath], int]
+
+
+def order_agents(map: NDArray[np.int_], agents: List[Agent], strategy: str,
+                 heuristic: Optional[HeuristicTables] = None, seed: int = 0) -> List[int]:
+    """
+        Questa funzione calcola l'ordine di priorità con cui pianificare gli agenti, secondo una delle strategie
+        di ORDERING_STRATEGIES:
+        -)fixed: l'ordine dato dall'attributo priority degli agenti(quello di generate_agents)
+        -)longest_distance: prima gli agenti con la distanza reale più lunga tra partenza e obiettivo, che hanno
+        meno possibilità di aggirare i percorsi già prenotati
+        -)most_constrained: prima gli agenti il cui corridoio dei percorsi minimi(le celle c con
+        d(partenza, c) + d(c, obiettivo) = d(partenza, obiettivo)) contiene più posizioni obiettivo di altri agenti,
+        cioè celle che potrebbero essere occupate da un agente parcheggiato
+        -)random: un ordine casuale, riproducibile tramite il seed
+
+        A parità di valore si mantiene l'ordine di priorità originale.
+        La funzione restituisce la lista degli indici degli agenti(posizioni nella lista agents) nell'ordine scelto.
+    """
+    fixed = sorted(range(len(agents)), key=lambda i: agents[i].priority)
+    if strategy == "fixed":
+        return fixed
+    if strategy == "random":
+        random.Random(seed).shuffle(fixed)
+        return fixed
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    distances = [heuristic.distance(agent.start_position, agent.goal_position) for agent in agents]
+    if strategy == "longest_distance":
+        return sorted(fixed, key=lambda i: -distances[i])
+    if strategy == "most_constrained":
+        goal_rows, goal_columns = np.array([agent.goal_position for agent in agents], dtype=np.int64).reshape(-1, 2).T
+        blocking: List[int] = []
+        for i, agent in enumerate(agents):
+            to_goal = heuristic.get(agent.goal_position)[goal_rows, goal_columns]
+            from_start = heuristic.get(agent.start_position)[goal_rows, goal_columns]
+            on_corridor = (to_goal != UNREACHABLE) & (from_start != UNREACHABLE) & (to_goal + from_start == distances[i])
+            on_corridor[i] = False
+            blocking.append(int(np.count_nonzero(on_corridor)))
+        return sorted(fixed, key=lambda i: -blocking[i])
+    raise ValueError(f"Strategia di ordinamento sconosciuta: {strategy}. Strategie disponibili: {', '.join(ORDERING_STRATEGIES)}")
+
+
+def plan_with_ordering(map: NDArray[np.int_], agents: List[Agent], order: List[int],
+                       iteration_limit: Optional[int] = None, heuristic: Optional[HeuristicTables] = None,
+                       deadline: Optional[float] = None, low_level: str = "astar",
+                       instrumentation: Optional[Instrumentation] = None) -> Optional[PlanningResult]:
+    """
+        Questa funzione esegue il Prioritized Planning pianificando gli agenti nell'ordine indicato(lista di indici,
+        vedi order_agents). Gli agenti vengono copiati con la nuova priorità, senza modificare quelli originali.
+
+        La funzione restituisce None in caso di fallimento, altrimenti il numero totale di nodi espansi, i percorsi e il
+        costo totale come prioritized_planning; i percorsi sono restituiti nell'ordine della lista agents, e non
+        nell'ordine di pianificazione, per cui l'i-esimo percorso appartiene sempre all'i-esimo agente.
+        Le metriche raccolte da instrumentation(opzionale) seguono invece l'ordine di pianificazione.
+    """
+    reordered = [Agent(agents[i].start_position, agents[i].goal_position, agents[i].color, priority)
+                 for priority, i in enumerate(order, start=1)]
+    session = PlanningSession(map, iteration_limit=iteration_limit, heuristic=heuristic, low_level=low_level,
+                              instrumentation=instrumentation)
+    session.extend(reordered, deadline=deadline)
+    pp_output = session.checkpoint()
+    if pp_output is None:
+        return None
+    expanded_nodes, planned_paths, cost = pp_output
+    paths: List[AgentPath] = [[] for _ in agents]
+    for path, i in zip(planned_paths, order):
+        paths[i] = path
+    return expanded_nodes, paths, cost
+
+
+_worker_map: Optional[NDArray[np.int_]] = None
+_worker_agents: List[Agent] = []
+_worker_heuristic: Optional[HeuristicTables] = None
+_worker_options: Dict[str, Any] = {}
+
+
+def _init_worker(map: NDArray[np.int_], agents: List[Agent], heuristic_directory: Optional[Path],
+                 iteration_limit: Optional[int], low_level: str) -> None:
+    """
+        Questa funzione inizializza un processo worker con l'istanza da risolvere. Se le tabelle euristiche sono
+        salvate su disco(ad esempio nella cache di MapCache) vengono lette dalla stessa cartella.
+    """
+    global _worker_map, _worker_agents, _worker_heuristic, _worker_options
+    _worker_map = map
+    _worker_agents = agents
+    _worker_heuristic = HeuristicTables(map, directory=heuristic_directory)
+    _worker_options = {"iteration_limit": iteration_limit, "low_level": low_level}
+    warm_up()
+
+
+def _run_ordering(strategy: str, seed: int, end_time: Optional[float]) -> Optional[PlanningResult]:
+    """
+        Questa funzione esegue, all'interno di un worker, il Prioritized Planning con un ordine di priorità.
+        end_time è espresso con time.time, condiviso da tutti i processi, e viene convertito nella deadline
+        (time.perf_counter) usata dal Prioritized Planning.
+    """
+    deadline = None if end_time is None else time.perf_counter() + end_time - time.time()
+    order = order_agents(_worker_map, _worker_agents, strategy, _worker_heuristic, seed)
+    return plan_with_ordering(_worker_map, _worker_agents, order, heuristic=_worker_heuristic, deadline=deadline,
+                              **_worker_options)
+
+
+def plan_with_restarts(map: NDArray[np.int_], agents: List[Agent], strategies: Optional[List[str]] = None,
+                       restarts: int = 0, workers: Optional[int] = None, time_budget: Optional[float] = None,
+                       mode: str = "first", iteration_limit: Optional[int] = None,
+                       heuristic: Optional[HeuristicTables] = None, low_level: str = "astar",
+                       seed: int = 0) -> Optional[PlanningResult]:
+    """
+        Questa funzione esegue in parallelo, su più processi, il Prioritized Planning con diversi ordini di priorità,
+        in modo da aumentare la probabilità di trovare una soluzione senza ripetere i tentativi in serie.
+
+        Gli argomenti della funzione sono:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)agents: lista degli agenti
+        -)strategies: strategie di ordinamento da provare(default: fixed, longest_distance e most_constrained)
+        -)restarts: numero di ordini casuali aggiuntivi(strategia random con seed seed+1, seed+2, ...)
+        -)workers: numero di processi(default: numero di CPU)
+        -)time_budget: tempo massimo in secondi(opzionale)
+        -)mode: "first" per restituire la prima soluzione trovata, "best" per restituire quella di costo minimo
+        tra quelle trovate entro il time_budget
+        -)iteration_limit, heuristic, low_level: come in prioritized_planning
+        -)seed: seed della strategia random
+
+        La funzione restituisce None se nessun ordine ha prodotto una soluzione, altrimenti il risultato vincente nel
+        formato di plan_with_ordering(percorsi nell'ordine della lista agents). Quando il risultato è stato scelto i
+        tentativi ancora in esecuzione vengono interrotti. Con mode="first" il vincitore dipende dai tempi di
+        esecuzione, e può quindi cambiare tra due esecuzioni.
+    """
+    from batch_runner import _shutdown
+
+    if mode not in RESTART_MODES:
+        raise ValueError(f"Modalità sconosciuta: {mode}. Modalità disponibili: {', '.join(RESTART_MODES)}")
+    strategies = ["fixed", "longest_distance", "most_constrained"] if strategies is None else strategies
+    attempts = [(strategy, seed) for strategy in strategies] + [("random", seed + r) for r in range(1, restarts + 1)]
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    end_time = None if time_budget is None else time.time() + time_budget
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(map, agents, heuristic.directory, iteration_limit, low_level))
+    best: Optional[PlanningResult] = None
+    try:
+        running = {executor.submit(_run_ordering, strategy, attempt_seed, end_time) for strategy, attempt_seed in attempts}
+        while running:
+            remaining = None if end_time is None else end_time - time.time()
+            if remaining is not None and remaining <= 0:
+                break
+            done, running = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None and (best is None or result[2] < best[2]):
+                    best = result
+            if best is not None and mode == "first":
+                break
+    finally:
+        _shutdown(executor)
+    return best
@@ -0,0 +1,274 @@
+from array import array
+from bisect import insort
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from compact_path import AgentPath, CompactPath
+
+Position = Tuple[int, int]
+Interval = Tuple[int, int]
+
+FOREVER: int = 1 << 60
+
+
+class ReservationTable:
+    """
+        Questa classe rappresenta la tabella delle prenotazioni usata dal Prioritized Planning per tenere traccia
+        delle celle e degli archi già occupati dagli agenti pianificati in precedenza.
+
+        Le celle della mappa sono identificate da un indice piatto, cella = riga * larghezza + colonna, e ogni
+        prenotazione è codificata come un singolo intero, evitando di allocare e calcolare l'hash di tuple annidate
+        ad ogni espansione di A*:
+        -)prenotazione di vertice: t * numero_celle + cella
+        -)prenotazione di arco: (t * numero_celle + cella_di_partenza) * 4 + direzione, dove la direzione
+        (UP, DOWN, LEFT, RIGHT) identifica la cella di arrivo.
+
+        Entrambe le verifiche hanno costo O(1), e la memoria occupata è proporzionale alla somma delle lunghezze
+        dei percorsi prenotati.
+
+        Un agente che raggiunge la propria posizione obiettivo vi rimane parcheggiato: la cella obiettivo
+        viene quindi prenotata dall'istante di arrivo in poi(prenotazione di parcheggio).
+
+        Per ogni cella si conserva inoltre la lista ordinata degli istanti prenotati, da cui si ricavano gli
+        intervalli sicuri(safe_intervals) usati da SIPP.
+
+        Il kernel compilato di A*(astar_native) legge invece le prenotazioni come array NumPy(as_arrays).
+    """
+    def __init__(self, height: int, width: int):
+        """
+            Questa funzione inizializza una tabella delle prenotazioni vuota.
+            Gli argomenti della funzione sono:
+            -)height: altezza della mappa
+            -)width: larghezza della mappa
+        """
+        self.height = height
+        self.width = width
+        self.n_cells = height * width
+        self._vertex: Set[int] = set()
+        self._edge: Set[int] = set()
+        self._parked: Dict[int, int] = {}
+        self._vertex_times: Dict[int, List[int]] = {}
+        self._last_time: "array[int]" = array("q", [-1]) * self.n_cells
+        self.max_time: int = -1
+        self._arrays: Optional[Tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.int64]]] = None
+
+    def cell_index(self, position: Position) -> int:
+        """
+            Questa funzione restituisce l'indice piatto della cella corrispondente alla posizione (riga, colonna).
+        """
+        return position[0] * self.width + position[1]
+
+    def _direction(self, from_cell: int, to_cell: int) -> int:
+        """
+            Questa funzione restituisce la direzione (0=UP, 1=DOWN, 2=LEFT, 3=RIGHT) dello spostamento
+            tra due celle adiacenti.
+        """
+        delta = to_cell - from_cell
+        if delta == -self.width:
+            return 0
+        if delta == self.width:
+            return 1
+        if delta == -1:
+            return 2
+        return 3
+
+    def _edge_key(self, from_cell: int, to_cell: int, time: int) -> int:
+        return (time * self.n_cells + from_cell) * 4 + self._direction(from_cell, to_cell)
+
+    def reserve_vertex(self, cell: int, time: int) -> None:
+        """
+            Questa funzione prenota la cella per l'istante di tempo indicato.
+        """
+        key = time * self.n_cells + cell
+        if key in self._vertex:
+            return
+        self._vertex.add(key)
+        self._arrays = None
+        times = self._vertex_times.setdefault(cell, [])
+        if not times or time > times[-1]:
+            times.append(time)
+        else:
+            insort(times, time)
+        if time > self._last_time[cell]:
+            self._last_time[cell] = time
+        if time > self.max_time:
+            self.max_time = time
+
+    def _reserve_compact_path(self, path: CompactPath) -> None:
+        """
+            Questa funzione inserisce le prenotazioni di vertice e di arco di un percorso compatto(vedi reserve_path),
+            con lo stesso effetto di reserve_vertex e reserve_edge. Il ciclo scorre le sequenze del percorso, con le
+            chiavi calcolate direttamente dall'indice della cella, senza creare le coppie (posizione, tempo) e senza
+            una chiamata di funzione per ogni istante; la prenotazione di arco viene calcolata solo all'inizio di
+            ogni sequenza.
+        """
+        n_cells = self.n_cells
+        width = self.width
+        vertex = self._vertex
+        edge = self._edge
+        vertex_times = self._vertex_times
+        last_time = self._last_time
+        previous_cell = -1
+        for cell, arrival, departure in path.runs():
+            if previous_cell >= 0:
+                delta = previous_cell - cell
+                direction = 0 if delta == -width else 1 if delta == width else 2 if delta == -1 else 3
+                edge.add((arrival * n_cells + cell) * 4 + direction)
+            times = vertex_times.setdefault(cell, [])
+            for time in range(arrival, departure):
+                key = time * n_cells + cell
+                if key in vertex:
+                    continue
+                vertex.add(key)
+                if not times or time > times[-1]:
+                    times.append(time)
+                else:
+                    insort(times, time)
+            if departure - 1 > last_time[cell]:
+                last_time[cell] = departure - 1
+            previous_cell = cell
+        if len(path) - 1 > self.max_time:
+            self.max_time = len(path) - 1
+        self._arrays = None
+
+    def reserve_goal(self, cell: int, time: int) -> None:
+        """
+            Questa funzione parcheggia un agente nella cella indicata: la cella risulta occupata
+            dall'istante di arrivo in poi.
+        """
+        self._parked[cell] = time
+        self._arrays = None
+        self.reserve_vertex(cell, time)
+
+    def reserve_edge(self, from_cell: int, to_cell: int, time: int) -> None:
+        """
+            Questa funzione vieta lo spostamento from_cell->to_cell che termina nell'istante di tempo indicato.
+        """
+        self._edge.add(self._edge_key(from_cell, to_cell, time))
+        self._arrays = None
+
+    def reserve_path(self, path: AgentPath, park_goal: bool = True) -> None:
+        """
+            Questa funzione inserisce nella tabella tutte le prenotazioni generate dal percorso di un agente:
+            1)vertex conflict: ogni coppia (posizione, tempo) del percorso viene prenotata.
+            2)swapping conflict: per ogni spostamento prev->curr che termina al tempo t si vieta lo spostamento
+            inverso curr->prev al tempo t. Le azioni di WAIT non generano prenotazioni di arco.
+            3)se park_goal è True, l'ultima cella del percorso viene prenotata dall'istante di arrivo in poi.
+            Un percorso compatto(CompactPath) viene inserito senza creare le coppie (posizione, tempo), con le chiavi
+            calcolate in blocco(_reserve_compact_path); le prenotazioni di arco riguardano solo l'inizio di ogni sequenza.
+        """
+        if isinstance(path, CompactPath):
+            if len(path):
+                self._reserve_compact_path(path)
+                if park_goal:
+                    self.reserve_goal(int(path.cells[-1]), len(path) - 1)
+            return
+        width = self.width
+        previous_cell = -1
+        for index, (position, time) in enumerate(path):
+            cell = position[0] * width + position[1]
+            self.reserve_vertex(cell, time)
+            if index > 0 and cell != previous_cell:
+                self.reserve_edge(cell, previous_cell, time)
+            previous_cell = cell
+        if park_goal and path:
+            self.reserve_goal(previous_cell, path[-1][1])
+
+    def is_vertex_reserved(self, cell: int, time: int) -> bool:
+        """
+            Questa funzione verifica se la cella è occupata nell'istante di tempo indicato, considerando
+            anche gli agenti parcheggiati nella propria posizione obiettivo.
+        """
+        parked = self._parked.get(cell)
+        if parked is not None and time >= parked:
+            return True
+        return time * self.n_cells + cell in self._vertex
+
+    def last_reserved_time(self, cell: int) -> int:
+        """
+            Questa funzione restituisce l'ultimo istante di tempo in cui la cella è prenotata, oppure -1
+            se la cella non è mai prenotata. Per una cella di parcheggio restituisce l'istante di arrivo.
+        """
+        return self._last_time[cell]
+
+    def last_reserved_times(self) -> "array[int]":
+        """
+            Questa funzione restituisce l'array(indicizzato per cella) degli ultimi istanti di tempo prenotati,
+            usato da A* per leggere tali valori senza una chiamata di funzione per ogni nodo generato.
+            L'array non deve essere modificato.
+        """
+        return self._last_time
+
+    def as_arrays(self) -> Tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.int64]]:
+        """
+            Questa funzione restituisce le prenotazioni come array NumPy, usati dal kernel compilato di A*:
+            -)le chiavi delle prenotazioni di vertice, ordinate(ricerca binaria)
+            -)le chiavi delle prenotazioni di arco, ordinate
+            -)per ogni cella, l'istante da cui è parcheggiato un agente(FOREVER se nessun agente vi è parcheggiato)
+
+            Gli array vengono costruiti una sola volta e riutilizzati finchè la tabella non viene modificata.
+        """
+        if self._arrays is None:
+            vertex_keys = np.sort(np.fromiter(self._vertex, dtype=np.int64, count=len(self._vertex)))
+            edge_keys = np.sort(np.fromiter(self._edge, dtype=np.int64, count=len(self._edge)))
+            parked = np.full(self.n_cells, FOREVER, dtype=np.int64)
+            if self._parked:
+                parked[np.fromiter(self._parked.keys(), dtype=np.int64)] = np.fromiter(self._parked.values(), dtype=np.int64)
+            self._arrays = (vertex_keys, edge_keys, parked)
+        return self._arrays
+
+    def safe_intervals(self, cell: int) -> List[Interval]:
+        """
+            Questa funzione restituisce gli intervalli sicuri della cella, cioè gli intervalli di tempo [inizio, fine]
+            (estremi inclusi) massimali in cui la cella non è prenotata, ordinati per tempo. L'ultimo intervallo termina
+            in FOREVER, a meno che nella cella non sia parcheggiato un agente: in tal caso termina l'istante prima
+            del suo arrivo.
+        """
+        parked = self._parked.get(cell)
+        end = FOREVER if parked is None else parked - 1
+        intervals: List[Interval] = []
+        low = 0
+        for time in self._vertex_times.get(cell, ()):
+            if time > end:
+                break
+            if time > low:
+                intervals.append((low, time - 1))
+            low = time + 1
+        if low <= end:
+            intervals.append((low, end))
+        return intervals
+
+    def is_parked(self, cell: int) -> bool:
+        """
+            Questa funzione verifica se nella cella è parcheggiato un agente.
+        """
+        return cell in self._parked
+
+    def parked_cells(self) -> NDArray[np.int64]:
+        """
+            Questa funzione restituisce le celle(indici piatti) in cui è parcheggiato un agente.
+        """
+        return np.fromiter(self._parked, dtype=np.int64, count=len(self._parked))
+
+    def is_edge_reserved(self, from_cell: int, to_cell: int, time: int) -> bool:
+        """
+            Questa funzione verifica se lo spostamento from_cell->to_cell che termina al tempo indicato è vietato.
+        """
+        if from_cell == to_cell:
+            return False
+        return self._edge_key(from_cell, to_cell, time) in self._edge
+
+    def is_move_allowed(self, from_cell: int, to_cell: int, time: int) -> bool:
+        """
+            Questa funzione verifica se un agente può spostarsi da from_cell a to_cell arrivando al tempo indicato,
+            cioè se la cella di arrivo è libera e l'arco non è percorso in senso opposto da un altro agente.
+        """
+        parked = self._parked.get(to_cell)
+        if parked is not None and time >= parked:
+            return False
+        if time * self.n_cells + to_cell in self._vertex:
+            return False
+        return not self.is_edge_reserved(from_cell, to_cell, time)
+
+    def __len__(self) -> int:
+        return len(self._vertex) + len(self._edge)
@@ -0,0 +1,106 @@
+import glob
+import matplotlib.pyplot as plt
+from pathlib import Path
+from typing import List, Optional, Union
+import numpy as np
+from numpy.typing import NDArray
+from agente import Agent, generate_agents
+from heuristic import HeuristicTables
+
+SCENARIO_VERSION = "version 1"
+
+
+def read_scenario(scenario_path: Union[str, Path], map: NDArray[np.int_], max_agents: Optional[int] = None) -> List[Agent]:
+    """
+        Questa funzione legge un file di scenario in formato MovingAI(.scen) e restituisce gli agenti che descrive,
+        nell'ordine del file, con priorità 1, 2, ... e un colore diverso per agente come generate_agents.
+
+        Il file inizia con la riga "version 1", seguita da una riga per agente con i campi separati da tabulazioni:
+        bucket, nome della mappa, larghezza, altezza, colonna e riga di partenza, colonna e riga obiettivo, lunghezza
+        del percorso ottimo. Le coordinate del formato MovingAI sono (x, y) = (colonna, riga), mentre gli agenti
+        usano (riga, colonna).
+
+        Gli argomenti della funzione sono:
+        -)scenario_path: percorso del file .scen
+        -)map: mappa a cui si riferisce lo scenario, usata per verificarne le dimensioni e le celle
+        -)max_agents: numero massimo di agenti letti(opzionale, di default tutti)
+
+        La funzione solleva un'eccezione ValueError se il file non è nel formato corretto, se le dimensioni non
+        corrispondono alla mappa oppure se una posizione è un ostacolo.
+    """
+    height, width = map.shape
+    lines = Path(scenario_path).read_text().splitlines()
+    if not lines or not lines[0].strip().startswith("version"):
+        raise ValueError(f"Il file {scenario_path} non è uno scenario MovingAI(manca la riga di versione).")
+    positions = []
+    for number, line in enumerate(lines[1:], start=2):
+        if not line.strip():
+            continue
+        fields = line.split("\t") if "\t" in line else line.split()
+        if len(fields) < 9:
+            raise ValueError(f"Riga {number} dello scenario {scenario_path} non valida: {line!r}")
+        scenario_width, scenario_height = int(fields[2]), int(fields[3])
+        if (scenario_height, scenario_width) != (height, width):
+            raise ValueError(f"Lo scenario {scenario_path} si riferisce ad una mappa {scenario_width}x{scenario_height}, "
+                             f"ma la mappa è {width}x{height}.")
+        start = (int(fields[5]), int(fields[4]))
+        goal = (int(fields[7]), int(fields[6]))
+        for position in (start, goal):
+            if map[position] != 0:
+                raise ValueError(f"Riga {number} dello scenario {scenario_path}: la posizione {position} è un ostacolo.")
+        positions.append((start, goal))
+        if max_agents is not None and len(positions) == max_agents:
+            break
+    colormap = plt.cm.get_cmap('hsv', max(len(positions), 1))
+    return [Agent(start_position=start, goal_position=goal, color=colormap(i), priority=i + 1)
+            for i, (start, goal) in enumerate(positions)]
+
+
+def write_scenario(scenario_path: Union[str, Path], map_name: str, map: NDArray[np.int_], agents: List[Agent],
+                   heuristic: Optional[HeuristicTables] = None) -> None:
+    """
+        Questa funzione salva gli agenti in un file di scenario in formato MovingAI(.scen), leggibile da read_scenario
+        e dagli strumenti del benchmark MovingAI. La lunghezza del percorso ottimo di ogni agente è la distanza reale
+        tra partenza e obiettivo, e il bucket è tale lunghezza divisa per 4, come negli scenari originali.
+    """
+    height, width = map.shape
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    lines = [SCENARIO_VERSION]
+    for agent in agents:
+        (start_row, start_column), (goal_row, goal_column) = agent.start_position, agent.goal_position
+        distance = heuristic.distance(agent.start_position, agent.goal_position)
+        lines.append("\t".join(str(field) for field in (distance // 4, map_name, width, height, start_column, start_row,
+                                                         goal_column, goal_row, f"{distance:.8f}")))
+    Path(scenario_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(scenario_path).write_text("\n".join(lines) + "\n")
+
+
+def find_scenarios(map_path: Union[str, Path]) -> List[Path]:
+    """
+        Questa funzione restituisce gli scenari MovingAI della mappa presenti nella stessa cartella, riconosciuti dal
+        nome come negli archivi del benchmark(<mappa>-random-1.scen, <mappa>-even-1.scen, ...).
+    """
+    map_path = Path(map_path)
+    pattern = str(map_path.with_name(f"{glob.escape(map_path.stem)}-*.scen"))
+    return sorted(Path(path) for path in glob.glob(pattern))
+
+
+def generate_scenario(map_path: Union[str, Path], map: NDArray[np.int_], num_agents: int, seed: int,
+                      heuristic: Optional[HeuristicTables] = None, output_dir: Optional[Union[str, Path]] = None) -> Path:
+    """
+        Questa funzione genera in modo deterministico uno scenario per la mappa e lo salva come
+        <mappa>-random-<seed>.scen nella cartella della mappa(oppure in output_dir). Gli agenti sono quelli di
+        generate_agents con lo stesso seed, per cui lo stesso seed produce sempre lo stesso file, e ogni obiettivo è
+        raggiungibile dalla rispettiva partenza.
+
+        La funzione restituisce il percorso del file generato.
+    """
+    map_path = Path(map_path)
+    if heuristic is None:
+        heuristic = HeuristicTables(map)
+    agents = generate_agents(map, max_num_agents=num_agents, seed=seed, heuristic=heuristic)
+    directory = map_path.parent if output_dir is None else Path(output_dir)
+    scenario_path = directory / f"{map_path.stem}-random-{seed}.scen"
+    write_scenario(scenario_path, map_path.name, map, agents, heuristic)
+    return scenario_path
@@ -0,0 +1,193 @@
+import heapq
+import time
+import numpy as np
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from numpy.typing import NDArray
+from agente import Agent
+from heuristic import HeuristicTables, UNREACHABLE
+from reservation_table import ReservationTable, FOREVER
+from compact_path import CompactPath
+from astar_native import FOUND, NOT_FOUND, ITERATION_LIMIT, DEADLINE_EXCEEDED
+from instrumentation import SearchStats
+from prioritized_planning import grid_adjacency, max_iterations, FRONTIER_SHIFT, FRONTIER_MASK
+
+
+def reconstruct_sipp_path(parents: "array[int]", cells: "array[int]", arrivals: "array[int]", node: int,
+                          width: int) -> CompactPath:
+    """
+        Questa funzione ricostruisce il percorso trovato da SIPP nel formato usato da A*(compact_path.CompactPath),
+        cioè una posizione per ogni istante di tempo. Tra l'arrivo in una cella e l'arrivo nella cella successiva
+        l'agente attende(WAIT) nella cella in cui si trova: le celle e gli istanti di arrivo dei nodi sono proprio le
+        sequenze del percorso compatto, per cui le attese non vengono espanse.
+    """
+    path_cells: List[int] = []
+    path_arrivals: List[int] = []
+    while node >= 0:
+        path_cells.append(cells[node])
+        path_arrivals.append(arrivals[node])
+        node = parents[node]
+    path_cells.reverse()
+    path_arrivals.reverse()
+    return CompactPath.from_runs(path_cells, path_arrivals, path_arrivals[-1] + 1, width)
+
+
+def SIPP(map: NDArray[np.int_], agente: Agent, reservations: ReservationTable, iteration_limit: Optional[int] = None,
+         heuristic: Optional[HeuristicTables] = None, deadline: Optional[float] = None,
+         stats: Optional[SearchStats] = None):
+    """
+        Questa funzione esegue l'algoritmo Safe Interval Path Planning(SIPP), un'alternativa ad A* nello spazio-tempo
+        per la ricerca del percorso di un agente.
+
+        Invece di uno stato per ogni coppia (cella, tempo), SIPP utilizza uno stato per ogni coppia
+        (cella, intervallo sicuro), dove gli intervalli sicuri di una cella sono gli intervalli di tempo massimali in cui
+        la cella non è prenotata(ReservationTable.safe_intervals). Il numero di stati non cresce quindi con la durata del
+        percorso, ma con il numero di prenotazioni. Ad ogni stato si associa l'istante di arrivo più piccolo possibile,
+        e il percorso trovato è ottimo come quello di A*.
+
+        Gli argomenti e il valore restituito sono gli stessi di A_Star:
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)agente: agente di cui si intende trovare il percorso ottimale
+        -)reservations: tabella delle prenotazioni(vertici, archi e parcheggi)
+        -)iteration_limit: numero massimo di iterazioni(default: max_iterations)
+        -)heuristic: tabelle delle distanze reali(opzionale, altrimenti distanza di Manhattan)
+        -)deadline: istante(misurato con time.perf_counter) oltre il quale la ricerca viene interrotta(opzionale)
+        -)stats: metriche della ricerca(instrumentation.SearchStats, opzionale), con le fasi heuristic e search. Gli
+        stati reinseriti nella frontiera con un istante di arrivo migliore sono contati in repushed, gli intervalli
+        non raggiungibili a causa delle prenotazioni in pruned_constraint.
+
+        La funzione restituisce il numero di nodi espansi, il percorso(una posizione per ogni istante di tempo) e il suo
+        costo, oppure None se non esiste alcun percorso.
+
+        Si offre una breve descrizione della funzione:
+        1)si individua l'intervallo sicuro della cella iniziale che contiene l'istante 0.
+        2)ad ogni iterazione si estrae dalla frontiera lo stato con f=g+h minore, dove g è l'istante di arrivo.
+        3)se la cella è l'obiettivo e l'intervallo sicuro non termina mai, l'agente può parcheggiare: si ricostruisce
+        il percorso inserendo le attese.
+        4)altrimenti, per ogni cella vicina e per ogni suo intervallo sicuro raggiungibile, si calcola l'istante di arrivo
+        più piccolo: l'agente può partire tra il suo arrivo e la fine del suo intervallo sicuro, e deve arrivare
+        all'interno dell'intervallo della cella vicina senza percorrere un arco prenotato.
+        5)se l'istante di arrivo migliora quello noto per lo stato (cella vicina, intervallo), lo stato viene
+        inserito nella frontiera.
+    """
+    start: Tuple[int, int] = agente.start_position
+    goal: Tuple[int, int] = agente.goal_position
+    height, width = map.shape
+    n_cells: int = height * width
+    start_cell: int = start[0] * width + start[1]
+    goal_cell: int = goal[0] * width + goal[1]
+
+    if stats is not None:
+        phase_start: int = time.perf_counter_ns()
+    if heuristic is not None:
+        h_values: List[int] = heuristic.get(goal).ravel().tolist()
+        if h_values[start_cell] == UNREACHABLE:
+            return None
+    else:
+        rows, columns = np.indices(map.shape)
+        h_values = (np.abs(rows - goal[0]) + np.abs(columns - goal[1])).ravel().tolist()
+    if stats is not None:
+        stats.add_time("heuristic", phase_start)
+        phase_start = time.perf_counter_ns()
+
+    adjacency = grid_adjacency(map)
+    is_move_allowed = reservations.is_move_allowed
+    limit: int = max_iterations if iteration_limit is None else iteration_limit
+    intervals_cache: Dict[int, Tuple[List[int], List[int]]] = {}
+
+    def intervals(cell: int) -> Tuple[List[int], List[int]]:
+        cached = intervals_cache.get(cell)
+        if cached is None:
+            safe = reservations.safe_intervals(cell)
+            cached = ([low for low, _ in safe], [high for _, high in safe])
+            intervals_cache[cell] = cached
+        return cached
+
+    start_lows, start_highs = intervals(start_cell)
+    start_index: int = bisect_left(start_highs, 0)
+    if start_index == len(start_lows) or start_lows[start_index] > 0:
+        return None
+
+    cells: "array[int]" = array('q', [start_cell])
+    interval_indices: "array[int]" = array('q', [start_index])
+    arrivals: "array[int]" = array('q', [0])
+    parents: "array[int]" = array('q', [-1])
+    best_arrival: Dict[int, int] = {start_index * n_cells + start_cell: 0}
+    frontier: List[int] = [h_values[start_cell] << FRONTIER_SHIFT]
+
+    iterations: int = 0
+    expanded_nodes: int = 0
+    repushed: int = 0
+    pruned_duplicate: int = 0
+    pruned_constraint: int = 0
+    max_frontier: int = 0
+    status: int = NOT_FOUND
+    path: Optional[CompactPath] = None
+    while frontier:
+        if iterations > limit:
+            print("Timeout SIPP: numero massimo di esecuzioni superato. Soluzione non trovata")
+            status = ITERATION_LIMIT
+            break
+        iterations += 1
+        if deadline is not None and iterations & 1023 == 0 and time.perf_counter() > deadline:
+            status = DEADLINE_EXCEEDED
+            break
+        if len(frontier) > max_frontier:
+            max_frontier = len(frontier)
+
+        node: int = heapq.heappop(frontier) & FRONTIER_MASK
+        current_cell: int = cells[node]
+        current_index: int = interval_indices[node]
+        current_arrival: int = arrivals[node]
+        if best_arrival[current_index * n_cells + current_cell] < current_arrival:
+            continue
+        expanded_nodes += 1
+
+        current_end: int = intervals(current_cell)[1][current_index]
+        if current_cell == goal_cell and current_end == FOREVER:
+            path = reconstruct_sipp_path(parents, cells, arrivals, node, width)
+            status = FOUND
+            break
+
+        earliest: int = current_arrival + 1
+        latest: int = FOREVER if current_end == FOREVER else current_end + 1
+        for neighbor_cell in adjacency[current_cell]:
+            if neighbor_cell == current_cell:
+                continue
+            h: int = h_values[neighbor_cell]
+            if h == UNREACHABLE:
+                continue
+            lows, highs = intervals(neighbor_cell)
+            for index in range(bisect_left(highs, earliest), len(lows)):
+                low = lows[index]
+                if low > latest:
+                    break
+                last_arrival = min(highs[index], latest)
+                arrival = max(earliest, low)
+                while arrival <= last_arrival and not is_move_allowed(current_cell, neighbor_cell, arrival):
+                    arrival += 1
+                if arrival > last_arrival:
+                    pruned_constraint += 1
+                    continue
+                key = index * n_cells + neighbor_cell
+                best = best_arrival.get(key, FOREVER)
+                if arrival >= best:
+                    pruned_duplicate += 1
+                    continue
+                if best != FOREVER:
+                    repushed += 1
+                best_arrival[key] = arrival
+                cells.append(neighbor_cell)
+                interval_indices.append(index)
+                arrivals.append(arrival)
+                parents.append(node)
+                heapq.heappush(frontier, ((arrival + h) << FRONTIER_SHIFT) | (len(cells) - 1))
+
+    if stats is not None:
+        stats.record_search(status, expanded_nodes, [len(cells) - 1, repushed, pruned_duplicate, pruned_constraint, 0,
+                                                     max_frontier])
+        stats.add_time("search", phase_start)
+    if path is None:
+        return None
+    return expanded_nodes, path, len(path) - 1
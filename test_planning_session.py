@@ -0,0 +1,35 @@
+import numpy as np
+from agente import Agent
+from prioritized_planning import PlanningSession
+
+
+def _corridor_agents():
+    """
+        Questa funzione crea quattro agenti in un corridoio largo una cella: l'agente con priorità 0 si parcheggia
+        nella cella (0, 3), che l'agente con priorità 2 deve attraversare per raggiungere il suo obiettivo, mentre
+        l'agente con priorità 3 resta nella cella libera sotto il corridoio.
+    """
+    color = (0.0, 0.0, 0.0, 1.0)
+    return [Agent((0, 0), (0, 3), color, 0),
+            Agent((0, 6), (0, 5), color, 1),
+            Agent((0, 4), (0, 2), color, 2),
+            Agent((1, 6), (1, 6), color, 3)]
+
+
+def test_extend_over_increasing_k_with_failed_repair():
+    map = np.ones((2, 7), dtype=np.uint8)
+    map[0, :] = 0
+    map[1, 6] = 0
+    agents = _corridor_agents()
+
+    session = PlanningSession(map, repair=True, max_repairs=0)
+    for k in (1, 2, 3, 4):
+        session.extend(agents[session.processed_agents:k])
+        assert session.processed_agents == k
+
+    assert [agent.priority for agent in session.unsolved] == [2]
+    assert [agent.priority for agent in session.agents] == [0, 1, 3]
+
+    fresh = PlanningSession(map, repair=True, max_repairs=0)
+    fresh.extend(agents)
+    assert session.checkpoint()[1:] == fresh.checkpoint()[1:]
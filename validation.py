@@ -0,0 +1,161 @@
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from numpy.typing import NDArray
+from compact_path import AgentPath, CompactPath
+
+Conflict = Tuple[str, int, int, int, Tuple[int, int]]
+
+VERTEX_CONFLICT = "vertex"
+SWAP_CONFLICT = "swap"
+INVALID_MOVE = "move"
+
+
+def pack_paths(paths: Sequence[Optional[AgentPath]], width: int) -> Tuple[NDArray[np.int32], NDArray[np.int64]]:
+    """
+        Questa funzione raccoglie i percorsi in un unico array NumPy(agenti, T) di indici piatti delle celle, dove T è
+        la lunghezza del percorso più lungo. Dopo l'arrivo ogni agente resta parcheggiato nella posizione obiettivo,
+        per cui i percorsi più corti vengono completati ripetendo l'ultima cella. I percorsi None(agenti non risolti,
+        vedi prioritized_planning_with_repair) vengono ignorati.
+
+        Le celle di tutti i percorsi vengono lette in un unico array piatto, e l'array(agenti, T) viene costruito con
+        un solo indice vettorizzato: per l'agente i all'istante t si legge la cella min(t, lunghezza_i - 1).
+        Le celle dei percorsi compatti(CompactPath) vengono esportate in blocco con CompactPath.to_cells.
+
+        La funzione restituisce l'array dei percorsi e, per ogni sua riga, l'indice dell'agente nella lista paths.
+    """
+    agents = np.array([i for i, path in enumerate(paths) if path], dtype=np.int64)
+    lengths = np.array([len(paths[i]) for i in agents.tolist()], dtype=np.int64)
+    cells = np.concatenate([_path_cells(paths[i], width) for i in agents.tolist()] or [np.zeros(0, dtype=np.int32)])
+    offsets = np.cumsum(lengths) - lengths
+    horizon = int(lengths.max(initial=0))
+    steps = np.minimum(np.arange(horizon, dtype=np.int64), lengths[:, None] - 1)
+    return cells[offsets[:, None] + steps], agents
+
+
+def _path_cells(path: AgentPath, width: int) -> NDArray[np.int32]:
+    """
+        Questa funzione restituisce le celle(indici piatti) del percorso in ogni istante di tempo.
+    """
+    if isinstance(path, CompactPath):
+        return path.to_cells()
+    return np.fromiter((row * width + column for (row, column), _ in path), dtype=np.int32, count=len(path))
+
+
+def _path_times_are_valid(paths: Sequence[Optional[AgentPath]], agents: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """
+        Questa funzione verifica, per ogni agente di pack_paths, che il percorso inizi all'istante 0 e abbia un istante
+        di tempo per ogni passo, come assunto da pack_paths. I percorsi compatti(CompactPath) hanno un istante per
+        ogni passo per costruzione, e vengono considerati validi senza leggerne gli istanti.
+    """
+    listed = np.array([not isinstance(paths[i], CompactPath) for i in agents.tolist()], dtype=bool)
+    valid = np.ones(len(agents), dtype=bool)
+    valid[listed] = _list_times_are_valid(paths, agents[listed])
+    return valid
+
+
+def _list_times_are_valid(paths: Sequence[Optional[AgentPath]], agents: NDArray[np.int64]) -> NDArray[np.bool_]:
+    """
+        Questa funzione verifica gli istanti di tempo dei percorsi in formato lista(vedi _path_times_are_valid).
+    """
+    lengths = np.array([len(paths[i]) for i in agents.tolist()], dtype=np.int64)
+    times = np.fromiter((t for i in agents.tolist() for _, t in paths[i]), dtype=np.int64, count=int(lengths.sum()))
+    expected = np.arange(len(times), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    wrong = times != expected
+    return ~np.logical_or.reduceat(wrong, np.cumsum(lengths) - lengths) if len(times) else np.ones(0, dtype=bool)
+
+
+def _pairs_with_equal_keys(keys: NDArray[np.int64]) -> Tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """
+        Questa funzione restituisce le coppie di indici(i, j), con i < j nell'ordinamento, di elementi consecutivi con
+        la stessa chiave dopo aver ordinato l'array. Se più di due elementi hanno la stessa chiave vengono restituite
+        le coppie di elementi consecutivi, sufficienti per segnalare il conflitto.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    equal = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+    return order[equal], order[equal + 1]
+
+
+def find_conflicts(paths: Sequence[Optional[AgentPath]], map: NDArray[np.int_],
+                   max_conflicts: Optional[int] = None) -> List[Conflict]:
+    """
+        Questa funzione verifica che una soluzione(i percorsi restituiti da prioritized_planning) sia priva di conflitti,
+        con confronti vettorizzati sull'array restituito da pack_paths invece di un ciclo su agenti e istanti di tempo.
+
+        Gli argomenti della funzione sono:
+        -)paths: percorsi degli agenti, nel formato di prioritized_planning(eventuali percorsi None vengono ignorati)
+        -)map: array NumPy 2D con celle libere(0) e ostacoli(1)
+        -)max_conflicts: numero massimo di conflitti restituiti(opzionale, di default tutti)
+
+        Si offre una breve descrizione della funzione:
+        1)mosse non valide: si controlla che ogni passo sia un'azione ammessa(una delle 4 mosse oppure WAIT) verso
+        una cella libera, e che il percorso inizi all'istante 0 con un istante di tempo per passo.
+        2)conflitti di vertice: la chiave t * numero_celle + cella identifica lo stato(cella, t) di ogni agente in
+        ogni istante; due agenti con la stessa chiave occupano la stessa cella nello stesso istante.
+        3)conflitti di arco(swap): per ogni agente che si muove da u a v tra t-1 e t si costruisce la chiave dello
+        spostamento non orientato(t, min(u, v), max(u, v)); due agenti con la stessa chiave e celle di partenza diverse
+        si scambiano di posto.
+
+        La funzione restituisce la lista dei conflitti trovati, vuota se la soluzione è valida. Ogni conflitto è una
+        tupla (tipo, agente, altro agente, istante di tempo, posizione), in cui i tipi sono VERTEX_CONFLICT,
+        SWAP_CONFLICT e INVALID_MOVE(per il quale altro agente vale -1) e gli agenti sono gli indici nella lista paths.
+    """
+    height, width = map.shape
+    n_cells = height * width
+    packed, agents = pack_paths(paths, width)
+    horizon = packed.shape[1]
+    conflicts: List[Conflict] = []
+
+    for i in agents[~_path_times_are_valid(paths, agents)].tolist():
+        conflicts.append((INVALID_MOVE, i, -1, paths[i][0][1], paths[i][0][0]))
+    if horizon:
+        rows, columns = np.divmod(packed.astype(np.int64), width)
+        steps = np.abs(np.diff(rows, axis=1)) + np.abs(np.diff(columns, axis=1))
+        blocked = np.asarray(map).ravel()[packed] != 0
+        invalid = np.zeros(packed.shape, dtype=bool)
+        invalid[:, 1:] = steps > 1
+        invalid |= blocked
+        for row, t in zip(*np.nonzero(invalid)):
+            conflicts.append((INVALID_MOVE, int(agents[row]), -1, int(t), divmod(int(packed[row, t]), width)))
+
+    keys = (np.arange(horizon, dtype=np.int64) * n_cells + packed).ravel()
+    first, second = _pairs_with_equal_keys(keys)
+    for a, b in zip(first.tolist(), second.tolist()):
+        t = a % horizon
+        conflicts.append((VERTEX_CONFLICT, int(agents[a // horizon]), int(agents[b // horizon]), t,
+                          divmod(int(packed[a // horizon, t]), width)))
+
+    if horizon > 1:
+        source = packed[:, :-1].astype(np.int64)
+        target = packed[:, 1:].astype(np.int64)
+        moving_rows, moving_steps = np.nonzero(source != target)
+        u, v = source[moving_rows, moving_steps], target[moving_rows, moving_steps]
+        low, high = np.minimum(u, v), np.maximum(u, v)
+        edge_keys = ((moving_steps + 1) * n_cells + low) * n_cells + high
+        first, second = _pairs_with_equal_keys(edge_keys)
+        for a, b in zip(first.tolist(), second.tolist()):
+            if u[a] != u[b]:
+                conflicts.append((SWAP_CONFLICT, int(agents[moving_rows[a]]), int(agents[moving_rows[b]]),
+                                  int(moving_steps[a]) + 1, divmod(int(v[a]), width)))
+
+    conflicts.sort(key=lambda conflict: (conflict[3], conflict[1], conflict[2]))
+    return conflicts if max_conflicts is None else conflicts[:max_conflicts]
+
+
+def is_valid_solution(paths: Sequence[Optional[AgentPath]], map: NDArray[np.int_]) -> bool:
+    """
+        Questa funzione restituisce True se la soluzione non contiene conflitti né mosse non valide(vedi find_conflicts).
+    """
+    return not find_conflicts(paths, map, max_conflicts=1)
+
+
+def describe_conflict(conflict: Conflict) -> str:
+    """
+        Questa funzione restituisce una descrizione leggibile di un conflitto restituito da find_conflicts.
+    """
+    kind, agent, other, t, position = conflict
+    if kind == VERTEX_CONFLICT:
+        return f"conflitto di vertice tra gli agenti {agent} e {other} in {position} all'istante {t}"
+    if kind == SWAP_CONFLICT:
+        return f"scambio di posto tra gli agenti {agent} e {other} verso {position} all'istante {t}"
+    return f"mossa non valida dell'agente {agent} in {position} all'istante {t}"